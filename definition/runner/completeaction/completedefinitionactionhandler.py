@@ -6,7 +6,7 @@ from expression import Result
 
 from shared.completedresult import CompletedResult
 from shared.customtypes import DefinitionIdValue, Error, RunIdValue, StepIdValue
-from shared.infrastructure.storage.repository import NotFoundError, NotFoundException, StorageError
+from shared.infrastructure.storage.repository import ContentionError, ContentionException, NotFoundError, NotFoundException, StorageError
 from shared.runningdefinition import RunningDefinitionState
 from shared.utils.asyncresult import async_result, coroutine_result
 from shared.utils.exceptiondecorators import async_ex_to_error_result
@@ -26,7 +26,7 @@ async def handle(
     event_handler: Callable[[RunningDefinitionState.Events.StepRunning | RunningDefinitionState.Events.DefinitionCompleted], Coroutine[Any, Any, Result]],
     cmd: CompleteActionCommand
 ):
-    def map_errors(error: NotFoundError | StorageError | _EventHandlerError):
+    def map_errors(error: NotFoundError | ContentionError | StorageError | _EventHandlerError):
         match error:
             case _EventHandlerError(event=evt, error=evt_error):
                 match evt:
@@ -57,7 +57,7 @@ class RunNextStepError:
 class CompleteDefinitionError:
     error: Any
 
-@coroutine_result[NotFoundError | StorageError | _EventHandlerError]()
+@coroutine_result[NotFoundError | ContentionError | StorageError | _EventHandlerError]()
 async def _complete_action_workflow(
     convert_to_storage_action: ToStorageActionConverter,
     event_handler: Callable[[RunningDefinitionState.Events.StepRunning | RunningDefinitionState.Events.DefinitionCompleted], Coroutine[Any, Any, Result]],
@@ -66,6 +66,7 @@ async def _complete_action_workflow(
     @async_result
     @async_ex_to_error_result(StorageError.from_exception)
     @async_ex_to_error_result(lambda _: NotFoundError(f"State not found for run_id {cmd.run_id} and definition_id {cmd.definition_id}"), NotFoundException)
+    @async_ex_to_error_result(lambda _: ContentionError(f"State of run_id {cmd.run_id} and definition_id {cmd.definition_id} was changed concurrently too many times"), ContentionException)
     @convert_to_storage_action
     def apply_run_next_step(state: RunningDefinitionState | None):
         if state is None:
@@ -109,7 +110,7 @@ async def _complete_action_workflow(
 async def _clean_up_failed_complete(
     convert_to_storage_action: ToStorageActionConverter,
     cmd: CompleteActionCommand,
-    error: NotFoundError | StorageError | _EventHandlerError
+    error: NotFoundError | ContentionError | StorageError | _EventHandlerError
 ):
     @async_ex_to_error_result(StorageError.from_exception)
     @convert_to_storage_action
@@ -8,10 +8,12 @@ from shared.completedresult import CompletedResult
 from shared.customtypes import DefinitionIdValue, Error, RunIdValue, StepIdValue
 from shared.definitioncustomtypes import GroupIdValue
 from shared.groupofrunningdefinitions import GroupOfRunningDefinitionsState
-from shared.infrastructure.storage.repository import NotFoundException, StorageError
+from shared.infrastructure.storage.repository import ContentionError, ContentionException, NotFoundException, StorageError
 from shared.utils.asyncresult import AsyncResult
 from shared.utils.exceptiondecorators import async_ex_to_error_result
 
+from shardedgroupcompletion import CompleteGroupDefinition
+
 type ToStorageActionConverter[**P] = Callable[[Callable[Concatenate[GroupOfRunningDefinitionsState | None, P], tuple[GroupOfRunningDefinitionsState.Events.Event | None, GroupOfRunningDefinitionsState]]], Callable[Concatenate[RunIdValue, GroupIdValue, P], Coroutine[Any, Any, GroupOfRunningDefinitionsState.Events.Event | None]]]
 
 class CompleteGroupDefinitionCommand(NamedTuple):
@@ -24,7 +26,8 @@ class CompleteGroupDefinitionCommand(NamedTuple):
 async def handle(
     convert_to_storage_action: ToStorageActionConverter,
     event_handler: Callable[[GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted], Coroutine[Any, Any, Result]],
-    cmd: CompleteGroupDefinitionCommand
+    cmd: CompleteGroupDefinitionCommand,
+    complete_definition: CompleteGroupDefinition | None = None
 ):
     @async_ex_to_error_result(StorageError.from_exception)
     @convert_to_storage_action
@@ -33,7 +36,7 @@ async def handle(
             raise NotFoundException()
         evt = state.apply_command(GroupOfRunningDefinitionsState.Commands.Fail(Error.from_error(error)))
         return (evt, state)
-    def map_errors(error: CompleteGroupDefinitionStorageError | _EventHandlerError):
+    def map_errors(error: CompleteGroupDefinitionStorageError | ContentionError | _EventHandlerError):
         match error:
             case _EventHandlerError(GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(), error=evt_error):
                 return CompletAllDefinitionsError(evt_error)
@@ -43,7 +46,8 @@ async def handle(
     res = await _complete_group_definition_workflow(
         convert_to_storage_action,
         event_handler,
-        cmd
+        cmd,
+        complete_definition
     )
     opt_error = res.swap().default_value(None)
     match opt_error:
@@ -66,17 +70,23 @@ class _EventHandlerError:
 def _complete_group_definition_workflow(
     convert_to_storage_action: ToStorageActionConverter,
     event_handler: Callable[[GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted], Coroutine[Any, Any, Result]],
-    cmd: CompleteGroupDefinitionCommand
+    cmd: CompleteGroupDefinitionCommand,
+    complete_definition: CompleteGroupDefinition | None
 ):
-    @async_ex_to_error_result(CompleteGroupDefinitionStorageError.from_exception)
-    @async_ex_to_error_result(lambda _: CompleteGroupDefinitionStorageError(f"State not found for run_id {cmd.run_id} and group_id {cmd.group_id}"), NotFoundException)
     @convert_to_storage_action
-    def apply_complete_definition(state: GroupOfRunningDefinitionsState | None):
+    def apply_complete_definition_in_group(state: GroupOfRunningDefinitionsState | None):
         if state is None:
             raise NotFoundException()
         complete_def_cmd = GroupOfRunningDefinitionsState.Commands.CompleteDefinition(cmd.step_id, cmd.definition_id, cmd.result)
         evt = state.apply_command(complete_def_cmd)
         return (evt, state)
+    @async_ex_to_error_result(CompleteGroupDefinitionStorageError.from_exception)
+    @async_ex_to_error_result(lambda _: CompleteGroupDefinitionStorageError(f"State not found for run_id {cmd.run_id} and group_id {cmd.group_id}"), NotFoundException)
+    @async_ex_to_error_result(lambda _: ContentionError(f"State of run_id {cmd.run_id} and group_id {cmd.group_id} was changed concurrently too many times"), ContentionException)
+    async def apply_complete_definition():
+        if complete_definition is not None:
+            return await complete_definition(cmd.run_id, cmd.group_id, cmd.step_id, cmd.definition_id, cmd.result)
+        return await apply_complete_definition_in_group(cmd.run_id, cmd.group_id)
     async def handle_all_definitions_completed(opt_evt: GroupOfRunningDefinitionsState.Events.Event | None):
         match opt_evt:
             case GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted() as all_defs_completed:
@@ -87,6 +97,6 @@ def _complete_group_definition_workflow(
             case _:
                 return Result[GroupOfRunningDefinitionsState.Events.Event | None, _EventHandlerError].Ok(opt_evt)
     
-    opt_evt_res = AsyncResult(apply_complete_definition(cmd.run_id, cmd.group_id))
+    opt_evt_res = AsyncResult(apply_complete_definition())
     res = opt_evt_res.bind(handle_all_definitions_completed)
     return res.to_coroutine()
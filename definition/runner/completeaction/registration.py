@@ -8,7 +8,8 @@ from shared.groupofrunningdefinitions import GroupOfRunningDefinitionsState
 from shared.pipeline.actionhandler import COMPLETE_ACTION, ActionData, ActionInput, ActionHandlerFactory, AsyncActionHandler, DataDtoAdapter, RunAsyncAction
 from shared.runningdefinition import RunningDefinitionState
 
-from config import running_definitions_storage, group_of_running_definitions_storage
+from config import running_definitions_storage, group_of_running_definitions_storage, complete_group_definition, group_results
+from outoflinegroupresults import GroupResults, read_group_results
 from runningparentaction import RunningParentAction
 
 from .completedefinitionactionhandler import CompleteActionCommand, handle as handle_complete_definition_action
@@ -32,9 +33,9 @@ def register_complete_action_handler(run_action: RunAsyncAction, action_handler:
                 return None
             case definition_id, group_id:
                 # group definition completed, definition id along with group id are required
-                event_handler = functools.partial(_group_definition_event_handler, run_action, data)
+                event_handler = functools.partial(_group_definition_event_handler, run_action, group_results, data, group_id)
                 cmd = CompleteGroupDefinitionCommand(data.run_id, group_id, data.step_id, definition_id, data.input)
-                complete_res = await handle_complete_group_definition(group_of_running_definitions_storage.with_storage, event_handler, cmd)
+                complete_res = await handle_complete_group_definition(group_of_running_definitions_storage.with_storage, event_handler, cmd, complete_group_definition)
                 opt_complete_error = complete_res.swap().default_value(None)
                 if opt_complete_error is not None:
                     await handle_complete_error(opt_complete_error, data)
@@ -77,13 +78,21 @@ async def _event_handler(run_action: RunAsyncAction, data: ActionData[None, Comp
                         case True:
                             return await parent_action_with_def_id.run_complete_definition(run_action, evt.result)
 
-async def _group_definition_event_handler(run_action: RunAsyncAction, data: ActionData[None, CompleteInput], evt: GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted):
+async def _group_definition_event_handler(run_action: RunAsyncAction, group_results: GroupResults, data: ActionData[None, CompleteInput], group_id: GroupIdValue, evt: GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted):
     opt_parent_action = RunningParentAction.parse(data.metadata)
     match opt_parent_action:
         case None:
+            await group_results.delete_results(data.run_id, group_id, evt.results)
             return Result.Ok(None)
         case parent_action_no_def_id if parent_action_no_def_id.metadata.get_definition_id() is None:
+            await group_results.delete_results(data.run_id, group_id, evt.results)
             return Result.Ok(None)
         case parent_action_with_def_id:
-            all_results = [{"definition_id": def_res.definition_id.to_value_with_checksum()} | CompletedResultAdapter.to_dict(def_res.value) for def_res in evt.results]
-            return await parent_action_with_def_id.run_complete_definition(run_action, CompletedWith.Data(all_results))
+            all_results_res = await read_group_results(group_results, data.run_id, group_id, evt.results)
+            if all_results_res.is_error():
+                return Result.Error(all_results_res.error)
+            complete_res = await parent_action_with_def_id.run_complete_definition(run_action, CompletedWith.Data(all_results_res.ok))
+            # Results are kept until parent is completed, so redelivered completion of the last definition completes the parent again
+            if complete_res.is_ok():
+                await group_results.delete_results(data.run_id, group_id, evt.results)
+            return complete_res
@@ -3,15 +3,22 @@ from dataclasses import dataclass
 import os
 from typing import Any
 
+from infrastructure.persistence.storagebackend import StorageSettings
 from infrastructure.rabbitmq import config
 from shared.action import Action, ActionName, ActionType
 from shared.completedresult import CompletedResult
 from shared.customtypes import DefinitionIdValue
+from shared.groupresultsstore import GroupResultsStore
 from shared.pipeline.actionhandler import ActionData, ActionHandlerFactory, DataDto
-from shared.runningdefinitionsstore import GroupOfRunningDefinitionsStore, RunningDefinitionsStore
-from shared.utils.parse import parse_from_dict
+from shared.runningdefinition import RunningDefinitionState
+from shared.runningdefinitionsstore import GroupOfRunningDefinitionsShardStore, GroupOfRunningDefinitionsStore, RunningDefinitionsStore
+from shared.utils.parse import parse_bool_str, parse_from_dict, parse_int_from_env
+
+from outoflinegroupresults import GroupResults, InlineGroupResults, OutOfLineGroupResults
+from shardedgroupcompletion import ShardedGroupCompletion
 
 run_action = config.run_action
+run_actions = config.run_actions
 action_handler = config.action_handler
 
 GET_DEFINITION_ACTION = Action(ActionName("get_definition"), ActionType.SERVICE)
@@ -29,8 +36,49 @@ def get_definition_handler(func: Callable[[ActionData[None, GetDefinitionInput]]
     )(func)
 
 STORAGE_ROOT_FOLDER = os.environ['STORAGE_ROOT_FOLDER']
+# Number of recently used running definition states kept in memory by each store, 0 disables caching.
+# Writes are version checked, but reads are not, so get of cached state can return stale content
+# when another process changed it meanwhile, until this process fails to write it and reads it again
+STORAGE_CACHE_SIZE = parse_int_from_env('STORAGE_CACHE_SIZE', 0)
+# Store running definitions as append-only event logs instead of full snapshot per version
+RUNNING_DEFINITIONS_EVENT_LOG = parse_bool_str(os.environ.get('RUNNING_DEFINITIONS_EVENT_LOG', 'false')) or False
+
+# Append snapshot of running definition state after this number of events, so loading from event log replays fewer events
+# for more events written. Event log is not compacted, other storages keep all events of the state with its snapshots
+RUNNING_DEFINITIONS_SNAPSHOT_INTERVAL = parse_int_from_env('RUNNING_DEFINITIONS_SNAPSHOT_INTERVAL', 20, min_value=1)
+RunningDefinitionState.snapshot_interval = RUNNING_DEFINITIONS_SNAPSHOT_INTERVAL
+
+# Apply concurrent changes of the same running definition or group in this process with a single write
+RUNNING_DEFINITIONS_COALESCE_WRITES = parse_bool_str(os.environ.get('RUNNING_DEFINITIONS_COALESCE_WRITES', 'false')) or False
+
+# Store each definition once and reference it by content hash from running definition states instead of embedding it,
+# stored definitions are shared by all runs and retained forever
+RUNNING_DEFINITIONS_SHARED_DEFINITIONS = parse_bool_str(os.environ.get('RUNNING_DEFINITIONS_SHARED_DEFINITIONS', 'false')) or False
+
+# Complete definitions of a group in this number of shards, so completions of large groups do not contend for one group item, 0 disables sharding
+RUNNING_DEFINITIONS_GROUP_SHARDS = parse_int_from_env('RUNNING_DEFINITIONS_GROUP_SHARDS', 0)
+
+# Store results of completed definitions of a group in separate files and read them only when the whole group is completed
+RUNNING_DEFINITIONS_OUT_OF_LINE_GROUP_RESULTS = parse_bool_str(os.environ.get('RUNNING_DEFINITIONS_OUT_OF_LINE_GROUP_RESULTS', 'false')) or False
+
+RUNNING_DEFINITIONS_STORAGE_SETTINGS = StorageSettings.from_env("RUNNING_DEFINITIONS")
 
-running_definitions_storage = RunningDefinitionsStore(STORAGE_ROOT_FOLDER)
-group_of_running_definitions_storage = GroupOfRunningDefinitionsStore(STORAGE_ROOT_FOLDER)
+running_definitions_storage = RunningDefinitionsStore(STORAGE_ROOT_FOLDER, STORAGE_CACHE_SIZE, RUNNING_DEFINITIONS_EVENT_LOG, RUNNING_DEFINITIONS_STORAGE_SETTINGS, RUNNING_DEFINITIONS_COALESCE_WRITES, RUNNING_DEFINITIONS_SHARED_DEFINITIONS)
+group_of_running_definitions_storage = GroupOfRunningDefinitionsStore(STORAGE_ROOT_FOLDER, STORAGE_CACHE_SIZE, RUNNING_DEFINITIONS_STORAGE_SETTINGS, RUNNING_DEFINITIONS_COALESCE_WRITES)
+group_of_running_definitions_shard_storage = GroupOfRunningDefinitionsShardStore(STORAGE_ROOT_FOLDER, STORAGE_CACHE_SIZE, RUNNING_DEFINITIONS_STORAGE_SETTINGS, RUNNING_DEFINITIONS_COALESCE_WRITES)
+complete_group_definition = ShardedGroupCompletion(
+    group_of_running_definitions_storage.get,
+    group_of_running_definitions_storage.with_storage,
+    group_of_running_definitions_shard_storage.with_storage,
+    RUNNING_DEFINITIONS_GROUP_SHARDS
+) if RUNNING_DEFINITIONS_GROUP_SHARDS > 0 else None
+group_results: GroupResults = InlineGroupResults()
+if RUNNING_DEFINITIONS_OUT_OF_LINE_GROUP_RESULTS:
+    complete_group_definition = group_results = OutOfLineGroupResults(
+        GroupResultsStore(STORAGE_ROOT_FOLDER, RUNNING_DEFINITIONS_STORAGE_SETTINGS),
+        group_of_running_definitions_storage.get,
+        group_of_running_definitions_storage.with_storage,
+        complete_group_definition
+    )
 
 app = config.create_faststream_app()
\ No newline at end of file
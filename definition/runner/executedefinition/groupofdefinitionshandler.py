@@ -10,15 +10,16 @@ from shared.completedresult import CompletedWith
 from shared.customtypes import DefinitionIdValue, Error, Metadata, RunIdValue, StepIdValue
 from shared.definition import Definition
 from shared.definitioncustomtypes import GroupIdValue
-from shared.executedefinitionaction import ExecuteDefinitionInput, run_execute_definition_action
+from shared.executedefinitionaction import ExecuteDefinitionInput, run_execute_definition_action, run_execute_definition_actions
 from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState, RunningDefinition
 from shared.infrastructure.storage.repository import NotFoundException, StorageError
-from shared.pipeline.actionhandler import ActionData, RunAsyncAction
+from shared.pipeline.actionhandler import ActionData, RunAsyncAction, RunAsyncActions
 from shared.utils.asyncresult import AsyncResult
 from shared.utils.exceptiondecorators import async_ex_to_error_result
 from shared.utils.result import apply, to_error_list, to_ok_list
 
 from runningparentaction import RunningParentAction
+from shardedgroupcompletion import CompleteGroupDefinition
 
 from .input import ExecuteGroupOfDefinitionsInput
 
@@ -33,7 +34,9 @@ class CompleteFailedDefinitionStorageError(StorageError):
 async def handle(
     convert_to_storage_action: ToStorageActionConverter,
     run_action: RunAsyncAction,
-    data: ActionData[None, ExecuteGroupOfDefinitionsInput]
+    data: ActionData[None, ExecuteGroupOfDefinitionsInput],
+    complete_definition: CompleteGroupDefinition | None = None,
+    run_actions: RunAsyncActions | None = None
 ) -> Result[GroupOfRunningDefinitionsState.Events.Event | None, RunGroupOfDefinitionsStorageError | list[CompleteFailedDefinitionStorageError]]:
     group_id = GroupIdValue(data.step_id)
     def generate_group_definition_metadata(definition_id: DefinitionIdValue):
@@ -44,11 +47,15 @@ async def handle(
         parent_action = RunningParentAction(data.run_id, data.step_id, data.metadata)
         parent_action.add_to_metadata(metadata)
         return metadata
-    def run_group_definition_handler(step_id: StepIdValue, definition_id: DefinitionIdValue, definition: Definition):
-        input = ExecuteDefinitionInput(definition_id, definition)
-        metadata = generate_group_definition_metadata(definition_id)
-        execute_definition_data = ActionData(data.run_id, step_id, None, input, metadata)
-        return run_execute_definition_action(run_action, execute_definition_data)
+    async def run_group_definitions_handler(running_definitions: tuple[RunningDefinition, ...]) -> list[Result]:
+        execute_definition_datas = [
+            ActionData(data.run_id, step_id, None, ExecuteDefinitionInput(definition_id, definition), generate_group_definition_metadata(definition_id))
+            for step_id, definition_id, definition in running_definitions
+        ]
+        # Execute definition actions of all group definitions are sent together when batch sending is available
+        if run_actions is not None:
+            return await run_execute_definition_actions(run_actions, execute_definition_datas)
+        return await asyncio.gather(*(run_execute_definition_action(run_action, execute_definition_data) for execute_definition_data in execute_definition_datas))
     @async_ex_to_error_result(StorageError.from_exception)
     @convert_to_storage_action
     def apply_failed_run(state: GroupOfRunningDefinitionsState | None):
@@ -61,8 +68,9 @@ async def handle(
     cmd = _RunGroupOfDefinitionsCommand(data.run_id, group_id, definitions)
     res = await _run_group_of_definitions_workflow(
         convert_to_storage_action,
-        run_group_definition_handler,
-        cmd
+        run_group_definitions_handler,
+        cmd,
+        complete_definition
     )
     opt_err = res.swap().default_value(None)
     match opt_err:
@@ -85,8 +93,9 @@ class _RunDefinitionError:
 
 def _run_group_of_definitions_workflow(
     convert_to_storage_action: ToStorageActionConverter,
-    run_definition_handler: Callable[[StepIdValue, DefinitionIdValue, Definition], Coroutine[Any, Any, Result]],
-    cmd: _RunGroupOfDefinitionsCommand
+    run_definitions_handler: Callable[[tuple[RunningDefinition, ...]], Coroutine[Any, Any, list[Result]]],
+    cmd: _RunGroupOfDefinitionsCommand,
+    complete_definition: CompleteGroupDefinition | None
 ):
     @async_ex_to_error_result(RunGroupOfDefinitionsStorageError.from_exception)
     @convert_to_storage_action
@@ -101,15 +110,14 @@ def _run_group_of_definitions_workflow(
                 return set_definitions_and_run()
             case _:
                 return (None, state)
-    async def run_definition_handler_wrapper(running_definition: RunningDefinition):
-        res = await run_definition_handler(*running_definition)
+    def to_run_definition_result(running_definition: RunningDefinition, res: Result):
         return res.map_error(lambda err: _RunDefinitionError(running_definition.step_id, running_definition.definition_id, err))
     async def run_definitions(opt_evt: GroupOfRunningDefinitionsState.Events.Event | None):
         initial_res = Result[GroupOfRunningDefinitionsState.Events.Event | None, tuple[_RunDefinitionError, ...]].Ok(opt_evt)
         match opt_evt:
             case GroupOfRunningDefinitionsState.Events.DefinitionsRunning() as evt:
-                run_definition_handlers = map(run_definition_handler_wrapper, evt.definitions)
-                run_definitions_results = await asyncio.gather(*run_definition_handlers)
+                results = await run_definitions_handler(evt.definitions)
+                run_definitions_results = map(to_run_definition_result, evt.definitions, results)
                 def reduce_func(r1, r2):
                     return apply(lambda acc, _: acc, lambda err: err, r1, r2)
                 reduce_res = functools.reduce(reduce_func, run_definitions_results, initial_res)
@@ -119,24 +127,30 @@ def _run_group_of_definitions_workflow(
     
     opt_evt_res = AsyncResult(apply_run_group_of_definitions(cmd.run_id, cmd.group_id))
     run_definitions_res = opt_evt_res.bind(run_definitions)
-    complete_failed_definitions = functools.partial(_complete_failed_definitions, convert_to_storage_action, cmd)
+    complete_failed_definitions = functools.partial(_complete_failed_definitions, convert_to_storage_action, cmd, complete_definition)
     res = run_definitions_res.or_else(complete_failed_definitions)
     return res.to_coroutine()
 
 async def _complete_failed_definitions(
     convert_to_storage_action: ToStorageActionConverter,
     cmd: _RunGroupOfDefinitionsCommand,
+    complete_definition: CompleteGroupDefinition | None,
     failed_definitions: tuple[_RunDefinitionError, ...] | RunGroupOfDefinitionsStorageError
 ) -> Result[GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted | None, RunGroupOfDefinitionsStorageError | list[CompleteFailedDefinitionStorageError]]:
-    @async_ex_to_error_result(CompleteFailedDefinitionStorageError.from_exception)
-    @async_ex_to_error_result(lambda _: CompleteFailedDefinitionStorageError(f"State not found for run_id {cmd.run_id} and group_id {cmd.group_id}"), NotFoundException)
     @convert_to_storage_action
-    def apply_complete_definition_with_error(state: GroupOfRunningDefinitionsState | None, step_id: StepIdValue, definition_id: DefinitionIdValue, err: Any):
+    def apply_complete_definition_in_group(state: GroupOfRunningDefinitionsState | None, step_id: StepIdValue, definition_id: DefinitionIdValue, err_result: CompletedWith.Error):
         if state is None:
             raise NotFoundException()
-        err_result = CompletedWith.Error(str(err))
         evt = state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(step_id, definition_id, err_result))
         return (evt, state)
+    @async_ex_to_error_result(CompleteFailedDefinitionStorageError.from_exception)
+    @async_ex_to_error_result(lambda _: CompleteFailedDefinitionStorageError(f"State not found for run_id {cmd.run_id} and group_id {cmd.group_id}"), NotFoundException)
+    async def apply_complete_definition_with_error(run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue, err: Any):
+        err_result = CompletedWith.Error(str(err))
+        # Sharded group has to be completed in its shards, otherwise the shard of the definition would never complete
+        if complete_definition is not None:
+            return await complete_definition(run_id, group_id, step_id, definition_id, err_result)
+        return await apply_complete_definition_in_group(run_id, group_id, step_id, definition_id, err_result)
     
     if isinstance(failed_definitions, RunGroupOfDefinitionsStorageError):
         return Result.Error(failed_definitions)
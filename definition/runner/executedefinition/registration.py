@@ -2,18 +2,20 @@ from typing import Any
 
 from expression import Result
 
-from shared.completedresult import CompletedResultAdapter, CompletedWith
+from shared.completedresult import CompletedResult, CompletedResultAdapter, CompletedWith
+from shared.definitioncustomtypes import GroupIdValue
 from shared.executedefinitionaction import EXECUTE_DEFINITION_ACTION, ExecuteDefinitionInput
-from shared.groupofrunningdefinitions import GroupOfRunningDefinitionsState
-from shared.pipeline.actionhandler import ActionData, ActionHandlerFactory, AsyncActionHandler, DataDto, RunAsyncAction
+from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState
+from shared.pipeline.actionhandler import ActionData, ActionHandlerFactory, AsyncActionHandler, CompleteActionData, DataDto, RunAsyncAction, RunAsyncActions
 
-from config import running_definitions_storage, group_of_running_definitions_storage
+from config import running_definitions_storage, group_of_running_definitions_storage, complete_group_definition, group_results
+from outoflinegroupresults import read_group_results
 
 from .groupofdefinitionshandler import RunGroupOfDefinitionsStorageError, CompleteFailedDefinitionStorageError, handle as handle_execute_group_of_definitions
 from .input import ExecuteGroupOfDefinitionsInput
 from .singledefinitionhandler import handle as handle_execute_single_definition
 
-def register_execute_definition_action_handler(run_action: RunAsyncAction, action_handler: AsyncActionHandler):
+def register_execute_definition_action_handler(run_action: RunAsyncAction, action_handler: AsyncActionHandler, run_actions: RunAsyncActions | None = None):
     async def handle_execute_definition_action(data: ActionData[None, ExecuteDefinitionInput | ExecuteGroupOfDefinitionsInput]):
         match data.input:
             case ExecuteDefinitionInput():
@@ -22,8 +24,8 @@ def register_execute_definition_action_handler(run_action: RunAsyncAction, actio
                 return _result_to_execute_definition_action_handler_result(execute_single_definition_res)
             case ExecuteGroupOfDefinitionsInput():
                 action_data = ActionData(data.run_id, data.step_id, data.config, data.input, data.metadata)
-                execute_group_of_definitions_res = await handle_execute_group_of_definitions(group_of_running_definitions_storage.with_storage, run_action, action_data)
-                return _group_result_to_execute_definition_action_handler_result(execute_group_of_definitions_res)
+                execute_group_of_definitions_res = await handle_execute_group_of_definitions(group_of_running_definitions_storage.with_storage, run_action, action_data, complete_group_definition, run_actions)
+                return await _group_result_to_execute_definition_action_handler_result(run_action, data, execute_group_of_definitions_res)
     
     return ActionHandlerFactory(run_action, action_handler).create_without_config(
         EXECUTE_DEFINITION_ACTION,
@@ -56,13 +58,24 @@ def _result_to_execute_definition_action_handler_result(result: Result):
         .map_error(err_to_completed_result)\
         .merge()
 
-def _group_result_to_execute_definition_action_handler_result(result: Result[Any, RunGroupOfDefinitionsStorageError | list[CompleteFailedDefinitionStorageError]]):
-    def ok_to_none_or_completed_result(res):
+async def _group_result_to_execute_definition_action_handler_result(run_action: RunAsyncAction, data: ActionData[None, ExecuteGroupOfDefinitionsInput], result: Result[Any, RunGroupOfDefinitionsStorageError | list[CompleteFailedDefinitionStorageError]]):
+    group_id = GroupIdValue(data.step_id)
+    async def complete_group(results: tuple[DefinitionIdWithValue[CompletedResult | None], ...], all_results: list[dict[str, Any]]):
+        # Results are kept until the action is completed, so they are not lost when completion fails
+        completed_result = CompletedWith.Data(all_results)
+        complete_res = await CompleteActionData(data.run_id, data.step_id, completed_result, data.metadata).run_complete(run_action)
+        if complete_res.is_error():
+            return completed_result
+        await group_results.delete_results(data.run_id, group_id, results)
+        return None
+    async def ok_to_none_or_completed_result(res):
         match res:
             case GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted():
                 # Group of definitions completed.
-                all_results = [{"definition_id": def_res.definition_id.to_value_with_checksum()} | CompletedResultAdapter.to_dict(def_res.value) for def_res in res.results]
-                return CompletedWith.Data(all_results)
+                all_results_res = await read_group_results(group_results, data.run_id, group_id, res.results)
+                if all_results_res.is_error():
+                    return CompletedWith.Data(CompletedWith.Error(f"Group of definitions failed to complete: {all_results_res.error}"))
+                return await complete_group(res.results, all_results_res.ok)
             case _:
                 # Group of definitions started and will complete eventually. Return None to properly handle ongoing execute group of definitions action.
                 return None
@@ -78,7 +91,6 @@ def _group_result_to_execute_definition_action_handler_result(result: Result[Any
                 err_msg = f"Group of definitions failed to complete due to storage issues: {storage_err_msg}"
                 error_result_dict = CompletedWith.Error(err_msg)
                 return CompletedWith.Data(error_result_dict)
-    return result\
-        .map(ok_to_none_or_completed_result)\
-        .map_error(err_to_completed_result)\
-        .merge()
\ No newline at end of file
+    if result.is_ok():
+        return await ok_to_none_or_completed_result(result.ok)
+    return err_to_completed_result(result.error)
\ No newline at end of file
@@ -7,13 +7,13 @@ from shared.infrastructure.storage.repository import StorageError
 from shared.pipeline.actionhandler import ActionData
 from shared.utils.exceptiondecorators import async_ex_to_error_result
 
-from config import GetDefinitionInput, action_handler, app, get_definition_handler, run_action
+from config import GetDefinitionInput, action_handler, app, get_definition_handler, run_action, run_actions
 from completeaction.registration import register_complete_action_handler
 from executedefinition.registration import register_execute_definition_action_handler
 
 # ------------------------------------------------------------------------------------------------------------
 
-register_execute_definition_action_handler(run_action, action_handler)
+register_execute_definition_action_handler(run_action, action_handler, run_actions)
 
 # ------------------------------------------------------------------------------------------------------------
 
@@ -0,0 +1,119 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+from expression import Result
+
+from shared.completedresult import CompletedResult, CompletedResultAdapter
+from shared.customtypes import DefinitionIdValue, RunIdValue, StepIdValue
+from shared.definitioncustomtypes import GroupIdValue
+from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState
+from shared.groupresultsstore import GroupResultsStore
+from shared.infrastructure.storage.repository import NotFoundException
+
+from shardedgroupcompletion import CompleteGroupDefinition, GetGroupState, ToStorageActionConverter
+
+type GroupResults = InlineGroupResults | OutOfLineGroupResults
+
+# Stored results are read in batches of this size, so large groups are neither read one by one nor all at once
+READ_BATCH_SIZE = 100
+
+async def _iterate[T](items: tuple[T, ...]):
+    for item in items:
+        yield item
+
+class InlineGroupResults:
+    '''Results of AllDefinitionsCompleted completed in the group, they are streamed as they are.'''
+    async def stream_results(self, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]) -> Result[AsyncIterator[DefinitionIdWithValue[CompletedResult | None]], str]:
+        return Result.Ok(_iterate(results))
+
+    async def delete_results(self, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]) -> None:
+        return None
+
+class OutOfLineGroupResults:
+    '''
+    Completes definitions of a group with results stored in results store instead of the group,
+    so the group written on every completion keeps only which definitions are completed.
+
+    Definitions are completed by complete_definition when given (e.g. by ShardedGroupCompletion), otherwise in the group item.
+    AllDefinitionsCompleted has no values of results stored in results store, stream_results reads them in batches
+    while consumer iterates them and delete_results deletes them once consumer does not need them anymore.
+    Results completed in the group before are streamed as they are.
+    '''
+    def __init__(self, results_store: GroupResultsStore, get_state: GetGroupState, convert_to_storage_action: ToStorageActionConverter, complete_definition: CompleteGroupDefinition | None = None):
+        self._results_store = results_store
+        self._get_state = get_state
+        @convert_to_storage_action
+        def apply_complete_definition_in_group(state: GroupOfRunningDefinitionsState | None, step_id: StepIdValue, definition_id: DefinitionIdValue):
+            if state is None:
+                raise NotFoundException()
+            evt = state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(step_id, definition_id, None))
+            return (evt, state)
+        async def complete_definition_in_group(run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue, _: CompletedResult | None):
+            return await apply_complete_definition_in_group(run_id, group_id, step_id, definition_id)
+        self._complete_definition = complete_definition or complete_definition_in_group
+
+    async def _stored_step_ids(self, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]) -> Result[dict[DefinitionIdValue, StepIdValue], str]:
+        stored_definition_ids = [res.definition_id for res in results if res.value is None]
+        if not stored_definition_ids:
+            return Result.Ok({})
+        # Step IDs of completed definitions name their results, the group is read once when its results are consumed
+        state = await self._get_state(run_id, group_id)
+        if state is None:
+            return Result.Error(f"Group {group_id} of run {run_id} not found")
+        step_ids: dict[DefinitionIdValue, StepIdValue] = {}
+        for definition_id in stored_definition_ids:
+            opt_step_id = state.step_id_of(definition_id)
+            if opt_step_id is None:
+                return Result.Error(f"Step id of completed definition {definition_id} of group {group_id} not found")
+            step_ids[definition_id] = opt_step_id
+        return Result.Ok(step_ids)
+
+    async def _stream(self, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...], step_ids: dict[DefinitionIdValue, StepIdValue]):
+        for start in range(0, len(results), READ_BATCH_SIZE):
+            batch = results[start:start + READ_BATCH_SIZE]
+            stored_results = iter(await self._results_store.get_many(run_id, group_id, [(step_ids[res.definition_id], res.definition_id) for res in batch if res.value is None]))
+            for res in batch:
+                if res.value is not None:
+                    yield res
+                    continue
+                opt_result = next(stored_results)
+                if opt_result is None:
+                    raise NotFoundException()
+                yield DefinitionIdWithValue[CompletedResult | None](res.definition_id, opt_result)
+
+    async def stream_results(self, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]) -> Result[AsyncIterator[DefinitionIdWithValue[CompletedResult | None]], str]:
+        '''
+        Streams results of AllDefinitionsCompleted in their order, results stored in results store are read in batches while they are iterated.
+        Iteration raises NotFoundException when stored result is missing.
+        '''
+        step_ids_res = await self._stored_step_ids(run_id, group_id, results)
+        return step_ids_res.map(lambda step_ids: self._stream(run_id, group_id, results, step_ids))
+
+    async def delete_results(self, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]) -> None:
+        step_ids_res = await self._stored_step_ids(run_id, group_id, results)
+        for definition_id, step_id in step_ids_res.default_value({}).items():
+            await self._results_store.delete(run_id, group_id, step_id, definition_id)
+
+    async def __call__(self, run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue, result: CompletedResult | None) -> GroupOfRunningDefinitionsState.Events.Event | None:
+        if result is not None:
+            await self._results_store.add(run_id, group_id, step_id, definition_id, result)
+        evt = await self._complete_definition(run_id, group_id, step_id, definition_id, None)
+        match evt:
+            case GroupOfRunningDefinitionsState.Events.DefinitionCompleted():
+                return GroupOfRunningDefinitionsState.Events.DefinitionCompleted(definition_id, result)
+            case _:
+                return evt
+
+async def read_group_results(group_results: GroupResults, run_id: RunIdValue, group_id: GroupIdValue, results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]) -> Result[list[dict[str, Any]], str]:
+    '''
+    Converts results of AllDefinitionsCompleted to data of completed group.
+    Stored results are not deleted, so they can be read again until consumer of the data deletes them.
+    '''
+    stream_res = await group_results.stream_results(run_id, group_id, results)
+    if stream_res.is_error():
+        return Result.Error(stream_res.error)
+    try:
+        all_results = [{"definition_id": def_res.definition_id.to_value_with_checksum()} | CompletedResultAdapter.to_dict(def_res.value) async for def_res in stream_res.ok]
+    except Exception as ex:
+        return Result.Error(f"Results of group {group_id} of run {run_id} failed to read: {ex}")
+    return Result.Ok(all_results)
@@ -0,0 +1,108 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass
+from typing import Any, Concatenate
+
+from shared.completedresult import CompletedResult
+from shared.customtypes import DefinitionIdValue, RunIdValue, StepIdValue
+from shared.definitioncustomtypes import GroupIdValue
+from shared.groupofrunningdefinitions import CompletedDefinition, GroupOfRunningDefinitionsState
+from shared.groupofrunningdefinitionsshard import GroupOfRunningDefinitionsShardState, num_of_definitions_in_shard, shard_of
+from shared.infrastructure.storage.repository import AlreadyExistsException, NotFoundException
+from shared.utils.lrucache import LruCache
+
+type ToStorageActionConverter[**P] = Callable[[Callable[Concatenate[GroupOfRunningDefinitionsState | None, P], tuple[GroupOfRunningDefinitionsState.Events.Event | None, GroupOfRunningDefinitionsState]]], Callable[Concatenate[RunIdValue, GroupIdValue, P], Coroutine[Any, Any, GroupOfRunningDefinitionsState.Events.Event | None]]]
+type ToShardStorageActionConverter[**P] = Callable[[Callable[Concatenate[GroupOfRunningDefinitionsShardState | None, P], tuple[GroupOfRunningDefinitionsShardState.Events.Event | None, GroupOfRunningDefinitionsShardState]]], Callable[Concatenate[RunIdValue, GroupIdValue, int, P], Coroutine[Any, Any, GroupOfRunningDefinitionsShardState.Events.Event | None]]]
+type GetGroupState = Callable[[RunIdValue, GroupIdValue], Coroutine[Any, Any, GroupOfRunningDefinitionsState | None]]
+type CompleteGroupDefinition = Callable[[RunIdValue, GroupIdValue, StepIdValue, DefinitionIdValue, CompletedResult | None], Coroutine[Any, Any, GroupOfRunningDefinitionsState.Events.Event | None]]
+
+@dataclass(frozen=True)
+class _RunningGroup:
+    step_ids: dict[DefinitionIdValue, StepIdValue | None]
+    num_of_definitions_in_shards: tuple[int, ...]
+
+class ShardedGroupCompletion:
+    '''
+    Completes definitions of a group in shards of the group, so concurrent completions of a large group
+    update different shard items instead of contending for the single group item.
+
+    The group item is only read to validate completion and it is updated once per shard,
+    when all definitions of the shard are completed, which is where AllDefinitionsCompleted is detected.
+    Step IDs and shard sizes of running group do not change, so they are read from the group once and cached.
+    Raises NotFoundException when the group does not exist.
+    '''
+    def __init__(self, get_state: GetGroupState, convert_to_storage_action: ToStorageActionConverter, convert_to_shard_storage_action: ToShardStorageActionConverter, num_of_shards: int, cache_max_size: int = 1000):
+        if num_of_shards < 1:
+            raise ValueError("num_of_shards must be greater than 0")
+        self._get_state = get_state
+        self._num_of_shards = num_of_shards
+        self._running_groups = LruCache[str, _RunningGroup](cache_max_size)
+        # Concurrent completions of not cached group wait for a single read of the group, reads of different groups run in parallel
+        self._reads: dict[str, asyncio.Task[_RunningGroup]] = {}
+        @convert_to_shard_storage_action
+        def apply_complete_shard_definition(state: GroupOfRunningDefinitionsShardState | None, cmd: GroupOfRunningDefinitionsShardState.Commands.CompleteDefinition):
+            shard_state = state or GroupOfRunningDefinitionsShardState()
+            evt = shard_state.apply_command(cmd)
+            return (evt, shard_state)
+        @convert_to_storage_action
+        def apply_complete_definitions(state: GroupOfRunningDefinitionsState | None, definitions: tuple[CompletedDefinition, ...]):
+            if state is None:
+                raise NotFoundException()
+            evt = state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinitions(definitions))
+            return (evt, state)
+        self._apply_complete_shard_definition = apply_complete_shard_definition
+        self._apply_complete_definitions = apply_complete_definitions
+
+    async def _get_running_group(self, run_id: RunIdValue, group_id: GroupIdValue):
+        id_str = f"{run_id}_{group_id}"
+        opt_running_group = self._running_groups.get(id_str)
+        if opt_running_group is not None:
+            return opt_running_group
+        read_task = self._reads.get(id_str)
+        if read_task is None:
+            read_task = asyncio.create_task(self._read_running_group(id_str, run_id, group_id))
+            self._reads[id_str] = read_task
+            read_task.add_done_callback(lambda task: self._read_done(id_str, task))
+        # Cancelled completion does not cancel the read other completions of the group wait for
+        return await asyncio.shield(read_task)
+
+    def _read_done(self, id_str: str, task: asyncio.Task[_RunningGroup]):
+        self._reads.pop(id_str, None)
+        if not task.cancelled():
+            # Exception is raised to waiting completions, it is retrieved here in case all of them are cancelled
+            task.exception()
+
+    async def _read_running_group(self, id_str: str, run_id: RunIdValue, group_id: GroupIdValue):
+        state = await self._get_state(run_id, group_id)
+        if state is None:
+            raise NotFoundException()
+        definitions = state.get_definitions()
+        running_group = _RunningGroup(
+            {d.definition_id: state.step_id_of(d.definition_id) for d in definitions},
+            tuple(num_of_definitions_in_shard(definitions, shard, self._num_of_shards) for shard in range(self._num_of_shards))
+        )
+        # Group which is not running yet has no step IDs to validate against, so it is read again next time
+        if definitions and all(running_group.step_ids.values()):
+            self._running_groups.set(id_str, running_group)
+        return running_group
+
+    async def __call__(self, run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue, result: CompletedResult | None) -> GroupOfRunningDefinitionsState.Events.Event | None:
+        running_group = await self._get_running_group(run_id, group_id)
+        # The group item stays the authority, completion of failed group is rejected when shard is completed in the group
+        if running_group.step_ids.get(definition_id) != step_id:
+            return None
+        shard = shard_of(definition_id, self._num_of_shards)
+        num_of_definitions = running_group.num_of_definitions_in_shards[shard]
+        complete_cmd = GroupOfRunningDefinitionsShardState.Commands.CompleteDefinition(step_id, definition_id, result, num_of_definitions)
+        try:
+            shard_evt = await self._apply_complete_shard_definition(run_id, group_id, shard, complete_cmd)
+        except AlreadyExistsException:
+            # Shard item was created by concurrent completion meanwhile, so the completion is applied to it
+            shard_evt = await self._apply_complete_shard_definition(run_id, group_id, shard, complete_cmd)
+        match shard_evt:
+            case GroupOfRunningDefinitionsShardState.Events.ShardCompleted(definitions=definitions):
+                return await self._apply_complete_definitions(run_id, group_id, definitions)
+            case GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted():
+                return GroupOfRunningDefinitionsState.Events.DefinitionCompleted(definition_id, result)
+            case _:
+                return None
@@ -0,0 +1,84 @@
+from collections.abc import Iterable
+import hashlib
+import json
+
+from expression import Result
+
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
+from shared.definition import Definition, DefinitionAdapter
+from shared.infrastructure.serialization.format import create_serializer
+from shared.infrastructure.storage.repository import AlreadyExistsException
+from shared.utils.lrucache import CacheInfo, LruCache
+
+class DefinitionBlobs:
+    '''
+    Content addressed store of definitions referenced by running definition states.
+
+    Each definition is stored once as an item named after the hash of its content in the storage backend and format
+    of running definitions, so running definition state events carry the hash instead of the whole definition.
+    Blobs are never changed after they are written, so loaded definitions are cached and shared by all running
+    definition states without invalidation.
+
+    Blobs are shared by running definition states of every run and they are retained forever,
+    deleting running definition state does not delete blob of its definition.
+    '''
+    def __init__(self, folder_path: str, storage_settings: StorageSettings = StorageSettings(), cache_max_size: int = 1000):
+        self._repo = create_repository_with_version(
+            storage_settings,
+            "DefinitionBlobs",
+            DefinitionAdapter.to_list,
+            DefinitionAdapter.from_list,
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
+            folder_path,
+            1
+        )
+        # Definitions which are known to be stored, by ref
+        self._definitions = LruCache[str, Definition](cache_max_size)
+        # Cached definition is kept alive together with its id, so the id is not reused by another object
+        self._refs = LruCache[int, tuple[Definition, str]](cache_max_size)
+
+    def cache_info(self) -> CacheInfo:
+        return self._definitions.info()
+
+    def ref(self, definition: Definition) -> str:
+        '''Returns hash of definition content without storing the definition.'''
+        opt_ref = self._refs.get(id(definition))
+        if opt_ref is not None and opt_ref[0] is definition:
+            return opt_ref[1]
+        data = json.dumps(DefinitionAdapter.to_list(definition), sort_keys=True, separators=(",", ":")).encode()
+        ref = hashlib.sha256(data).hexdigest()
+        self._refs.set(id(definition), (definition, ref))
+        return ref
+
+    async def add(self, definition: Definition) -> str:
+        '''Stores definition unless it is stored already and returns its ref.'''
+        ref = self.ref(definition)
+        if self._definitions.get(ref) is not None:
+            return ref
+        try:
+            await self._repo.add(ref, definition)
+        except AlreadyExistsException:
+            # Stored before by this or another process
+            pass
+        self._definitions.set(ref, definition)
+        return ref
+
+    async def load(self, refs: Iterable[str]) -> None:
+        '''Loads definitions of refs which are not cached, so get returns them. Missing definitions are skipped.'''
+        for ref in refs:
+            if self._definitions.get(ref) is not None:
+                continue
+            opt_ver_with_definition = await self._repo.get(ref)
+            if opt_ver_with_definition is None:
+                continue
+            definition = opt_ver_with_definition[1]
+            self._definitions.set(ref, definition)
+            self._refs.set(id(definition), (definition, ref))
+
+    def get(self, ref: str) -> Result[Definition, str]:
+        '''Returns definition stored or loaded before.'''
+        opt_definition = self._definitions.get(ref)
+        if opt_definition is None:
+            return Result.Error(f"definition {ref} is missing")
+        return Result.Ok(opt_definition)
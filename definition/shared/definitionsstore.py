@@ -4,10 +4,10 @@ from typing import Any
 
 from expression import Result
 
-from infrastructure.persistence.filesystem.filewithversion import FileWithVersion
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import DefinitionIdValue
 from shared.definition import Definition, DefinitionAdapter
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
 from shared.infrastructure.storage.repository import AlreadyExistsException, NotFoundError, NotFoundException, StorageError
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 from shared.utils.exceptiondecorators import async_ex_to_error_result
@@ -17,12 +17,14 @@ import config
 class DefinitionsStore[T]:
     def __init__(self, items_sub_folder_name: str, to_list: Callable[[T], list[dict[str, Any]]], from_list: Callable[[list[dict[str, Any]]], Result[T, Any]]):
         folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "DefinitionsStorage")
-        file_repo_with_ver = FileWithVersion[DefinitionIdValue, T, list[dict[str, Any]]](
+        storage_settings = StorageSettings.from_env("DEFINITIONS")
+        file_repo_with_ver = create_repository_with_version(
+            storage_settings,
             items_sub_folder_name,
             to_list,
             from_list,
-            JsonSerializer[list[dict[str, Any]]](),
-            "json",
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
             folder_path
         )
         self._file_repo_with_ver = file_repo_with_ver
@@ -23,6 +23,11 @@ class RunningDefinition(NamedTuple):
     definition_id: DefinitionIdValue
     definition: Definition
 
+class CompletedDefinition(NamedTuple):
+    step_id: StepIdValue
+    definition_id: DefinitionIdValue
+    result: CompletedResult | None
+
 class GroupOfRunningDefinitionsState:
     class Commands:
         class Command:
@@ -36,12 +41,16 @@ class GroupOfRunningDefinitionsState:
         class CompleteDefinition(Command):
             step_id: StepIdValue
             definition_id: DefinitionIdValue
-            result: CompletedResult
+            # None when the result is stored out of line, so the group keeps only which definitions are completed
+            result: CompletedResult | None
+        @dataclass(frozen=True)
+        class CompleteDefinitions(Command):
+            definitions: tuple[CompletedDefinition, ...]
         @dataclass(frozen=True)
         class Fail(Command):
             error: Error
     class Events:
-        type Event = DefinitionsAdded | DefinitionsRunning | DefinitionCompleted | AllDefinitionsCompleted | Failed
+        type Event = DefinitionsAdded | DefinitionsRunning | DefinitionCompleted | DefinitionsCompleted | AllDefinitionsCompleted | Failed
         @dataclass(frozen=True)
         class DefinitionsAdded:
             definitions: tuple[DefinitionIdWithValue[Definition], ...]
@@ -51,49 +60,72 @@ class GroupOfRunningDefinitionsState:
         @dataclass(frozen=True)
         class DefinitionCompleted:
             definition_id: DefinitionIdValue
-            result: CompletedResult
+            result: CompletedResult | None
+        @dataclass(frozen=True)
+        class DefinitionsCompleted:
+            results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]
         @dataclass(frozen=True)
         class AllDefinitionsCompleted:
-            results: tuple[DefinitionIdWithValue[CompletedResult], ...]
+            results: tuple[DefinitionIdWithValue[CompletedResult | None], ...]
         @dataclass(frozen=True)
         class Failed:
             error: Error
     
     def __init__(self):
-        # Immutable event journal (source of truth)
-        self._events: tuple[GroupOfRunningDefinitionsState.Events.Event, ...] = ()
+        # Append-only event journal (source of truth), exposed as immutable tuple by get_events
+        self._events: list[GroupOfRunningDefinitionsState.Events.Event] = []
         # Source of truth for available definitions
         self._definitions: tuple[DefinitionIdWithValue[Definition], ...] = ()
-        # Projection of actively executing definitions
-        self._running_definitions: tuple[DefinitionIdWithValue[StepIdValue], ...] = ()
-        # Projection of finished definitions tracking their assigned step IDs
-        self._completed_definitions: tuple[DefinitionIdWithValue[StepIdValue], ...] = ()
+        # Projection of actively executing definitions, step ID by definition ID
+        self._running_definitions: dict[DefinitionIdValue, StepIdValue] = {}
+        # Projection of finished definitions tracking their assigned step IDs, step ID by definition ID
+        self._completed_definitions: dict[DefinitionIdValue, StepIdValue] = {}
+        # Projection of completed results in journal order
+        self._completed_results: list[DefinitionIdWithValue[CompletedResult | None]] = []
     
     @staticmethod
     def apply(state: "GroupOfRunningDefinitionsState", evt: Events.Event) -> "GroupOfRunningDefinitionsState":
-        state._events += (evt,)
+        state._events.append(evt)
         match evt:
             case GroupOfRunningDefinitionsState.Events.DefinitionsAdded(definitions=defs):
                 state._definitions = defs
             case GroupOfRunningDefinitionsState.Events.DefinitionsRunning(definitions=running_defs):
                 # Convert domain RunningDefinition to lightweight tracking entries
-                state._running_definitions = tuple(
-                    DefinitionIdWithValue(rd.definition_id, rd.step_id) for rd in running_defs
-                )
-            case GroupOfRunningDefinitionsState.Events.DefinitionCompleted(definition_id=def_id, result=_):
-                # Move running entry to completed projection to preserve step_id
-                entry = next((e for e in state._running_definitions if e.definition_id == def_id), None)
-                state._running_definitions = tuple(e for e in state._running_definitions if e.definition_id != def_id)
-                if entry:
-                    state._completed_definitions += (entry,)
+                state._running_definitions = {rd.definition_id: rd.step_id for rd in running_defs}
+            case GroupOfRunningDefinitionsState.Events.DefinitionCompleted(definition_id=def_id, result=result):
+                state._apply_definition_completed(def_id, result)
+            case GroupOfRunningDefinitionsState.Events.DefinitionsCompleted(results=results):
+                for def_id, result in results:
+                    state._apply_definition_completed(def_id, result)
             case GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted():
                 # Terminal marker added to journal; no projection updates required
                 pass
             case GroupOfRunningDefinitionsState.Events.Failed(_):
                 # Terminal failure: clear active tracking
-                state._running_definitions = ()
+                state._running_definitions = {}
         return state
     
+    def _apply_definition_completed(self, def_id: DefinitionIdValue, result: CompletedResult | None):
+        # Move running entry to completed projection to preserve step_id
+        step_id = self._running_definitions.pop(def_id, None)
+        if step_id is not None:
+            self._completed_definitions[def_id] = step_id
+        self._completed_results.append(DefinitionIdWithValue(def_id, result))
+    
+    def _is_all_definitions_completed(self):
+        return len(self._completed_definitions) == len(self._definitions)
+    
+    def _complete_all_definitions(self) -> "GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted":
+        # Results for the return value are projected from completion events of the journal
+        all_results = tuple(self._completed_results)
+        
+        # Add terminal marker to journal with empty results to save space
+        all_completed_evt = GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(())
+        GroupOfRunningDefinitionsState.apply(self, all_completed_evt)
+        
+        # Return the event with filled results to the caller
+        return GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(all_results)
+    
     def apply_command(self, cmd: Commands.Command) -> Events.Event | None:
         match cmd:
             case GroupOfRunningDefinitionsState.Commands.SetDefinitions(definitions=definitions):
@@ -118,23 +150,18 @@ class GroupOfRunningDefinitionsState:
                 completion_evt = GroupOfRunningDefinitionsState.Events.DefinitionCompleted(def_id, result)
                 
                 # Idempotency guard: check if definition is already completed
-                completed_entry = next((e for e in self._completed_definitions if e.definition_id == def_id), None)
-                if completed_entry is not None:
+                completed_step_id = self._completed_definitions.get(def_id)
+                if completed_step_id is not None:
                     # Strict step_id verification for idempotent calls
-                    if completed_entry.value != step_id:
+                    if completed_step_id != step_id:
                         return None
                     # If group is fully completed, return terminal marker with filled results
-                    if len(self._completed_definitions) == len(self._definitions):
-                        # Reconstruct results from the event journal
-                        all_results = tuple(
-                            DefinitionIdWithValue(e.definition_id, e.result)
-                            for e in self._events if type(e) is GroupOfRunningDefinitionsState.Events.DefinitionCompleted
-                        )
-                        return GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(all_results)
+                    if self._is_all_definitions_completed():
+                        return GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(tuple(self._completed_results))
                     return completion_evt
                 
                 # Validate step_id against currently running definitions
-                current_step = next((entry.value for entry in self._running_definitions if entry.definition_id == def_id), None)
+                current_step = self._running_definitions.get(def_id)
                 if current_step != step_id:
                     return None
                 
@@ -142,20 +169,25 @@ class GroupOfRunningDefinitionsState:
                 GroupOfRunningDefinitionsState.apply(self, completion_evt)
 
                 # Check terminal condition: all definitions completed
-                if len(self._completed_definitions) == len(self._definitions):
-                    # Reconstruct results for the return value based on current state of events
-                    all_results = tuple(
-                        DefinitionIdWithValue(e.definition_id, e.result)
-                        for e in self._events if type(e) is GroupOfRunningDefinitionsState.Events.DefinitionCompleted
-                    )
-                    
-                    # Add terminal marker to journal with empty results to save space
-                    all_completed_evt = GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(())
-                    GroupOfRunningDefinitionsState.apply(self, all_completed_evt)
-                    
-                    # Return the event with filled results to the caller
-                    return GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(all_results)
+                if self._is_all_definitions_completed():
+                    return self._complete_all_definitions()
+
+                return completion_evt
 
+            case GroupOfRunningDefinitionsState.Commands.CompleteDefinitions(definitions=completed_defs):
+                # Definitions completed before (e.g. by retried command) are skipped, step_id is verified as for single definition
+                running_defs = tuple(d for d in completed_defs if self._running_definitions.get(d.definition_id) == d.step_id)
+                if not running_defs:
+                    is_completed_before = all(self._completed_definitions.get(d.definition_id) == d.step_id for d in completed_defs)
+                    if is_completed_before and self._is_all_definitions_completed():
+                        return GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(tuple(self._completed_results))
+                    return None
+                completion_evt = GroupOfRunningDefinitionsState.Events.DefinitionsCompleted(
+                    tuple(DefinitionIdWithValue(d.definition_id, d.result) for d in running_defs)
+                )
+                GroupOfRunningDefinitionsState.apply(self, completion_evt)
+                if self._is_all_definitions_completed():
+                    return self._complete_all_definitions()
                 return completion_evt
 
             case GroupOfRunningDefinitionsState.Commands.Fail(error=error):
@@ -168,12 +200,20 @@ class GroupOfRunningDefinitionsState:
         raise ValueError(f"Unknown command {cmd}")
 
     def get_events(self) -> tuple[Events.Event, ...]:
-        return self._events
+        return tuple(self._events)
+    
+    def get_definitions(self) -> tuple[DefinitionIdWithValue[Definition], ...]:
+        return self._definitions
+    
+    def step_id_of(self, definition_id: DefinitionIdValue) -> StepIdValue | None:
+        '''Step ID of running or completed definition'''
+        return self._running_definitions.get(definition_id) or self._completed_definitions.get(definition_id)
 
 class GroupOfRunningDefinitionsStateEventDtoTypes(StrEnum):
     DEFINITIONS_ADDED = GroupOfRunningDefinitionsState.Events.DefinitionsAdded.__name__.lower()
     DEFINITIONS_RUNNING = GroupOfRunningDefinitionsState.Events.DefinitionsRunning.__name__.lower()
     DEFINITION_COMPLETED = GroupOfRunningDefinitionsState.Events.DefinitionCompleted.__name__.lower()
+    DEFINITIONS_COMPLETED = GroupOfRunningDefinitionsState.Events.DefinitionsCompleted.__name__.lower()
     ALL_DEFINITIONS_COMPLETED = GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted.__name__.lower()
     FAILED = GroupOfRunningDefinitionsState.Events.Failed.__name__.lower()
 
@@ -188,6 +228,8 @@ class GroupOfRunningDefinitionsStateEventDtoTypes(StrEnum):
                 return GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITIONS_RUNNING
             case GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITION_COMPLETED:
                 return GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITION_COMPLETED
+            case GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITIONS_COMPLETED:
+                return GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITIONS_COMPLETED
             case GroupOfRunningDefinitionsStateEventDtoTypes.ALL_DEFINITIONS_COMPLETED:
                 return GroupOfRunningDefinitionsStateEventDtoTypes.ALL_DEFINITIONS_COMPLETED
             case GroupOfRunningDefinitionsStateEventDtoTypes.FAILED:
@@ -195,6 +237,16 @@ class GroupOfRunningDefinitionsStateEventDtoTypes(StrEnum):
             case _:
                 return None
 
+def parse_optional_result(raw_dict: dict[str, Any]) -> Result[CompletedResult | None, str]:
+    # Result stored out of line is missing in the dto
+    if "result" not in raw_dict:
+        return Result.Ok(None)
+    raw_result_res = parse_from_dict(raw_dict, "result", lambda raw_result: raw_result if isinstance(raw_result, dict) else None)
+    return raw_result_res.bind(CompletedResultAdapter.from_dict)
+
+def optional_result_to_dict(result: CompletedResult | None) -> dict[str, Any]:
+    return {"result": CompletedResultAdapter.to_dict(result)} if result is not None else {}
+
 class GroupOfRunningDefinitionsStateEventAdapter:
     @effect.result[GroupOfRunningDefinitionsState.Events.Event, str]()
     @staticmethod
@@ -229,10 +281,20 @@ class GroupOfRunningDefinitionsStateEventAdapter:
 
             case GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITION_COMPLETED:
                 def_id = yield from parse_from_dict(raw_event_dict, "definition_id", DefinitionIdValue.from_value)
-                raw_result = yield from parse_from_dict(raw_event_dict, "result", lambda raw_result: raw_result if isinstance(raw_result, dict) else None)
-                result = yield from CompletedResultAdapter.from_dict(raw_result)
+                result = yield from parse_optional_result(raw_event_dict)
                 return GroupOfRunningDefinitionsState.Events.DefinitionCompleted(def_id, result)
 
+            case GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITIONS_COMPLETED:
+                raw_results = yield from parse_from_dict(raw_event_dict, "results", lambda raw_results: raw_results if isinstance(raw_results, list) and raw_results else None)
+                @effect.result[DefinitionIdWithValue[CompletedResult | None], str]()
+                def parse_result_with_id(raw_data) -> Generator[Any, Any, DefinitionIdWithValue[CompletedResult | None]]:
+                    raw_result_with_id = yield from parse_value(raw_data, "results", lambda raw_data: raw_data if isinstance(raw_data, dict) and "definition_id" in raw_data else None)
+                    def_id = yield from parse_from_dict(raw_result_with_id, "definition_id", DefinitionIdValue.from_value)
+                    result = yield from parse_optional_result(raw_result_with_id)
+                    return DefinitionIdWithValue(def_id, result)
+                results = yield from traverse(parse_result_with_id, Block(raw_results)).map(tuple)
+                return GroupOfRunningDefinitionsState.Events.DefinitionsCompleted(results)
+
             case GroupOfRunningDefinitionsStateEventDtoTypes.ALL_DEFINITIONS_COMPLETED:
                 # Accepts empty tuple as per domain contract
                 return GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(())
@@ -270,8 +332,15 @@ class GroupOfRunningDefinitionsStateEventAdapter:
             case GroupOfRunningDefinitionsState.Events.DefinitionCompleted(definition_id=def_id, result=result):
                 return {
                     "type": GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITION_COMPLETED.value,
-                    "definition_id": def_id,
-                    "result": CompletedResultAdapter.to_dict(result)
+                    "definition_id": def_id
+                } | optional_result_to_dict(result)
+            case GroupOfRunningDefinitionsState.Events.DefinitionsCompleted(results=results):
+                return {
+                    "type": GroupOfRunningDefinitionsStateEventDtoTypes.DEFINITIONS_COMPLETED.value,
+                    "results": [
+                        {"definition_id": r.definition_id} | optional_result_to_dict(r.value)
+                        for r in results
+                    ]
                 }
             case GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted():
                 return {
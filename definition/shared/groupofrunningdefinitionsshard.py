@@ -0,0 +1,133 @@
+from collections.abc import Generator
+from dataclasses import dataclass
+from enum import StrEnum
+import functools
+from typing import Any
+import zlib
+
+from expression import Result, effect
+from expression.collections.block import Block
+from expression.extra.result.traversable import traverse
+
+from shared.completedresult import CompletedResult
+from shared.customtypes import DefinitionIdValue, StepIdValue
+from shared.definition import Definition
+from shared.utils.parse import parse_from_dict, parse_value
+from shared.utils.string import strip_and_lowercase
+
+from .groupofrunningdefinitions import CompletedDefinition, DefinitionIdWithValue, optional_result_to_dict, parse_optional_result
+
+def shard_of(definition_id: DefinitionIdValue, num_of_shards: int) -> int:
+    # crc32 is the same in every process, unlike hash of str
+    return zlib.crc32(str(definition_id).encode()) % num_of_shards
+
+def num_of_definitions_in_shard(definitions: tuple[DefinitionIdWithValue[Definition], ...], shard: int, num_of_shards: int) -> int:
+    return sum(1 for d in definitions if shard_of(d.definition_id, num_of_shards) == shard)
+
+class GroupOfRunningDefinitionsShardState:
+    '''
+    Completed definitions of one shard of a group of running definitions.
+
+    Definitions of large group are completed in shards, so concurrent completions of different shards do not conflict.
+    ShardCompleted is returned once all definitions of the shard are completed, it is not stored in the journal.
+    '''
+    class Commands:
+        class Command:
+            pass
+        @dataclass(frozen=True)
+        class CompleteDefinition(Command):
+            step_id: StepIdValue
+            definition_id: DefinitionIdValue
+            result: CompletedResult | None
+            num_of_definitions_in_shard: int
+    class Events:
+        type Event = DefinitionCompleted | ShardCompleted
+        @dataclass(frozen=True)
+        class DefinitionCompleted:
+            step_id: StepIdValue
+            definition_id: DefinitionIdValue
+            result: CompletedResult | None
+        @dataclass(frozen=True)
+        class ShardCompleted:
+            definitions: tuple[CompletedDefinition, ...]
+
+    def __init__(self):
+        self._events: list[GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted] = []
+        # Projection of completed definitions by definition ID
+        self._completed_definitions: dict[DefinitionIdValue, CompletedDefinition] = {}
+
+    @staticmethod
+    def apply(state: "GroupOfRunningDefinitionsShardState", evt: Events.DefinitionCompleted) -> "GroupOfRunningDefinitionsShardState":
+        state._events.append(evt)
+        state._completed_definitions[evt.definition_id] = CompletedDefinition(evt.step_id, evt.definition_id, evt.result)
+        return state
+
+    def apply_command(self, cmd: Commands.Command) -> Events.Event | None:
+        match cmd:
+            case GroupOfRunningDefinitionsShardState.Commands.CompleteDefinition(step_id=step_id, definition_id=def_id, result=result, num_of_definitions_in_shard=num_of_definitions):
+                completion_evt = GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted(step_id, def_id, result)
+                completed_def = self._completed_definitions.get(def_id)
+                if completed_def is None:
+                    GroupOfRunningDefinitionsShardState.apply(self, completion_evt)
+                elif completed_def.step_id != step_id:
+                    return None
+                # Completed shard is returned again for retried command, so the group is eventually updated
+                if len(self._completed_definitions) >= num_of_definitions:
+                    return GroupOfRunningDefinitionsShardState.Events.ShardCompleted(tuple(self._completed_definitions.values()))
+                return completion_evt
+        raise ValueError(f"Unknown command {cmd}")
+
+    def get_events(self) -> tuple[Events.DefinitionCompleted, ...]:
+        return tuple(self._events)
+
+class GroupOfRunningDefinitionsShardStateEventDtoTypes(StrEnum):
+    DEFINITION_COMPLETED = GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted.__name__.lower()
+
+    @staticmethod
+    def parse(event_type: str) -> "GroupOfRunningDefinitionsShardStateEventDtoTypes | None":
+        if event_type is None:
+            return None
+        match strip_and_lowercase(event_type):
+            case GroupOfRunningDefinitionsShardStateEventDtoTypes.DEFINITION_COMPLETED:
+                return GroupOfRunningDefinitionsShardStateEventDtoTypes.DEFINITION_COMPLETED
+            case _:
+                return None
+
+class GroupOfRunningDefinitionsShardStateEventAdapter:
+    @effect.result[GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted, str]()
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> Generator[Any, Any, GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted]:
+        raw_event_dict = yield from Result.Ok(data) if isinstance(data, dict) and data else Result.Error("data is invalid")
+        raw_event_type = yield from Result.Ok(raw_event_dict["type"]) if "type" in raw_event_dict else Result.Error("event type is missing")
+        event_type = GroupOfRunningDefinitionsShardStateEventDtoTypes.parse(raw_event_type)
+
+        match event_type:
+            case GroupOfRunningDefinitionsShardStateEventDtoTypes.DEFINITION_COMPLETED:
+                step_id = yield from parse_from_dict(raw_event_dict, "step_id", StepIdValue.from_value)
+                def_id = yield from parse_from_dict(raw_event_dict, "definition_id", DefinitionIdValue.from_value)
+                result = yield from parse_optional_result(raw_event_dict)
+                return GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted(step_id, def_id, result)
+
+            case _:
+                yield from Result.Error(f"event type {raw_event_type} is invalid")
+                raise RuntimeError("event type is invalid")
+
+    @staticmethod
+    def to_dict(evt: GroupOfRunningDefinitionsShardState.Events.DefinitionCompleted) -> dict[str, Any]:
+        return {
+            "type": GroupOfRunningDefinitionsShardStateEventDtoTypes.DEFINITION_COMPLETED.value,
+            "step_id": evt.step_id,
+            "definition_id": evt.definition_id
+        } | optional_result_to_dict(evt.result)
+
+class GroupOfRunningDefinitionsShardStateAdapter:
+    @effect.result[GroupOfRunningDefinitionsShardState, str]()
+    @staticmethod
+    def from_list(data: list[dict[str, Any]]) -> Generator[Any, Any, GroupOfRunningDefinitionsShardState]:
+        raw_events = yield from parse_value(data, "data", lambda raw_data: raw_data if isinstance(raw_data, list) and raw_data else None)
+        events = yield from traverse(GroupOfRunningDefinitionsShardStateEventAdapter.from_dict, Block(raw_events)).map(tuple)
+        return functools.reduce(GroupOfRunningDefinitionsShardState.apply, events, GroupOfRunningDefinitionsShardState())
+
+    @staticmethod
+    def to_list(state: GroupOfRunningDefinitionsShardState):
+        return [GroupOfRunningDefinitionsShardStateEventAdapter.to_dict(evt) for evt in state.get_events()]
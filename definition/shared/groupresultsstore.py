@@ -0,0 +1,54 @@
+from collections.abc import Sequence
+import os
+
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
+from shared.completedresult import CompletedResult, CompletedResultAdapter
+from shared.customtypes import DefinitionIdValue, IdValue, RunIdValue, StepIdValue
+from shared.definitioncustomtypes import GroupIdValue
+from shared.infrastructure.serialization.format import create_serializer
+from shared.infrastructure.storage.repository import AlreadyExistsException
+
+class GroupResultsStore:
+    '''
+    Results of completed definitions of groups, stored out of line of the group.
+
+    Each result is stored once as its own item in the storage backend and format of running definitions,
+    so completion of a definition does not rewrite results of other definitions and the group keeps only
+    which definitions are completed. Results are read back in batches only when all definitions of the group
+    are completed and they are deleted once they are consumed.
+    '''
+    def __init__(self, root_folder: str, storage_settings: StorageSettings = StorageSettings()):
+        self._repo = create_repository_with_version(
+            storage_settings,
+            "GroupResults",
+            CompletedResultAdapter.to_dict,
+            CompletedResultAdapter.from_dict,
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
+            os.path.join(root_folder, "DefinitionsStorage"),
+            1
+        )
+
+    @staticmethod
+    def _id(run_id: IdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue):
+        # Step ID is a part of the id, so result of stale completion does not replace result of running definition
+        return f"{run_id}_{group_id}_{definition_id}_{step_id}"
+
+    async def add(self, run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue, result: CompletedResult) -> None:
+        try:
+            await self._repo.add(self._id(run_id, group_id, step_id, definition_id), result)
+        except AlreadyExistsException:
+            # Retried completion stores the same result again
+            pass
+
+    async def get(self, run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue) -> CompletedResult | None:
+        opt_ver_with_result = await self._repo.get(self._id(run_id, group_id, step_id, definition_id))
+        return opt_ver_with_result[1] if opt_ver_with_result is not None else None
+
+    async def get_many(self, run_id: RunIdValue, group_id: GroupIdValue, definitions: Sequence[tuple[StepIdValue, DefinitionIdValue]]) -> list[CompletedResult | None]:
+        '''Returns results of definitions given by their step ids in their order'''
+        ids = [self._id(run_id, group_id, step_id, definition_id) for step_id, definition_id in definitions]
+        return [opt_ver_with_result[1] if opt_ver_with_result is not None else None for opt_ver_with_result in await self._repo.get_many(ids)]
+
+    async def delete(self, run_id: RunIdValue, group_id: GroupIdValue, step_id: StepIdValue, definition_id: DefinitionIdValue) -> None:
+        await self._repo.delete(self._id(run_id, group_id, step_id, definition_id))
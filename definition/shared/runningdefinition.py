@@ -1,5 +1,5 @@
 from __future__ import annotations
-from collections.abc import Generator
+from collections.abc import Callable, Generator
 from dataclasses import dataclass
 from enum import StrEnum
 import functools
@@ -15,7 +15,13 @@ from shared.definition import Definition, DefinitionAdapter, ActionDefinition, A
 from shared.completedresult import CompletedWith, CompletedResult
 from shared.utils.string import strip_and_lowercase
 
+# Snapshot of projected state is appended after this number of events, so loading from event log replays only the events after it.
+# Default keeps replay of a loaded state within 20 events for about 5% more events written
+SNAPSHOT_INTERVAL = 20
+
 class RunningDefinitionState:
+    # Set by services before states are created, e.g. from env
+    snapshot_interval = SNAPSHOT_INTERVAL
     class Commands:
         class Command:
             pass
@@ -39,7 +45,7 @@ class RunningDefinitionState:
         class Fail(Command):
             error: Error
     class Events:
-        type Event = DefinitionAdded | StepRunning | StepCanceled | StepFailed | StepCompleted | DefinitionCompleted | Failed
+        type Event = DefinitionAdded | StepRunning | StepCanceled | StepFailed | StepCompleted | DefinitionCompleted | Failed | Snapshot
         @dataclass(frozen=True)
         class DefinitionAdded:
             definition: Definition
@@ -68,23 +74,65 @@ class RunningDefinitionState:
         @dataclass(frozen=True)
         class Failed:
             error: Error
+        @dataclass(frozen=True)
+        class Snapshot:
+            '''Projected state of all previous events'''
+            definition: Definition
+            num_of_completed_steps: int
+            recent_completed_step_id: StepIdValue | None
+            recent_completed_result: CompletedResult | None
+            running_step_id: StepIdValue | None
     
     @staticmethod
     def apply(state: RunningDefinitionState, evt: RunningDefinitionState.Events.Event) -> RunningDefinitionState:
-        state._events += (evt,)
+        is_first_event = not state._events
+        state._events.append(evt)
+        state._num_of_events_since_snapshot += 1
         match evt:
+            case RunningDefinitionState.Events.DefinitionAdded(definition) if is_first_event:
+                state._definition = definition
             case RunningDefinitionState.Events.StepRunning(step_id, _):
                 state._running_step_id = step_id
             case RunningDefinitionState.Events.StepCanceled(_):
                 state._running_step_id = None
             case RunningDefinitionState.Events.StepFailed(_, _):
                 state._running_step_id = None
-            case RunningDefinitionState.Events.StepCompleted(step_id, _):
+            case RunningDefinitionState.Events.StepCompleted(step_id, result):
                 state._recent_completed_step_id = step_id
+                state._recent_completed_result = result
+                state._num_of_completed_steps += 1
                 state._running_step_id = None
+            case RunningDefinitionState.Events.Snapshot(definition, num_of_completed_steps, recent_completed_step_id, recent_completed_result, running_step_id):
+                state._definition = definition
+                state._num_of_completed_steps = num_of_completed_steps
+                state._recent_completed_step_id = recent_completed_step_id
+                state._recent_completed_result = recent_completed_result
+                state._running_step_id = running_step_id
+                state._num_of_events_since_snapshot = 0
         return state
+    
+    def _snapshot_if_needed(self):
+        if self._definition is None or self._num_of_events_since_snapshot < RunningDefinitionState.snapshot_interval:
+            return
+        # Completed and failed definitions are not changed anymore, so their final events are kept
+        if type(self._events[-1]) in (RunningDefinitionState.Events.DefinitionCompleted, RunningDefinitionState.Events.Failed):
+            return
+        snapshot = RunningDefinitionState.Events.Snapshot(
+            self._definition,
+            self._num_of_completed_steps,
+            self._recent_completed_step_id,
+            self._recent_completed_result,
+            self._running_step_id
+        )
+        RunningDefinitionState.apply(self, snapshot)
 
     def apply_command(self, cmd: Commands.Command) -> Events.Event | None:
+        evt = self._apply_command(cmd)
+        if evt is not None:
+            self._snapshot_if_needed()
+        return evt
+
+    def _apply_command(self, cmd: Commands.Command) -> Events.Event | None:
         match cmd:
             case RunningDefinitionState.Commands.SetDefinition(definition=definition):
                 has_definition = any(self._events)
@@ -94,7 +142,7 @@ class RunningDefinitionState:
                 RunningDefinitionState.apply(self, evt)
                 return evt
             case RunningDefinitionState.Commands.RunFirstStep():
-                definition = self._events[0].definition if any(self._events) and type(self._events[0]) is RunningDefinitionState.Events.DefinitionAdded else None
+                definition = self._definition
                 if definition is None:
                     return None
                 if self.running_step_id() is not None:
@@ -134,16 +182,16 @@ class RunningDefinitionState:
                 RunningDefinitionState.apply(self, evt)
                 return evt
             case RunningDefinitionState.Commands.RunNextStep():
-                definition = self._events[0].definition if any(self._events) and type(self._events[0]) is RunningDefinitionState.Events.DefinitionAdded else None
+                definition = self._definition
                 if definition is None:
                     return None
                 if self.running_step_id() is not None:
                     return None
-                if self.recent_completed_step_id() is None:
+                if self.recent_completed_step_id() is None or self._recent_completed_result is None:
                     return None
-                num_of_completed_steps = sum(1 for e in self._events if type(e) is RunningDefinitionState.Events.StepCompleted)
+                num_of_completed_steps = self._num_of_completed_steps
                 has_more_steps = len(definition.steps) > num_of_completed_steps
-                recent_step_completed_output = next((e.result for e in reversed(self._events) if type(e) is RunningDefinitionState.Events.StepCompleted))
+                recent_step_completed_output = self._recent_completed_result
                 is_recent_step_completed_with_data = type(recent_step_completed_output) is CompletedWith.Data
                 if has_more_steps and is_recent_step_completed_with_data:
                     match definition.steps[num_of_completed_steps]:
@@ -165,9 +213,15 @@ class RunningDefinitionState:
         raise ValueError(f"Unknown command {cmd}")
     
     def __init__(self):
-        self._events: tuple[RunningDefinitionState.Events.Event, ...] = ()
+        # Append-only event journal, exposed as immutable tuple by get_events
+        self._events: list[RunningDefinitionState.Events.Event] = []
         self._recent_completed_step_id: IdValue | None = None
         self._running_step_id: StepIdValue | None = None
+        # Projections of events, so commands do not scan events and events before snapshot are not needed
+        self._definition: Definition | None = None
+        self._num_of_completed_steps = 0
+        self._recent_completed_result: CompletedResult | None = None
+        self._num_of_events_since_snapshot = 0
 
     def recent_completed_step_id(self) -> IdValue | None:
         return self._recent_completed_step_id
@@ -175,8 +229,11 @@ class RunningDefinitionState:
     def running_step_id(self) -> StepIdValue | None:
         return self._running_step_id
     
-    def get_events(self):
-        return self._events
+    def definition(self) -> Definition | None:
+        return self._definition
+    
+    def get_events(self) -> tuple[Events.Event, ...]:
+        return tuple(self._events)
 
 class RunningDefinitionStateEventDtoTypes(StrEnum):
     DEFINITION_ADDED = RunningDefinitionState.Events.DefinitionAdded.__name__.lower()
@@ -186,6 +243,7 @@ class RunningDefinitionStateEventDtoTypes(StrEnum):
     STEP_COMPLETED = RunningDefinitionState.Events.StepCompleted.__name__.lower()
     DEFINITION_COMPLETED = RunningDefinitionState.Events.DefinitionCompleted.__name__.lower()
     FAILED = RunningDefinitionState.Events.Failed.__name__.lower()
+    SNAPSHOT = RunningDefinitionState.Events.Snapshot.__name__.lower()
 
     @staticmethod
     def parse(event_type: str) -> RunningDefinitionStateEventDtoTypes | None:
@@ -206,28 +264,53 @@ class RunningDefinitionStateEventDtoTypes(StrEnum):
                 return RunningDefinitionStateEventDtoTypes.DEFINITION_COMPLETED
             case RunningDefinitionStateEventDtoTypes.FAILED:
                 return RunningDefinitionStateEventDtoTypes.FAILED
+            case RunningDefinitionStateEventDtoTypes.SNAPSHOT:
+                return RunningDefinitionStateEventDtoTypes.SNAPSHOT
             case _:
                 return None
 
+# Definition is stored once outside of events and events reference it by its content hash
+type ToDefinitionRef = Callable[[Definition], str]
+type FromDefinitionRef = Callable[[str], Result[Definition, str]]
+
 class RunningDefinitionStateEventAdapter:
+    @effect.result[Definition, str]()
+    @staticmethod
+    def _definition_from_dict(raw_event_dict: dict[str, Any], from_definition_ref: FromDefinitionRef | None) -> Generator[Any, Any, Definition]:
+        if "definition_ref" in raw_event_dict:
+            from_ref = yield from Result.Ok(from_definition_ref) if from_definition_ref is not None else Result.Error("definition_ref can not be resolved")
+            return (yield from from_ref(raw_event_dict["definition_ref"]))
+        raw_definition = yield from Result.Ok(raw_event_dict["definition"]) if "definition" in raw_event_dict else Result.Error("definition is missing")
+        return (yield from DefinitionAdapter.from_list(raw_definition).map_error(str))
+
+    @staticmethod
+    def _definition_to_dict(definition: Definition, to_definition_ref: ToDefinitionRef | None) -> dict[str, Any]:
+        if to_definition_ref is not None:
+            return {"definition_ref": to_definition_ref(definition)}
+        return {"definition": DefinitionAdapter.to_list(definition)}
+
     @effect.result[RunningDefinitionState.Events.Event, str]()
     @staticmethod
-    def from_dict(data: dict[str, Any]) -> Generator[Any, Any, RunningDefinitionState.Events.Event]:
+    def from_dict(data: dict[str, Any], from_definition_ref: FromDefinitionRef | None = None) -> Generator[Any, Any, RunningDefinitionState.Events.Event]:
         raw_event_dict = yield from Result.Ok(data) if isinstance(data, dict) and data else Result.Error("data is invalid")
         raw_event_type = yield from Result.Ok(raw_event_dict["type"]) if "type" in raw_event_dict else Result.Error("event type is missing")
         event_type = RunningDefinitionStateEventDtoTypes.parse(raw_event_type)
         match event_type:
             case RunningDefinitionStateEventDtoTypes.DEFINITION_ADDED:
-                raw_definition = yield from Result.Ok(raw_event_dict["definition"]) if "definition" in raw_event_dict else Result.Error("definition is missing")
-                definition = yield from DefinitionAdapter.from_list(raw_definition).map_error(str)
+                definition = yield from RunningDefinitionStateEventAdapter._definition_from_dict(raw_event_dict, from_definition_ref)
                 return RunningDefinitionState.Events.DefinitionAdded(
                     definition=definition
                 )
             case RunningDefinitionStateEventDtoTypes.STEP_RUNNING:
                 raw_step_id = yield from Result.Ok(raw_event_dict["step_id"]) if "step_id" in raw_event_dict else Result.Error("step_id is missing")
                 step_id = StepIdValue(raw_step_id)
-                raw_step_definition = yield from Result.Ok(raw_event_dict["step_definition"]) if "step_definition" in raw_event_dict else Result.Error("step_definition is missing")
-                step_definition = yield from ActionDefinitionAdapter.from_dict(raw_step_definition).map_error(str)
+                if "step_index" in raw_event_dict:
+                    definition = yield from RunningDefinitionStateEventAdapter._definition_from_dict(raw_event_dict, from_definition_ref)
+                    raw_step_index = raw_event_dict["step_index"]
+                    step_definition = yield from Result.Ok(definition.steps[raw_step_index]) if isinstance(raw_step_index, int) and 0 <= raw_step_index < len(definition.steps) else Result.Error("step_index is invalid")
+                else:
+                    raw_step_definition = yield from Result.Ok(raw_event_dict["step_definition"]) if "step_definition" in raw_event_dict else Result.Error("step_definition is missing")
+                    step_definition = yield from ActionDefinitionAdapter.from_dict(raw_step_definition).map_error(str)
                 action_step_definition = yield from Result.Ok(step_definition) if isinstance(step_definition, ActionDefinition) else Result.Error("step_definition is invalid")
                 return RunningDefinitionState.Events.StepRunning(
                     step_id=step_id,
@@ -266,24 +349,46 @@ class RunningDefinitionStateEventAdapter:
                 return RunningDefinitionState.Events.Failed(
                     error=error
                 )
+            case RunningDefinitionStateEventDtoTypes.SNAPSHOT:
+                definition = yield from RunningDefinitionStateEventAdapter._definition_from_dict(raw_event_dict, from_definition_ref)
+                raw_num_of_completed_steps = raw_event_dict.get("num_of_completed_steps")
+                num_of_completed_steps = yield from Result.Ok(raw_num_of_completed_steps) if isinstance(raw_num_of_completed_steps, int) and raw_num_of_completed_steps >= 0 else Result.Error("num_of_completed_steps is invalid")
+                raw_recent_completed_step_id = raw_event_dict.get("recent_completed_step_id")
+                recent_completed_step_id = StepIdValue(raw_recent_completed_step_id) if raw_recent_completed_step_id is not None else None
+                raw_recent_completed_result = raw_event_dict.get("recent_completed_result")
+                recent_completed_result = (yield from CompletedResultAdapter.from_dict(raw_recent_completed_result)) if raw_recent_completed_result is not None else None
+                raw_running_step_id = raw_event_dict.get("running_step_id")
+                running_step_id = StepIdValue(raw_running_step_id) if raw_running_step_id is not None else None
+                return RunningDefinitionState.Events.Snapshot(
+                    definition=definition,
+                    num_of_completed_steps=num_of_completed_steps,
+                    recent_completed_step_id=recent_completed_step_id,
+                    recent_completed_result=recent_completed_result,
+                    running_step_id=running_step_id
+                )
             case _:
                 yield from Result.Error(f"event type {raw_event_type} is invalid")
                 raise RuntimeError("event type is invalid")
     
     @staticmethod
-    def to_dict(evt: RunningDefinitionState.Events.Event) -> dict[str, Any]:
+    def to_dict(evt: RunningDefinitionState.Events.Event, definition: Definition | None = None, to_definition_ref: ToDefinitionRef | None = None) -> dict[str, Any]:
         match evt:
             case RunningDefinitionState.Events.DefinitionAdded(definition=definition):
                 return {
-                    "type": RunningDefinitionStateEventDtoTypes.DEFINITION_ADDED.value,
-                    "definition": DefinitionAdapter.to_list(definition)
-                }
+                    "type": RunningDefinitionStateEventDtoTypes.DEFINITION_ADDED.value
+                } | RunningDefinitionStateEventAdapter._definition_to_dict(definition, to_definition_ref)
             case RunningDefinitionState.Events.StepRunning(step_id=step_id, step_definition=step_definition):
+                if definition is not None and to_definition_ref is not None and step_definition in definition.steps:
+                    step_dict = {
+                        "definition_ref": to_definition_ref(definition),
+                        "step_index": definition.steps.index(step_definition)
+                    }
+                else:
+                    step_dict = {"step_definition": ActionDefinitionAdapter.to_dict(step_definition)}
                 return {
                     "type": RunningDefinitionStateEventDtoTypes.STEP_RUNNING.value,
-                    "step_id": step_id,
-                    "step_definition": ActionDefinitionAdapter.to_dict(step_definition)
-                }
+                    "step_id": step_id
+                } | step_dict
             case RunningDefinitionState.Events.StepCanceled(step_id=step_id):
                 return {
                     "type": RunningDefinitionStateEventDtoTypes.STEP_CANCELED.value,
@@ -311,16 +416,35 @@ class RunningDefinitionStateEventAdapter:
                     "type": RunningDefinitionStateEventDtoTypes.FAILED.value,
                     "error": error.message
                 }
+            case RunningDefinitionState.Events.Snapshot(definition=definition, num_of_completed_steps=num_of_completed_steps, recent_completed_step_id=recent_completed_step_id, recent_completed_result=recent_completed_result, running_step_id=running_step_id):
+                return {
+                    "type": RunningDefinitionStateEventDtoTypes.SNAPSHOT.value
+                } | RunningDefinitionStateEventAdapter._definition_to_dict(definition, to_definition_ref) | {
+                    "num_of_completed_steps": num_of_completed_steps,
+                    "recent_completed_step_id": recent_completed_step_id,
+                    "recent_completed_result": CompletedResultAdapter.to_dict(recent_completed_result) if recent_completed_result is not None else None,
+                    "running_step_id": running_step_id
+                }
 
 class RunningDefinitionStateAdapter:
+    @staticmethod
+    def is_snapshot(data: dict[str, Any]) -> bool:
+        return isinstance(data, dict) and data.get("type") == RunningDefinitionStateEventDtoTypes.SNAPSHOT.value
+
+    @staticmethod
+    def definition_refs(data: list[dict[str, Any]]) -> set[str]:
+        return {raw_event["definition_ref"] for raw_event in data if isinstance(raw_event, dict) and isinstance(raw_event.get("definition_ref"), str)}
+
     @effect.result[RunningDefinitionState, str]()
     @staticmethod
-    def from_list(data: list[dict[str, Any]]) -> Generator[Any, Any, RunningDefinitionState]:
+    def from_list(data: list[dict[str, Any]], from_definition_ref: FromDefinitionRef | None = None) -> Generator[Any, Any, RunningDefinitionState]:
         raw_events = yield from Result.Ok(data) if isinstance(data, list) and data else Result.Error("data is invalid")
-        events = list((yield from traverse(RunningDefinitionStateEventAdapter.from_dict, Block(raw_events))))
+        # All given events are kept, so rewritten state keeps its history. Event log keeps full history itself
+        # and gives only events from the last snapshot, other storages give all events and snapshot resets projections
+        events = list((yield from traverse(lambda raw_event: RunningDefinitionStateEventAdapter.from_dict(raw_event, from_definition_ref), Block(raw_events))))
         res = functools.reduce(RunningDefinitionState.apply, events, RunningDefinitionState())
         return res
     
     @staticmethod
-    def to_list(state: RunningDefinitionState):
-        return list(RunningDefinitionStateEventAdapter.to_dict(evt) for evt in state.get_events())
\ No newline at end of file
+    def to_list(state: RunningDefinitionState, to_definition_ref: ToDefinitionRef | None = None):
+        return list(RunningDefinitionStateEventAdapter.to_dict(evt, state.definition(), to_definition_ref) for evt in state.get_events())
\ No newline at end of file
@@ -4,36 +4,110 @@ from typing import Any, Concatenate, ParamSpec, TypeVar
 
 from expression import Result
 
-from infrastructure.persistence.filesystem.filewithversionlimited import FileWithVersionLimited
+from infrastructure.persistence.filesystem.fileeventlog import FileEventLog
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import DefinitionIdValue, IdValue, RunIdValue
 from shared.definitioncustomtypes import GroupIdValue
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
+from shared.infrastructure.storage.repository import AsyncRepositoryWithVersion
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 
+from .definitionblobs import DefinitionBlobs
 from .groupofrunningdefinitions import GroupOfRunningDefinitionsState, GroupOfRunningDefinitionsStateAdapter
+from .groupofrunningdefinitionsshard import GroupOfRunningDefinitionsShardState, GroupOfRunningDefinitionsShardStateAdapter
 from .runningdefinition import RunningDefinitionState, RunningDefinitionStateAdapter
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
 class GenericFileStoreWithVersioning[T]:
-    def __init__(self, folder_path: str, items_sub_folder_name: str, to_list: Callable[[T], list[dict[str, Any]]], from_list: Callable[[list[dict[str, Any]]], Result[T, Any]], max_number_of_stored_recent_versions: int):
-        file_repo_with_ver = FileWithVersionLimited[str, T, list[dict[str, Any]]](
-            items_sub_folder_name,
-            to_list,
-            from_list,
-            JsonSerializer[list[dict[str, Any]]](),
-            "json",
-            folder_path,
-            max_number_of_stored_recent_versions
-        )
+    def __init__(self, folder_path: str, items_sub_folder_name: str, to_list: Callable[[T], list[dict[str, Any]]], from_list: Callable[[list[dict[str, Any]]], Result[T, Any]], max_number_of_stored_recent_versions: int, cache_max_size: int = 0, use_event_log: bool = False, storage_settings: StorageSettings = StorageSettings(), coalesce_writes: bool = False, is_snapshot: Callable[[dict[str, Any]], bool] | None = None, decorate_repository: Callable[[Any], Any] | None = None):
+        if use_event_log:
+            if not storage_settings.format.is_text:
+                raise ValueError(f"Event log requires text serialization format, got {storage_settings.format}")
+            file_repo_with_ver = FileEventLog[str, T, dict[str, Any]](
+                f"{items_sub_folder_name}EventLog",
+                to_list,
+                from_list,
+                create_serializer(storage_settings.format),
+                "jsonl",
+                folder_path,
+                durability=storage_settings.durability,
+                is_snapshot=is_snapshot
+            )
+        else:
+            file_repo_with_ver = create_repository_with_version(
+                storage_settings,
+                items_sub_folder_name,
+                to_list,
+                from_list,
+                create_serializer(storage_settings.format),
+                storage_settings.format.extension,
+                folder_path,
+                max_number_of_stored_recent_versions,
+                cache_max_size
+            )
+        if decorate_repository is not None:
+            file_repo_with_ver = decorate_repository(file_repo_with_ver)
         self._file_repo_with_ver = file_repo_with_ver
-        self._item_action = ItemActionInAsyncRepositoryWithVersion(file_repo_with_ver)
+        self._item_action = ItemActionInAsyncRepositoryWithVersion(file_repo_with_ver, coalesce=coalesce_writes)
+    
+    def cache_info(self):
+        return self._file_repo_with_ver.cache_info()
+    
+    def conflicts(self):
+        return self._item_action.conflicts
+
+class _RunningDefinitionsWithDefinitionBlobs(AsyncRepositoryWithVersion[str, RunningDefinitionState]):
+    '''
+    Converts running definition states stored by repo as lists of event dtos, which reference definitions stored in definition blobs.
+
+    Definition is stored before the first state which references it and definitions referenced by a state are loaded
+    before the state is converted, so adapters resolve refs synchronously without blocking on storage.
+    States written without shared definitions embed their definition and are still read as is.
+    '''
+    def __init__(self, repo: AsyncRepositoryWithVersion[str, list[dict[str, Any]]], definition_blobs: DefinitionBlobs):
+        self._repo = repo
+        self._definition_blobs = definition_blobs
+
+    def cache_info(self):
+        return self._repo.cache_info()  # type: ignore[attr-defined]
+
+    async def _to_list(self, state: RunningDefinitionState):
+        opt_definition = state.definition()
+        if opt_definition is not None:
+            await self._definition_blobs.add(opt_definition)
+        return RunningDefinitionStateAdapter.to_list(state, self._definition_blobs.ref)
+
+    async def get(self, id: str) -> tuple[int, RunningDefinitionState] | None:
+        opt_ver_with_data = await self._repo.get(id)
+        if opt_ver_with_data is None:
+            return None
+        ver, data = opt_ver_with_data
+        await self._definition_blobs.load(RunningDefinitionStateAdapter.definition_refs(data))
+        state_res = RunningDefinitionStateAdapter.from_list(data, self._definition_blobs.get)
+        if state_res.is_error():
+            raise ValueError(str(state_res.error))
+        return ver, state_res.ok
+
+    async def add(self, id: str, item: RunningDefinitionState) -> None:
+        await self._repo.add(id, await self._to_list(item))
+
+    async def update(self, id: str, ver: int, item: RunningDefinitionState) -> bool:
+        return await self._repo.update(id, ver, await self._to_list(item))
+
+    async def delete(self, id: str) -> None:
+        await self._repo.delete(id)
 
 class RunningDefinitionsStore(GenericFileStoreWithVersioning[RunningDefinitionState]):
-    def __init__(self, root_folder: str):
+    def __init__(self, root_folder: str, cache_max_size: int = 0, use_event_log: bool = False, storage_settings: StorageSettings = StorageSettings(), coalesce_writes: bool = False, shared_definitions: bool = False):
         folder_path = os.path.join(root_folder, "DefinitionsStorage")
-        super().__init__(folder_path, RunningDefinitionState.__name__, RunningDefinitionStateAdapter.to_list, RunningDefinitionStateAdapter.from_list, 1)
+        if shared_definitions:
+            # Repo stores event dtos as they are, they are converted with definitions stored in definition blobs
+            definition_blobs = DefinitionBlobs(folder_path, storage_settings)
+            super().__init__(folder_path, RunningDefinitionState.__name__, lambda data: data, Result.Ok, 1, cache_max_size, use_event_log, storage_settings, coalesce_writes, RunningDefinitionStateAdapter.is_snapshot, lambda repo: _RunningDefinitionsWithDefinitionBlobs(repo, definition_blobs))
+        else:
+            super().__init__(folder_path, RunningDefinitionState.__name__, RunningDefinitionStateAdapter.to_list, RunningDefinitionStateAdapter.from_list, 1, cache_max_size, use_event_log, storage_settings, coalesce_writes, RunningDefinitionStateAdapter.is_snapshot)
     
     def with_storage(self, func: Callable[Concatenate[RunningDefinitionState | None, P], tuple[R, RunningDefinitionState]]):
         def wrapper(run_id: RunIdValue, definition_id: DefinitionIdValue, *args: P.args, **kwargs: P.kwargs) -> Coroutine[Any, Any, R]:
@@ -46,9 +120,9 @@ class RunningDefinitionsStore(GenericFileStoreWithVersioning[RunningDefinitionSt
         return self._file_repo_with_ver.delete(id_str)
 
 class GroupOfRunningDefinitionsStore(GenericFileStoreWithVersioning[GroupOfRunningDefinitionsState]):
-    def __init__(self, root_folder: str):
+    def __init__(self, root_folder: str, cache_max_size: int = 0, storage_settings: StorageSettings = StorageSettings(), coalesce_writes: bool = False):
         folder_path = os.path.join(root_folder, "DefinitionsStorage")
-        super().__init__(folder_path, GroupOfRunningDefinitionsState.__name__, GroupOfRunningDefinitionsStateAdapter.to_list, GroupOfRunningDefinitionsStateAdapter.from_list, 2)
+        super().__init__(folder_path, GroupOfRunningDefinitionsState.__name__, GroupOfRunningDefinitionsStateAdapter.to_list, GroupOfRunningDefinitionsStateAdapter.from_list, 2, cache_max_size, storage_settings=storage_settings, coalesce_writes=coalesce_writes)
     
     def with_storage(self, func: Callable[Concatenate[GroupOfRunningDefinitionsState | None, P], tuple[R, GroupOfRunningDefinitionsState]]):
         def wrapper(run_id: RunIdValue, group_id: GroupIdValue, *args: P.args, **kwargs: P.kwargs) -> Coroutine[Any, Any, R]:
@@ -56,6 +130,26 @@ class GroupOfRunningDefinitionsStore(GenericFileStoreWithVersioning[GroupOfRunni
             return self._item_action(func)(id_str, *args, **kwargs)
         return wrapper
     
+    async def get(self, run_id: RunIdValue, group_id: GroupIdValue) -> GroupOfRunningDefinitionsState | None:
+        id_str = f"{run_id}_{group_id}"
+        opt_state_with_ver = await self._file_repo_with_ver.get(id_str)
+        return opt_state_with_ver[1] if opt_state_with_ver is not None else None
+    
     def delete(self, run_id: IdValue, group_id: GroupIdValue):
         id_str = f"{run_id}_{group_id}"
         return self._file_repo_with_ver.delete(id_str)
+
+class GroupOfRunningDefinitionsShardStore(GenericFileStoreWithVersioning[GroupOfRunningDefinitionsShardState]):
+    def __init__(self, root_folder: str, cache_max_size: int = 0, storage_settings: StorageSettings = StorageSettings(), coalesce_writes: bool = False):
+        folder_path = os.path.join(root_folder, "DefinitionsStorage")
+        super().__init__(folder_path, GroupOfRunningDefinitionsShardState.__name__, GroupOfRunningDefinitionsShardStateAdapter.to_list, GroupOfRunningDefinitionsShardStateAdapter.from_list, 2, cache_max_size, storage_settings=storage_settings, coalesce_writes=coalesce_writes)
+    
+    def with_storage(self, func: Callable[Concatenate[GroupOfRunningDefinitionsShardState | None, P], tuple[R, GroupOfRunningDefinitionsShardState]]):
+        def wrapper(run_id: RunIdValue, group_id: GroupIdValue, shard: int, *args: P.args, **kwargs: P.kwargs) -> Coroutine[Any, Any, R]:
+            id_str = f"{run_id}_{group_id}_{shard}"
+            return self._item_action(func)(id_str, *args, **kwargs)
+        return wrapper
+    
+    def delete(self, run_id: IdValue, group_id: GroupIdValue, shard: int):
+        id_str = f"{run_id}_{group_id}_{shard}"
+        return self._file_repo_with_ver.delete(id_str)
@@ -2,9 +2,9 @@ from collections.abc import Callable, Coroutine
 import os
 from typing import Any, Concatenate, ParamSpec, TypeVar
 
-from infrastructure.persistence.filesystem.filewithversion import FileWithVersion
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import RunIdValue
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 
 import config
@@ -20,12 +20,14 @@ class ManualRunStore:
         self.__class__.__init__ = lambda self: None
 
         folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "DefinitionsStorage")
-        file_repo_with_ver = FileWithVersion[RunIdValue, ManualRunState, dict[str, Any]](
+        storage_settings = StorageSettings.from_env("MANUAL_RUNS")
+        file_repo_with_ver = create_repository_with_version(
+            storage_settings,
             ManualRunState.__name__,
             ManualRunStateAdapter.to_dict,
             ManualRunStateAdapter.from_dict,
-            JsonSerializer[dict[str, Any]](),
-            "json",
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
             folder_path
         )
         self._file_repo_with_ver = file_repo_with_ver
@@ -2,9 +2,9 @@ from collections.abc import Callable, Coroutine
 import os
 from typing import Any, Concatenate, ParamSpec, TypeVar
 
-from infrastructure.persistence.filesystem.filewithversionlimited import FileWithVersionLimited
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import TaskIdValue
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 from shared.taskpendingresultsqueue import TaskPendingResultsQueue, TaskPendingResultsQueueAdapter
 
@@ -16,12 +16,14 @@ R = TypeVar("R")
 class TaskPendingResultsQueueStore:
     def __init__(self):
         folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "HistoryStorage")
-        file_repo_with_ver = FileWithVersionLimited[TaskIdValue, TaskPendingResultsQueue, dict[str, Any]](
+        storage_settings = StorageSettings.from_env("TASK_PENDING_RESULTS_QUEUE")
+        file_repo_with_ver = create_repository_with_version(
+            storage_settings,
             TaskPendingResultsQueue.__name__,
             TaskPendingResultsQueueAdapter.to_dict,
             TaskPendingResultsQueueAdapter.from_dict,
-            JsonSerializer[dict[str, Any]](),
-            "json",
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
             folder_path,
             10
         )
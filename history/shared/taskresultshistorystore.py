@@ -5,9 +5,9 @@ from typing import Any, Concatenate, ParamSpec, TypeVar
 
 from expression import Result
 
-from infrastructure.persistence.filesystem.filewithversion import FileWithVersion
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import RunIdValue, TaskIdValue
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 from shared.taskresulthistory import LegacyTaskResultHistoryItemAdapter, TaskResultHistoryItemAdapter
 
@@ -21,14 +21,16 @@ class TaskResultsHistoryStore[T]:
         self._folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "HistoryStorage", items_sub_folder_name)
         self._to_dict = to_dict
         self._from_dict = from_dict
+        self._storage_settings = StorageSettings.from_env("TASK_RESULTS_HISTORY")
     
     def _get_task_id_file_repo_with_ver(self, task_id: TaskIdValue):
-        return FileWithVersion[RunIdValue, T, dict[str, Any]](
+        return create_repository_with_version(
+            self._storage_settings,
             task_id,
             self._to_dict,
             self._from_dict,
-            JsonSerializer[dict[str, Any]](),
-            "json",
+            create_serializer(self._storage_settings.format),
+            self._storage_settings.format.extension,
             self._folder_path
         )
     
@@ -0,0 +1,84 @@
+import asyncio
+from collections.abc import Callable, Coroutine, Sequence
+from logging import Logger
+from typing import Any
+
+from expression import Result
+
+from shared.pipeline.actionhandler import ActionInput, AsyncActionHandler, RunAsyncAction, RunAsyncActions
+from shared.utils.result import ResultTag
+
+type ActionInputHandler = Callable[[Result[ActionInput, Any]], Coroutine]
+type LimitLocalAction = Callable[[str, Callable[[], Coroutine]], Coroutine]
+
+class LoopbackTransport:
+    '''
+    Runs actions handled in this process directly on the event loop, other actions are run by remote transport.
+
+    Locally handled actions are still registered in remote transport, so remote processes can run them as well.
+    Action handled locally with error result or exception is run again by remote transport to get its retries.
+    Action input is passed to local handler as is, so handlers must not change it.
+    Local handler is run by limit_local_action, so it shares concurrency limit of the action with remote transport.
+    Actions run locally are not persisted, so unlike actions run by remote transport they are lost when the process crashes.
+    '''
+    def __init__(self, remote_run_action: RunAsyncAction, remote_run_actions: RunAsyncActions, remote_action_handler: AsyncActionHandler, logger: Logger | None = None, limit_local_action: LimitLocalAction | None = None):
+        self._remote_run_action = remote_run_action
+        self._remote_run_actions = remote_run_actions
+        self._remote_action_handler = remote_action_handler
+        self._logger = logger
+        self._limit_local_action = limit_local_action
+        self._local_handlers: dict[str, ActionInputHandler] = {}
+        self._running_tasks = set[asyncio.Task]()
+
+    def local_action_names(self) -> frozenset[str]:
+        return frozenset(self._local_handlers)
+
+    def num_of_running_actions(self) -> int:
+        return len(self._running_tasks)
+
+    async def _run_local_action(self, action_name: str, action_input: ActionInput):
+        handler = self._local_handlers[action_name]
+        run_handler = lambda: handler(Result.Ok(action_input))
+        try:
+            res = await (self._limit_local_action(action_name, run_handler) if self._limit_local_action is not None else run_handler())
+        except Exception as ex:
+            if self._logger is not None:
+                self._logger.exception(f"{action_name} failed locally with exception {ex}")
+            res = Result.Error(ex)
+        match res:
+            case Result(tag=ResultTag.ERROR, error=_):
+                remote_res = await self._remote_run_action(action_name, action_input)
+                if remote_res.is_error() and self._logger is not None:
+                    self._logger.error(f"{action_name} failed locally and can not be run remotely {remote_res.error}")
+
+    def _start_local_action(self, action_name: str, action_input: ActionInput):
+        # Running tasks are referenced until they are done, so they are not garbage collected
+        task = asyncio.create_task(self._run_local_action(action_name, action_input))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    async def run_action(self, action_name: str, action_input: ActionInput) -> Result[None, Any]:
+        if action_name not in self._local_handlers:
+            return await self._remote_run_action(action_name, action_input)
+        self._start_local_action(action_name, action_input)
+        return Result.Ok(None)
+
+    async def run_actions(self, actions: Sequence[tuple[str, ActionInput]]) -> list[Result[None, Any]]:
+        remote_actions = [(action_name, action_input) for action_name, action_input in actions if action_name not in self._local_handlers]
+        remote_results = iter(await self._remote_run_actions(remote_actions) if remote_actions else [])
+        results: list[Result[None, Any]] = []
+        for action_name, action_input in actions:
+            if action_name in self._local_handlers:
+                self._start_local_action(action_name, action_input)
+                results.append(Result.Ok(None))
+            else:
+                results.append(next(remote_results))
+        return results
+
+    def action_handler(self, action_name: str, action_handler: ActionInputHandler):
+        self._local_handlers[action_name] = action_handler
+        return self._remote_action_handler(action_name, action_handler)
+
+    async def wait_for_running_actions(self):
+        while self._running_tasks:
+            await asyncio.gather(*self._running_tasks, return_exceptions=True)
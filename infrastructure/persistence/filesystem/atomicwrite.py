@@ -0,0 +1,87 @@
+import asyncio
+from enum import StrEnum
+import os
+from typing import Optional
+import uuid
+
+import aiofiles
+import aiofiles.os as aos
+
+from shared.utils.string import strip_and_lowercase
+
+class Durability(StrEnum):
+    '''
+    How far a write is flushed before it is reported as done.
+
+    NONE leaves flushing to OS, FILE syncs file data to disk before file becomes visible,
+    DIRECTORY also syncs the parent directory so that the new file name survives power loss.
+    '''
+    NONE = "none"
+    FILE = "file"
+    DIRECTORY = "directory"
+
+    @staticmethod
+    def parse(value: str) -> Optional["Durability"]:
+        if value is None:
+            return None
+        match strip_and_lowercase(value):
+            case Durability.NONE:
+                return Durability.NONE
+            case Durability.FILE:
+                return Durability.FILE
+            case Durability.DIRECTORY:
+                return Durability.DIRECTORY
+            case _:
+                return None
+
+def _sync_file(fd: int):
+    # fdatasync is not available on Windows and macOS
+    sync = getattr(os, "fdatasync", os.fsync)
+    sync(fd)
+
+def sync_file(fd: int):
+    return asyncio.to_thread(_sync_file, fd)
+
+def _sync_directory(folder_path: str):
+    # Directories can not be opened (and synced) on Windows
+    if os.name == "nt":
+        return
+    fd = os.open(folder_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+async def _remove_if_exists(file_path: str):
+    try:
+        await aos.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+async def write_file_atomically(file_path: str, content: str | bytes, durability: Durability = Durability.NONE, exclusive: bool = False) -> None:
+    '''
+    Writes content to temp file in the same folder and then publishes it as file_path,
+    so readers see either the previous file or the whole new one.
+
+    When exclusive is True raises FileExistsError if file_path already exists, otherwise replaces it.
+    '''
+    folder_path, file_name = os.path.split(file_path)
+    temp_file_path = os.path.join(folder_path, f".{file_name}.{uuid.uuid4().hex}.tmp")
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    try:
+        async with aiofiles.open(temp_file_path, mode=mode) as f:
+            await f.write(content)
+            if durability != Durability.NONE:
+                await f.flush()
+                await sync_file(f.fileno())
+        if exclusive:
+            # Unlike replace, link fails when file exists, so only one of concurrent writers wins
+            await aos.link(temp_file_path, file_path)
+            await aos.remove(temp_file_path)
+        else:
+            await aos.replace(temp_file_path, file_path)
+    except BaseException:
+        await _remove_if_exists(temp_file_path)
+        raise
+    if durability == Durability.DIRECTORY:
+        await asyncio.to_thread(_sync_directory, folder_path)
@@ -10,6 +10,10 @@ from shared.infrastructure.serialization.serializer import Serializer
 from shared.infrastructure.storage.repository import AlreadyExistsException, AsyncRepository, NotFoundException
 from shared.utils.result import ResultTag
 
+from .atomicwrite import Durability, write_file_atomically
+
+_NUM_OF_LOCK_STRIPES = 64
+
 class File[TId, TItem, TItemDto](AsyncRepository[TId, TItem]):
     def __init__(
         self,
@@ -18,46 +22,50 @@ class File[TId, TItem, TItemDto](AsyncRepository[TId, TItem]):
         dto_to_item: Callable[[TItemDto], TItem | Result],
         serializer: Serializer[TItemDto],
         extension: str,
-        folder_path: str
+        folder_path: str,
+        durability: Durability = Durability.NONE
     ):
         self._item_to_dto = item_to_dto
         self._dto_to_item = dto_to_item
         self._serializer = serializer
         self._extension = extension
         self._folder_path = os.path.join(folder_path, items_sub_folder_name)
-        self._lock = asyncio.Lock()
+        self._durability = durability
+        # Writers of the same id are serialized by one of striped locks, readers do not lock at all
+        self._locks = tuple(asyncio.Lock() for _ in range(_NUM_OF_LOCK_STRIPES))
         os.makedirs(self._folder_path, exist_ok=True)
     
+    def _lock(self, id: TId) -> asyncio.Lock:
+        return self._locks[hash(str(id)) % _NUM_OF_LOCK_STRIPES]
+    
     async def get(self, id: TId) -> TItem | None:
         file_name = f"{id}.{self._extension}"
         file_path = os.path.join(self._folder_path, file_name)
         try:
-            async with self._lock:
-                async with aiofiles.open(file_path, mode='r') as f:
-                    dto_item = self._serializer.deserialize(await f.read())
-                    item_or_res = self._dto_to_item(dto_item)
-                    match item_or_res:
-                        case Result():
-                            match item_or_res:
-                                case Result(tag=ResultTag.OK, ok=item):
-                                    return item
-                                case Result(tag=ResultTag.ERROR, error=err):
-                                    raise ValueError(str(err))
-                                case _:
-                                    raise ValueError("Item is invalid")
-                        case item:
-                            return item
+            async with aiofiles.open(file_path, mode='rb') as f:
+                dto_item = self._serializer.deserialize(await f.read())
         except FileNotFoundError:
             return None
+        item_or_res = self._dto_to_item(dto_item)
+        match item_or_res:
+            case Result():
+                match item_or_res:
+                    case Result(tag=ResultTag.OK, ok=item):
+                        return item
+                    case Result(tag=ResultTag.ERROR, error=err):
+                        raise ValueError(str(err))
+                    case _:
+                        raise ValueError("Item is invalid")
+            case item:
+                return item
     
     async def add(self, id: TId, item: TItem) -> None:
         file_name = f"{id}.{self._extension}"
         file_path = os.path.join(self._folder_path, file_name)
         dto_item = self._item_to_dto(item)
-        async with self._lock:
+        async with self._lock(id):
             try:
-                async with aiofiles.open(file_path, mode='x') as f:
-                    await f.write(self._serializer.serialize(dto_item))
+                await write_file_atomically(file_path, self._serializer.serialize(dto_item), self._durability, exclusive=True)
             except FileExistsError:
                 raise AlreadyExistsException(id)
     
@@ -65,18 +73,15 @@ class File[TId, TItem, TItemDto](AsyncRepository[TId, TItem]):
         file_name = f"{id}.{self._extension}"
         file_path = os.path.join(self._folder_path, file_name)
         dto_item = self._item_to_dto(item)
-        async with self._lock:
-            try:
-                async with aiofiles.open(file_path, mode='r+') as f:
-                    await f.write(self._serializer.serialize(dto_item))
-                    await f.truncate()
-            except FileNotFoundError:
+        async with self._lock(id):
+            if not await aos.path.isfile(file_path):
                 raise NotFoundException(id)
+            await write_file_atomically(file_path, self._serializer.serialize(dto_item), self._durability)
     
     async def delete(self, id: TId) -> None:
         file_name = f"{id}.{self._extension}"
         file_path = os.path.join(self._folder_path, file_name)
-        async with self._lock:
+        async with self._lock(id):
             try:
                 await aos.remove(file_path)
             except FileNotFoundError:
@@ -0,0 +1,243 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+import os
+from typing import Any
+import uuid
+
+import aiofiles
+import aiofiles.os as aos
+from expression import Result
+
+from shared.infrastructure.serialization.serializer import Serializer
+from shared.infrastructure.storage.repository import AlreadyExistsException, AsyncRepositoryWithVersion
+from shared.utils.lrucache import CacheInfo, LruCache
+from shared.utils.result import ResultTag
+
+from .atomicwrite import Durability, sync_file, write_file_atomically
+
+def _open_existing(path: str, flags: int) -> int:
+    return os.open(path, flags & ~os.O_CREAT)
+
+@dataclass(frozen=True)
+class _Record[TEventDto]:
+    ver: int
+    token: str
+    events: list[TEventDto]
+    start_offset: int
+    end_offset: int
+
+@dataclass(frozen=True)
+class _SnapshotRecord:
+    ver: int
+    token: str
+    offset: int
+
+@dataclass(frozen=True)
+class _LogTail:
+    ver: int
+    num_of_events: int
+    offset: int
+    snapshot: _SnapshotRecord | None = None
+
+class FileEventLog[TId, TItem, TEventDto](AsyncRepositoryWithVersion[TId, TItem]):
+    '''
+    Stores every item as append-only log of event dtos, one file per id.
+
+    Each add/update appends a single line record with events which are not stored yet,
+    so the size of a write does not depend on the number of already stored events.
+    Concurrent updates of the same version may all append their records, readers apply only
+    the first record of every version and skip the rest (as well as lines torn by a crash).
+    Serializer must produce single line output.
+
+    When is_snapshot is set, item is restored only from the last snapshot event and events after it.
+    Position of the last snapshot record is cached, so get reads the log from there.
+    '''
+    def __init__(
+        self,
+        items_sub_folder_name: str,
+        item_to_dtos: Callable[[TItem], list[TEventDto]],
+        dtos_to_item: Callable[[list[TEventDto]], TItem | Result],
+        serializer: Serializer[dict[str, Any]],
+        extension: str,
+        folder_path: str,
+        tail_cache_max_size: int = 1000,
+        durability: Durability = Durability.NONE,
+        is_snapshot: Callable[[TEventDto], bool] | None = None
+    ):
+        self._item_to_dtos = item_to_dtos
+        self._dtos_to_item = dtos_to_item
+        self._serializer = serializer
+        self._extension = extension
+        self._folder_path = os.path.join(folder_path, items_sub_folder_name)
+        self._durability = durability
+        self._is_snapshot = is_snapshot
+        # Version, number of events and file offset seen by recent get/update, so update reads only the file tail
+        self._tails = LruCache[str, _LogTail](tail_cache_max_size)
+
+    def cache_info(self) -> CacheInfo:
+        return self._tails.info()
+
+    def _file_path(self, id: TId):
+        return os.path.join(self._folder_path, f"{id}.{self._extension}")
+
+    def _to_line(self, ver: int, token: str, events: list[TEventDto]) -> bytes:
+        record = {"ver": ver, "token": token, "events": events}
+        serialized_record = self._serializer.serialize(record)
+        line = serialized_record.encode() if isinstance(serialized_record, str) else serialized_record
+        if b"\n" in line:
+            raise ValueError("Serializer must produce single line output")
+        return line + b"\n"
+
+    def _parse_record(self, line: bytes, start_offset: int, end_offset: int) -> _Record[TEventDto] | None:
+        try:
+            record = self._serializer.deserialize(line)
+        except Exception:
+            return None
+        match record:
+            case {"ver": int(ver), "token": str(token), "events": list(events)}:
+                return _Record(ver, token, events, start_offset, end_offset)
+            case _:
+                return None
+
+    async def _read_records(self, id: TId, offset: int) -> list[_Record[TEventDto]]:
+        async with aiofiles.open(self._file_path(id), mode='rb') as f:
+            await f.seek(offset)
+            content = await f.read()
+        records: list[_Record[TEventDto]] = []
+        line_start = 0
+        line_end = content.find(b"\n")
+        while line_end >= 0:
+            opt_record = self._parse_record(content[line_start:line_end], offset + line_start, offset + line_end + 1)
+            if opt_record is not None:
+                records.append(opt_record)
+            line_start = line_end + 1
+            line_end = content.find(b"\n", line_start)
+        return records
+
+    @staticmethod
+    def _next_record(records: list[_Record[TEventDto]], ver: int) -> _Record[TEventDto] | None:
+        return next((rec for rec in records if rec.ver == ver + 1), None)
+
+    def _to_item(self, dtos: list[TEventDto]) -> TItem:
+        item_or_res = self._dtos_to_item(dtos)
+        match item_or_res:
+            case Result():
+                match item_or_res:
+                    case Result(tag=ResultTag.OK, ok=item):
+                        return item
+                    case Result(tag=ResultTag.ERROR, error=err):
+                        raise ValueError(str(err))
+                    case _:
+                        raise ValueError("Item is invalid")
+            case None:
+                raise ValueError("Item is None")
+            case item:
+                return item
+
+    def _last_snapshot_index(self, events: list[TEventDto]) -> int | None:
+        if self._is_snapshot is None:
+            return None
+        return next((i for i in range(len(events) - 1, -1, -1) if self._is_snapshot(events[i])), None)
+
+    async def _replay(self, id: TId) -> tuple[_LogTail, list[TEventDto]] | None:
+        opt_cached_tail = self._tails.get(str(id))
+        opt_snapshot = opt_cached_tail.snapshot if opt_cached_tail is not None else None
+        try:
+            records = await self._read_records(id, opt_snapshot.offset if opt_snapshot is not None else 0)
+        except FileNotFoundError:
+            return None
+        if opt_snapshot is not None:
+            # Log could be deleted and added again since snapshot position was cached
+            is_snapshot_record = any(records) and records[0].ver == opt_snapshot.ver and records[0].token == opt_snapshot.token
+            if not is_snapshot_record:
+                self._tails.invalidate(str(id))
+                return await self._replay(id)
+            tail = _LogTail(opt_snapshot.ver - 1, 0, opt_snapshot.offset, opt_snapshot)
+        else:
+            tail = _LogTail(0, 0, 0)
+        dtos: list[TEventDto] = []
+        for rec in records:
+            if rec.ver == tail.ver + 1:
+                opt_snapshot_index = self._last_snapshot_index(rec.events)
+                if opt_snapshot_index is not None:
+                    dtos = rec.events[opt_snapshot_index:]
+                    tail = _LogTail(rec.ver, len(dtos), rec.end_offset, _SnapshotRecord(rec.ver, rec.token, rec.start_offset))
+                else:
+                    dtos.extend(rec.events)
+                    tail = _LogTail(rec.ver, len(dtos), rec.end_offset, tail.snapshot)
+        if tail.ver == 0:
+            return None
+        return tail, dtos
+
+    async def get(self, id: TId) -> tuple[int, TItem] | None:
+        opt_tail_with_dtos = await self._replay(id)
+        if opt_tail_with_dtos is None:
+            self._tails.invalidate(str(id))
+            return None
+        tail, dtos = opt_tail_with_dtos
+        self._tails.set(str(id), tail)
+        return tail.ver, self._to_item(dtos)
+
+    async def add(self, id: TId, item: TItem) -> None:
+        await aos.makedirs(self._folder_path, exist_ok=True)
+        token = uuid.uuid4().hex
+        dtos = self._item_to_dtos(item)
+        line = self._to_line(1, token, dtos)
+        # Whole first record is published at once, so readers never see partially written new log
+        try:
+            await write_file_atomically(self._file_path(id), line, self._durability, exclusive=True)
+        except FileExistsError:
+            self._tails.invalidate(str(id))
+            raise AlreadyExistsException(id)
+        opt_snapshot = _SnapshotRecord(1, token, 0) if self._last_snapshot_index(dtos) is not None else None
+        self._tails.set(str(id), _LogTail(1, len(dtos), len(line), opt_snapshot))
+
+    async def _get_tail(self, id: TId, ver: int) -> _LogTail | None:
+        opt_tail = self._tails.get(str(id))
+        if opt_tail is not None and opt_tail.ver == ver:
+            return opt_tail
+        opt_tail_with_dtos = await self._replay(id)
+        if opt_tail_with_dtos is None:
+            return None
+        tail, _ = opt_tail_with_dtos
+        self._tails.set(str(id), tail)
+        return tail if tail.ver == ver else None
+
+    async def update(self, id: TId, ver: int, item: TItem) -> bool:
+        try:
+            tail = await self._get_tail(id, ver)
+            if tail is None:
+                return False
+            if self._next_record(await self._read_records(id, tail.offset), ver) is not None:
+                self._tails.invalidate(str(id))
+                return False
+            dtos = self._item_to_dtos(item)
+            if len(dtos) < tail.num_of_events:
+                raise ValueError(f"Item has {len(dtos)} events, but version {ver} has {tail.num_of_events} events")
+            token = uuid.uuid4().hex
+            new_dtos = dtos[tail.num_of_events:]
+            line = self._to_line(ver + 1, token, new_dtos)
+            # Appending to deleted log must not create new one
+            async with aiofiles.open(self._file_path(id), mode='ab', opener=_open_existing) as f:
+                await f.write(line)
+                if self._durability != Durability.NONE:
+                    await f.flush()
+                    await sync_file(f.fileno())
+            # Other writers could append record of the same version, the first one wins
+            opt_next_record = self._next_record(await self._read_records(id, tail.offset), ver)
+        except FileNotFoundError:
+            self._tails.invalidate(str(id))
+            return False
+        if opt_next_record is None or opt_next_record.token != token:
+            self._tails.invalidate(str(id))
+            return False
+        opt_snapshot = _SnapshotRecord(ver + 1, token, opt_next_record.start_offset) if self._last_snapshot_index(new_dtos) is not None else tail.snapshot
+        self._tails.set(str(id), _LogTail(ver + 1, len(dtos), opt_next_record.end_offset, opt_snapshot))
+        return True
+
+    async def delete(self, id: TId) -> None:
+        self._tails.invalidate(str(id))
+        try:
+            await aos.remove(self._file_path(id))
+        except FileNotFoundError:
+            pass
\ No newline at end of file
@@ -8,8 +8,11 @@ from expression import Result
 
 from shared.infrastructure.serialization.serializer import Serializer
 from shared.infrastructure.storage.repository import AlreadyExistsException, AsyncRepositoryWithVersion
+from shared.utils.lrucache import CacheInfo, LruCache
 from shared.utils.result import ResultTag
 
+from .atomicwrite import Durability, write_file_atomically
+
 class FileWithVersion[TId, TItem, TItemDto](
     AsyncRepositoryWithVersion[TId, TItem]
 ):
@@ -20,13 +23,38 @@ class FileWithVersion[TId, TItem, TItemDto](
         dto_to_item: Callable[[TItemDto], TItem | Result],
         serializer: Serializer[TItemDto],
         extension: str,
-        folder_path: str
+        folder_path: str,
+        cache_max_size: int = 0,
+        durability: Durability = Durability.NONE,
+        version_index_max_size: int = 10000
     ):
+        if cache_max_size < 0:
+            raise ValueError("cache_max_size must not be negative")
         self._item_to_dto = item_to_dto
         self._dto_to_item = dto_to_item
         self._serializer = serializer
         self._extension = extension
         self._folder_path = os.path.join(folder_path, items_sub_folder_name)
+        self._durability = durability
+        # Caches latest file content rather than item, because item actions mutate loaded items in place
+        self._cache = LruCache[str, tuple[int, str | bytes]](cache_max_size) if cache_max_size > 0 else None
+        # Recently seen version of every id, so the latest version is found without listing id folder
+        self._versions = LruCache[str, int](version_index_max_size)
+    
+    def _set_cached(self, id: TId, ver: int, file_content: str | bytes):
+        if self._cache is not None:
+            self._cache.set(str(id), (ver, file_content))
+        self._versions.set(str(id), ver)
+    
+    def _invalidate_cached(self, id: TId):
+        if self._cache is not None:
+            self._cache.invalidate(str(id))
+        self._versions.invalidate(str(id))
+    
+    def cache_info(self) -> CacheInfo:
+        if self._cache is None:
+            return CacheInfo(0, 0, 0, 0)
+        return self._cache.info()
     
     async def get_all_ids(self) -> list[str]:
         if not await aos.path.isdir(self._folder_path):
@@ -34,75 +62,112 @@ class FileWithVersion[TId, TItem, TItemDto](
         all_items = await aos.listdir(self._folder_path)
         return all_items
     
-    def _get_max_version(self, all_files: list[str]) -> int:
-        all_versions = [int(item.split(".")[0]) for item in all_files]
-        max_ver = max(all_versions)
+    def _get_max_version(self, all_files: list[str]) -> int | None:
+        # Skips temp files of writes in progress
+        suffix = f".{self._extension}"
+        all_versions = [int(item.removesuffix(suffix)) for item in all_files if item.endswith(suffix) and item.removesuffix(suffix).isdigit()]
+        max_ver = max(all_versions, default=None)
         return max_ver
 
-    async def get(self, id: TId) -> tuple[int, TItem] | None:
-        async def get_existing_item(ver: int) -> tuple[int, TItem] | None:
-            file_name = f"{ver}.{self._extension}"
-            file_path = os.path.join(self._folder_path, str(id), file_name)
-            async with aiofiles.open(file_path, mode='r') as f:
-                file_content = await f.read()
-            if file_content == "" and ver > 1:
-                return await get_existing_item(ver - 1)
-            dto_item = self._serializer.deserialize(file_content)
-            item_or_res = self._dto_to_item(dto_item)
-            match item_or_res:
-                case Result():
-                    match item_or_res:
-                        case Result(tag=ResultTag.OK, ok=item):
-                            return ver, item
-                        case Result(tag=ResultTag.ERROR, error=err):
-                            raise ValueError(str(err))
-                        case _:
-                            raise ValueError("Item is invalid")
-                case None:
-                    raise ValueError("Item is None")
-                case item:
-                    return ver, item
-        
+    def _to_item_with_ver(self, ver: int, file_content: str | bytes) -> tuple[int, TItem]:
+        dto_item = self._serializer.deserialize(file_content)
+        item_or_res = self._dto_to_item(dto_item)
+        match item_or_res:
+            case Result():
+                match item_or_res:
+                    case Result(tag=ResultTag.OK, ok=item):
+                        return ver, item
+                    case Result(tag=ResultTag.ERROR, error=err):
+                        raise ValueError(str(err))
+                    case _:
+                        raise ValueError("Item is invalid")
+            case None:
+                raise ValueError("Item is None")
+            case item:
+                return ver, item
+
+    def _version_file_path(self, id: TId, ver: int):
+        return os.path.join(self._folder_path, str(id), f"{ver}.{self._extension}")
+
+    async def _read_version(self, id: TId, ver: int) -> tuple[int, bytes]:
+        # Read as bytes, so both text and binary serializers can decode it
+        async with aiofiles.open(self._version_file_path(id, ver), mode='rb') as f:
+            file_content = await f.read()
+        return ver, file_content
+
+    async def _read_latest_from_known_version(self, id: TId) -> tuple[int, bytes] | None:
+        opt_known_ver = self._versions.get(str(id))
+        if opt_known_ver is None:
+            return None
+        ver = opt_known_ver
+        # Other writers could add newer versions meanwhile, versions are always added one by one
+        while await aos.path.isfile(self._version_file_path(id, ver + 1)):
+            ver += 1
         try:
-            id_folder_path = os.path.join(self._folder_path, str(id))
-            all_files = await aos.listdir(id_folder_path)
-            match all_files:
-                case []:
-                    return None
-                case _:
-                    max_ver = self._get_max_version(all_files)
-                    return await get_existing_item(max_ver)
+            return await self._read_version(id, ver)
         except FileNotFoundError:
+            # Known version is already removed, e.g. as too old by FileWithVersionLimited
+            return None
+
+    async def _read_latest_from_listed_versions(self, id: TId) -> tuple[int, bytes] | None:
+        id_folder_path = os.path.join(self._folder_path, str(id))
+        while True:
+            try:
+                all_files = await aos.listdir(id_folder_path)
+            except FileNotFoundError:
+                return None
+            match self._get_max_version(all_files):
+                case None:
+                    return None
+                case max_ver:
+                    try:
+                        return await self._read_version(id, max_ver)
+                    except FileNotFoundError:
+                        # Listed version is already removed, so newer version exists or item is deleted
+                        continue
+
+    async def get(self, id: TId) -> tuple[int, TItem] | None:
+        opt_cached = self._cache.get(str(id)) if self._cache is not None else None
+        if opt_cached is not None:
+            return self._to_item_with_ver(*opt_cached)
+        opt_ver_with_content = await self._read_latest_from_known_version(id) or await self._read_latest_from_listed_versions(id)
+        if opt_ver_with_content is None:
+            self._invalidate_cached(id)
             return None
+        ver, file_content = opt_ver_with_content
+        self._set_cached(id, ver, file_content)
+        return self._to_item_with_ver(ver, file_content)
 
     async def add(self, id: TId, item: TItem) -> None:
         id_folder_path = os.path.join(self._folder_path, str(id))
         await aos.makedirs(id_folder_path, exist_ok=True)
         ver = 1
-        file_name = f"{ver}.{self._extension}"
-        file_path = os.path.join(id_folder_path, file_name)
+        file_path = self._version_file_path(id, ver)
         dto_item = self._item_to_dto(item)
+        serialized_item = self._serializer.serialize(dto_item)
         try:
-            async with aiofiles.open(file_path, mode='x') as f:
-                await f.write(self._serializer.serialize(dto_item))
+            await write_file_atomically(file_path, serialized_item, self._durability, exclusive=True)
         except FileExistsError:
+            self._invalidate_cached(id)
             raise AlreadyExistsException(id)
+        self._set_cached(id, ver, serialized_item)
 
     async def update(self, id: TId, ver: int, item: TItem) -> bool:
-        ver_file_name = f"{ver}.{self._extension}"
-        ver_file_path = os.path.join(self._folder_path, str(id), ver_file_name)
-        if not await aos.path.isfile(ver_file_path):
+        if not await aos.path.isfile(self._version_file_path(id, ver)):
+            self._invalidate_cached(id)
             return False
-        file_name = f"{ver + 1}.{self._extension}"
-        file_path = os.path.join(self._folder_path, str(id), file_name)
+        file_path = self._version_file_path(id, ver + 1)
         dto_item = self._item_to_dto(item)
+        serialized_item = self._serializer.serialize(dto_item)
         try:
-            async with aiofiles.open(file_path, mode='x') as f:
-                await f.write(self._serializer.serialize(dto_item))
-            return True
+            await write_file_atomically(file_path, serialized_item, self._durability, exclusive=True)
         except FileExistsError:
+            self._invalidate_cached(id)
             return False
+        self._set_cached(id, ver + 1, serialized_item)
+        return True
 
     async def delete(self, id: TId) -> None:
         id_folder_path = os.path.join(self._folder_path, str(id))
+        self._invalidate_cached(id)
         shutil.rmtree(id_folder_path, ignore_errors=True)
\ No newline at end of file
@@ -1,9 +1,9 @@
 from collections.abc import Callable
-import os
 
 import aiofiles.os as aos
 from expression import Result
 
+from infrastructure.persistence.filesystem.atomicwrite import Durability
 from infrastructure.persistence.filesystem.filewithversion import FileWithVersion
 from shared.infrastructure.serialization.serializer import Serializer
 from shared.utils.exceptiondecorators import async_catch_ex
@@ -17,20 +17,20 @@ class FileWithVersionLimited[TId, TItem, TItemDto](FileWithVersion[TId, TItem, T
         serializer: Serializer[TItemDto],
         extension: str,
         folder_path: str,
-        max_number_of_stored_recent_versions: int
+        max_number_of_stored_recent_versions: int,
+        cache_max_size: int = 0,
+        durability: Durability = Durability.NONE
     ):
         if max_number_of_stored_recent_versions < 1:
             raise ValueError("max_number_of_stored_recent_versions must be between 1 and 100")
         if max_number_of_stored_recent_versions > 100:
             raise ValueError("max_number_of_stored_recent_versions must be between 1 and 100")
         self._max_number_of_stored_recent_versions = max_number_of_stored_recent_versions
-        super().__init__(items_sub_folder_name, item_to_dto, dto_to_item, serializer, extension, folder_path)
+        super().__init__(items_sub_folder_name, item_to_dto, dto_to_item, serializer, extension, folder_path, cache_max_size, durability)
 
     @async_catch_ex
     def _remove_old_version(self, id: TId, version_to_remove: int):
-        file_name = f"{version_to_remove}.{self._extension}"
-        file_path = os.path.join(self._folder_path, str(id), file_name)
-        return aos.remove(file_path)
+        return aos.remove(self._version_file_path(id, version_to_remove))
     
     async def update(self, id: TId, ver: int, item: TItem) -> bool:
         updated = await super().update(id, ver, item)
@@ -0,0 +1,69 @@
+'''
+Imports items stored by FileWithVersion into SqliteWithVersion databases.
+
+Every <folder_path>/<items_sub_folder_name>/<id>/<version>.json tree found under the root folder
+is imported into <items_sub_folder_name> table of <folder_path>/storage.db database,
+keeping only the latest version of every item. Items which already exist in database are skipped.
+
+Usage:
+    python -m infrastructure.persistence.sqlite.migratefromfiles /usr/src/app/data --extension json
+'''
+import argparse
+import os
+import sqlite3
+
+from .sqlitewithversion import CREATE_TABLE_SQL, DATABASE_FILE_NAME
+
+def _get_max_version(file_names: list[str], extension: str) -> int | None:
+    suffix = f".{extension}"
+    versions = [int(name.removesuffix(suffix)) for name in file_names if name.endswith(suffix) and name.removesuffix(suffix).isdigit()]
+    return max(versions) if versions else None
+
+def _read_latest_version(id_folder_path: str, file_names: list[str], extension: str) -> tuple[int, bytes] | None:
+    # The latest version may be empty while it is being written, so fall back to previous one
+    ver = _get_max_version(file_names, extension)
+    while ver is not None and ver > 0:
+        file_path = os.path.join(id_folder_path, f"{ver}.{extension}")
+        if os.path.isfile(file_path):
+            with open(file_path, mode='rb') as f:
+                data = f.read()
+            if data != b"":
+                return ver, data
+        ver -= 1
+    return None
+
+def migrate(root_folder: str, extension: str) -> dict[str, int]:
+    num_of_imported_items: dict[str, int] = {}
+    connections: dict[str, sqlite3.Connection] = {}
+    try:
+        for id_folder_path, _, file_names in os.walk(root_folder):
+            opt_ver_with_data = _read_latest_version(id_folder_path, file_names, extension)
+            if opt_ver_with_data is None:
+                continue
+            ver, data = opt_ver_with_data
+            items_folder_path, id = os.path.split(id_folder_path)
+            folder_path, table = os.path.split(items_folder_path)
+            db_path = os.path.join(folder_path, DATABASE_FILE_NAME)
+            if db_path not in connections:
+                connection = sqlite3.connect(db_path)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connections[db_path] = connection
+            connection = connections[db_path]
+            connection.execute(CREATE_TABLE_SQL.format(table=table))
+            cursor = connection.execute(f'INSERT OR IGNORE INTO "{table}" (id, version, data) VALUES (?, ?, ?)', (id, ver, data))
+            table_path = os.path.join(folder_path, table)
+            num_of_imported_items[table_path] = num_of_imported_items.get(table_path, 0) + cursor.rowcount
+        for connection in connections.values():
+            connection.commit()
+    finally:
+        for connection in connections.values():
+            connection.close()
+    return num_of_imported_items
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import FileWithVersion storage tree into SQLite databases")
+    parser.add_argument("root_folder", help="Storage root folder, e.g. STORAGE_ROOT_FOLDER")
+    parser.add_argument("--extension", default="json", help="Extension of version files")
+    args = parser.parse_args()
+    for table_path, num_of_items in migrate(args.root_folder, args.extension).items():
+        print(f"{table_path}: {num_of_items} items imported")
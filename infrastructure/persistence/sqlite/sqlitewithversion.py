@@ -0,0 +1,200 @@
+import asyncio
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sqlite3
+import threading
+
+from expression import Result
+
+from infrastructure.persistence.filesystem.atomicwrite import Durability
+from shared.infrastructure.serialization.serializer import Serializer
+from shared.infrastructure.storage.repository import DEFAULT_MAX_CONCURRENCY, AlreadyExistsException, AsyncRepositoryWithVersion
+from shared.utils.lrucache import CacheInfo, LruCache
+from shared.utils.result import ResultTag
+
+DATABASE_FILE_NAME = "storage.db"
+# Stays below the default limit of host parameters in a single statement
+MAX_IDS_PER_SELECT = 500
+CREATE_TABLE_SQL = 'CREATE TABLE IF NOT EXISTS "{table}" (id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL)'
+
+# In WAL mode NORMAL syncs at checkpoints only and FULL syncs every commit
+_SYNCHRONOUS_BY_DURABILITY = {Durability.NONE: "OFF", Durability.FILE: "NORMAL", Durability.DIRECTORY: "FULL"}
+# Durabilities ordered from the weakest
+_DURABILITY_ORDER = (Durability.NONE, Durability.FILE, Durability.DIRECTORY)
+
+class SqliteDatabase:
+    '''
+    Single connection to SQLite database file in WAL mode.
+
+    All statements run on one dedicated thread, so the connection is never shared between threads
+    and the event loop is never blocked by disk io.
+    Connection is shared by every repository of the database, so it is synchronized for the strongest durability they require.
+    '''
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection: sqlite3.Connection | None = None
+        self._tables = set[str]()
+        self._durability = Durability.NONE
+        self._applied_durability: Durability | None = None
+
+    def require_durability(self, durability: Durability):
+        if _DURABILITY_ORDER.index(durability) > _DURABILITY_ORDER.index(self._durability):
+            self._durability = durability
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self._db_path), exist_ok=True)
+            connection = sqlite3.connect(self._db_path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._connection = connection
+        if self._applied_durability != self._durability:
+            durability = self._durability
+            self._connection.execute(f"PRAGMA synchronous={_SYNCHRONOUS_BY_DURABILITY[durability]}")
+            self._applied_durability = durability
+        return self._connection
+
+    def create_table(self, connection: sqlite3.Connection, table: str):
+        if table in self._tables:
+            return
+        connection.execute(CREATE_TABLE_SQL.format(table=table))
+        self._tables.add(table)
+
+    def run[R](self, func: Callable[[sqlite3.Connection], R]) -> asyncio.Future[R]:
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, lambda: func(self._connect()))
+
+_databases: dict[str, SqliteDatabase] = {}
+_databases_lock = threading.Lock()
+
+def get_database(folder_path: str, durability: Durability = Durability.NONE) -> SqliteDatabase:
+    db_path = os.path.abspath(os.path.join(folder_path, DATABASE_FILE_NAME))
+    with _databases_lock:
+        if db_path not in _databases:
+            _databases[db_path] = SqliteDatabase(db_path)
+        database = _databases[db_path]
+        database.require_durability(durability)
+        return database
+
+class SqliteWithVersion[TId, TItem, TItemDto](AsyncRepositoryWithVersion[TId, TItem]):
+    '''
+    Stores the latest version of every item as a row of items_sub_folder_name table in folder_path database.
+    Durability maps to synchronous mode of the database, NONE to OFF, FILE to NORMAL and DIRECTORY to FULL.
+    Up to cache_max_size recently used rows are kept in memory, so their get does not query the database.
+    '''
+    def __init__(
+        self,
+        items_sub_folder_name: str,
+        item_to_dto: Callable[[TItem], TItemDto],
+        dto_to_item: Callable[[TItemDto], TItem | Result],
+        serializer: Serializer[TItemDto],
+        folder_path: str,
+        durability: Durability = Durability.NONE,
+        cache_max_size: int = 0
+    ):
+        if '"' in items_sub_folder_name:
+            raise ValueError("items_sub_folder_name must not contain double quotes")
+        if cache_max_size < 0:
+            raise ValueError("cache_max_size must not be negative")
+        self._item_to_dto = item_to_dto
+        self._dto_to_item = dto_to_item
+        self._serializer = serializer
+        self._table = items_sub_folder_name
+        self._database = get_database(folder_path, durability)
+        # Caches serialized data rather than item, because item actions mutate loaded items in place
+        self._cache = LruCache[str, tuple[int, str | bytes]](cache_max_size) if cache_max_size > 0 else None
+
+    def _set_cached(self, id: TId, ver: int, data: str | bytes):
+        if self._cache is not None:
+            self._cache.set(str(id), (ver, data))
+
+    def _invalidate_cached(self, id: TId):
+        if self._cache is not None:
+            self._cache.invalidate(str(id))
+
+    def cache_info(self) -> CacheInfo:
+        if self._cache is None:
+            return CacheInfo(0, 0, 0, 0)
+        return self._cache.info()
+
+    def _execute(self, sql: str, parameters: tuple) -> Callable[[sqlite3.Connection], sqlite3.Cursor]:
+        def execute(connection: sqlite3.Connection):
+            self._database.create_table(connection, self._table)
+            return connection.execute(sql, parameters)
+        return execute
+
+    def _to_item(self, data: str | bytes) -> TItem:
+        dto_item = self._serializer.deserialize(data)
+        item_or_res = self._dto_to_item(dto_item)
+        match item_or_res:
+            case Result():
+                match item_or_res:
+                    case Result(tag=ResultTag.OK, ok=item):
+                        return item
+                    case Result(tag=ResultTag.ERROR, error=err):
+                        raise ValueError(str(err))
+                    case _:
+                        raise ValueError("Item is invalid")
+            case None:
+                raise ValueError("Item is None")
+            case item:
+                return item
+
+    async def get_all_ids(self) -> list[str]:
+        def get_all_ids(connection: sqlite3.Connection):
+            return [row[0] for row in self._execute(f'SELECT id FROM "{self._table}"', ())(connection).fetchall()]
+        return await self._database.run(get_all_ids)
+
+    async def get(self, id: TId) -> tuple[int, TItem] | None:
+        opt_cached = self._cache.get(str(id)) if self._cache is not None else None
+        if opt_cached is not None:
+            ver, data = opt_cached
+            return ver, self._to_item(data)
+        def get_row(connection: sqlite3.Connection):
+            return self._execute(f'SELECT version, data FROM "{self._table}" WHERE id = ?', (str(id),))(connection).fetchone()
+        opt_row = await self._database.run(get_row)
+        if opt_row is None:
+            self._invalidate_cached(id)
+            return None
+        ver, data = opt_row
+        self._set_cached(id, ver, data)
+        return ver, self._to_item(data)
+
+    async def add(self, id: TId, item: TItem) -> None:
+        data = self._serializer.serialize(self._item_to_dto(item))
+        insert = self._execute(f'INSERT INTO "{self._table}" (id, version, data) VALUES (?, 1, ?)', (str(id), data))
+        try:
+            await self._database.run(insert)
+        except sqlite3.IntegrityError:
+            self._invalidate_cached(id)
+            raise AlreadyExistsException(id)
+        self._set_cached(id, 1, data)
+
+    async def update(self, id: TId, ver: int, item: TItem) -> bool:
+        data = self._serializer.serialize(self._item_to_dto(item))
+        update = self._execute(f'UPDATE "{self._table}" SET version = version + 1, data = ? WHERE id = ? AND version = ?', (data, str(id), ver))
+        num_of_updated_rows = await self._database.run(lambda connection: update(connection).rowcount)
+        if num_of_updated_rows != 1:
+            self._invalidate_cached(id)
+            return False
+        self._set_cached(id, ver + 1, data)
+        return True
+
+    async def delete(self, id: TId) -> None:
+        self._invalidate_cached(id)
+        await self._database.run(self._execute(f'DELETE FROM "{self._table}" WHERE id = ?', (str(id),)))
+
+    async def get_many(self, ids: Sequence[TId], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> list[tuple[int, TItem] | None]:
+        str_ids = [str(id) for id in ids]
+        def get_rows(connection: sqlite3.Connection):
+            rows: dict[str, tuple[int, str | bytes]] = {}
+            for start in range(0, len(str_ids), MAX_IDS_PER_SELECT):
+                chunk = str_ids[start:start + MAX_IDS_PER_SELECT]
+                placeholders = ", ".join("?" for _ in chunk)
+                select = self._execute(f'SELECT id, version, data FROM "{self._table}" WHERE id IN ({placeholders})', tuple(chunk))
+                rows.update((id, (ver, data)) for id, ver, data in select(connection).fetchall())
+            return rows
+        rows = await self._database.run(get_rows)
+        return [(rows[id][0], self._to_item(rows[id][1])) if id in rows else None for id in str_ids]
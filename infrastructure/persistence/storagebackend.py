@@ -0,0 +1,79 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import StrEnum
+import os
+from typing import Optional
+
+from expression import Result
+
+from shared.infrastructure.serialization.format import SerializationFormat
+from shared.infrastructure.serialization.serializer import Serializer
+from shared.utils.string import strip_and_lowercase
+
+from .filesystem.atomicwrite import Durability
+from .filesystem.filewithversion import FileWithVersion
+from .filesystem.filewithversionlimited import FileWithVersionLimited
+from .sqlite.sqlitewithversion import SqliteWithVersion
+
+class StorageBackend(StrEnum):
+    FILE = "file"
+    SQLITE = "sqlite"
+
+    @staticmethod
+    def parse(value: str) -> Optional["StorageBackend"]:
+        if value is None:
+            return None
+        match strip_and_lowercase(value):
+            case StorageBackend.FILE:
+                return StorageBackend.FILE
+            case StorageBackend.SQLITE:
+                return StorageBackend.SQLITE
+            case _:
+                return None
+
+def _parse_from_env[T](store_name: str, setting_name: str, parser: Callable[[str], T | None], default: T) -> T:
+    raw_value = os.environ.get(f"{store_name}_STORAGE_{setting_name}") or os.environ.get(f"STORAGE_{setting_name}")
+    if raw_value is None:
+        return default
+    opt_value = parser(raw_value)
+    if opt_value is None:
+        raise ValueError(f"Invalid storage {setting_name.lower()} {raw_value} for {store_name} store")
+    return opt_value
+
+@dataclass(frozen=True)
+class StorageSettings:
+    backend: StorageBackend = StorageBackend.FILE
+    durability: Durability = Durability.NONE
+    format: SerializationFormat = SerializationFormat.JSON
+
+    @staticmethod
+    def from_env(store_name: str) -> "StorageSettings":
+        '''
+        Reads settings of store_name store from <STORE_NAME>_STORAGE_BACKEND, <STORE_NAME>_STORAGE_DURABILITY
+        and <STORE_NAME>_STORAGE_FORMAT env variables, falls back to STORAGE_BACKEND, STORAGE_DURABILITY and STORAGE_FORMAT
+        env variables and then to file backend without durability in json format.
+        '''
+        backend = _parse_from_env(store_name, "BACKEND", StorageBackend.parse, StorageBackend.FILE)
+        durability = _parse_from_env(store_name, "DURABILITY", Durability.parse, Durability.NONE)
+        format = _parse_from_env(store_name, "FORMAT", SerializationFormat.parse, SerializationFormat.JSON)
+        return StorageSettings(backend, durability, format)
+
+def create_repository_with_version[TId, TItem, TItemDto](
+    settings: StorageSettings,
+    items_sub_folder_name: str,
+    item_to_dto: Callable[[TItem], TItemDto],
+    dto_to_item: Callable[[TItemDto], TItem | Result],
+    serializer: Serializer[TItemDto],
+    extension: str,
+    folder_path: str,
+    max_number_of_stored_recent_versions: int | None = None,
+    cache_max_size: int = 0
+) -> FileWithVersion[TId, TItem, TItemDto] | SqliteWithVersion[TId, TItem, TItemDto]:
+    match settings.backend:
+        case StorageBackend.SQLITE:
+            # Only the latest version is stored in database
+            return SqliteWithVersion[TId, TItem, TItemDto](items_sub_folder_name, item_to_dto, dto_to_item, serializer, folder_path, settings.durability, cache_max_size)
+        case StorageBackend.FILE if max_number_of_stored_recent_versions is not None:
+            return FileWithVersionLimited[TId, TItem, TItemDto](items_sub_folder_name, item_to_dto, dto_to_item, serializer, extension, folder_path, max_number_of_stored_recent_versions, cache_max_size, settings.durability)
+        case StorageBackend.FILE:
+            return FileWithVersion[TId, TItem, TItemDto](items_sub_folder_name, item_to_dto, dto_to_item, serializer, extension, folder_path, cache_max_size, settings.durability)
@@ -1,24 +1,26 @@
+import asyncio
 from collections.abc import Callable, Sequence
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import logging
+import time
 from typing import Optional, ParamSpec, override
 from urllib.parse import urlparse
 
-from aio_pika import (
-    connect_robust,
-    Message,
-    RobustChannel
-)
-from aio_pika.abc import AbstractExchange
-from aiormq import ChannelClosed, ChannelInvalidStateError, ChannelNotFoundEntity, ConnectionChannelError
+from aio_pika import Message
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from aiormq import ChannelClosed, ChannelNotFoundEntity
 from aiormq.abc import DeliveredMessage
 from expression import Result
 from faststream.broker.types import CustomCallable, SubscriberMiddleware
-from faststream.rabbit import RabbitBroker, RabbitQueue
+from faststream.rabbit import Channel, RabbitBroker, RabbitQueue
 from faststream.rabbit.message import RabbitMessage
 from pamqp import commands as spec
 
 from shared.utils.parse import parse_bool_str
 
+from .channelpool import ChannelPoolInfo, PublishChannelPool
+from .rabbitmiddlewares import CommandHandlerMetrics, RetryPolicy, concurrency_limit_middleware, error_result_to_delayed_retry_middleware
+
 P = ParamSpec("P")
 
 @dataclass(frozen=True)
@@ -92,42 +94,67 @@ class AsyncCommandSubscriber:
     decoder: CustomCallable | None
     no_reply: bool
     middlewares: Sequence[SubscriberMiddleware[RabbitMessage]]
+    prefetch_count: int | None = None
+    max_concurrency: int | None = None
+    retry_policy: RetryPolicy | None = None
+    metrics: CommandHandlerMetrics = field(default_factory=CommandHandlerMetrics)
     func: Callable | None = None
+    concurrency_limit: concurrency_limit_middleware = field(init=False)
+
+    def __post_init__(self):
+        # Prefetch count alone bounds messages delivered by RabbitMQ, the limit bounds commands run in process as well
+        max_concurrency = self.max_concurrency if self.max_concurrency is not None else self.prefetch_count
+        self.concurrency_limit = concurrency_limit_middleware(self.metrics, max_concurrency)
 
     def __call__(self, func: Callable):
         self.func = func
     
 class RabbitMQBroker(RabbitBroker):
     _command_subscribers: tuple[AsyncCommandSubscriber, ...] = ()
-    def command_subscriber(self, command: str, decoder: CustomCallable | None = None, no_reply: bool = False, middlewares: Sequence[SubscriberMiddleware[RabbitMessage]] = ()):
-        command_subscriber = AsyncCommandSubscriber(command, decoder, no_reply, middlewares)
+    def command_subscriber(self, command: str, decoder: CustomCallable | None = None, no_reply: bool = False, middlewares: Sequence[SubscriberMiddleware[RabbitMessage]] = (), prefetch_count: int | None = None, max_concurrency: int | None = None, retry_policy: RetryPolicy | None = None):
+        '''
+        prefetch_count limits number of unacknowledged messages delivered to the subscriber (broker default when None),
+        max_concurrency limits number of messages handled at once (prefetch_count only when None),
+        retry_policy delays retries of commands handled with error result (error results are not retried when None).
+        '''
+        command_subscriber = AsyncCommandSubscriber(command, decoder, no_reply, middlewares, prefetch_count, max_concurrency, retry_policy)
         self._command_subscribers += (command_subscriber,)
         return command_subscriber
 
+    def __init__(self, *args, publish_channel_pool_size: int = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._publish_channel_pool_size = publish_channel_pool_size
+        self._publisher_confirms = kwargs.get("publisher_confirms", True)
+        self._publish_channel_pool: PublishChannelPool | None = None
+        self._num_of_set_up_command_subscribers = 0
+
+    def command_handler_metrics(self) -> dict[str, CommandHandlerMetrics]:
+        return {cmd_subscriber.command: cmd_subscriber.metrics for cmd_subscriber in self._command_subscribers}
+
+    def log_command_handler_metrics(self):
+        for cmd_subscriber in self._command_subscribers:
+            log_context = {"exchange": "", "queue": cmd_subscriber.command, "message_id": ""}
+            self._log(f"metrics: {cmd_subscriber.metrics}", logging.INFO, extra=log_context)
+
+    def command_concurrency_limit(self, command: str) -> concurrency_limit_middleware | None:
+        return next((cmd_subscriber.concurrency_limit for cmd_subscriber in reversed(self._command_subscribers) if cmd_subscriber.command == command), None)
+
+    def publish_channel_pool_info(self) -> ChannelPoolInfo | None:
+        return self._publish_channel_pool.info() if self._publish_channel_pool is not None else None
+
     def publish_to_default_exchange(self, routing_key: str, message: Message):
-        if self._channel is None:
+        if self._connection is None:
             raise RabbitMQBrokerNotConnectedError("RabbitMQ broker is not connected. Please call start() to establish a connection.")
-        return RabbitMQBroker._publish_to_exchange(self._channel, self._channel.default_exchange, routing_key, message, 2)
+        if self._publish_channel_pool is None:
+            self._publish_channel_pool = PublishChannelPool(self._connection, self._publish_channel_pool_size, self._publisher_confirms)
+        return RabbitMQBroker._publish_to_default_exchange(self._publish_channel_pool, routing_key, message)
 
     @staticmethod
-    async def _publish_to_exchange(channel: RobustChannel, exchange: AbstractExchange, routing_key: str, message: Message, retry_count: int) -> Result[None, Error.ExchangeNotFound | Error.RouteNotFound]:
+    async def _publish_to_default_exchange(channel_pool: PublishChannelPool, routing_key: str, message: Message) -> Result[None, Error.RouteNotFound]:
         try:
-            publish_res = await exchange.publish(message, routing_key)
+            publish_res = await channel_pool.publish(routing_key, message)
         except ChannelNotFoundEntity as ch_ex:
-            args = tuple(arg for arg in ch_ex.args if isinstance(arg, str))
-            if isinstance(exchange, str):
-                has_exchange_name = any(True for arg in args if exchange in arg)
-                if has_exchange_name:
-                    return Result.Error(Error.ExchangeNotFound(exchange))
             raise RabbitMQBrokerUnexpectedError(*ch_ex.args)
-        except (ChannelInvalidStateError, ConnectionChannelError) as ch_inv_err:
-            if retry_count > 0:
-                # await asyncio.sleep(RobustChannel.RESTORE_RETRY_DELAY)
-                await channel.ready()
-                return await RabbitMQBroker._publish_to_exchange(channel, exchange, routing_key, message, retry_count -1)
-            raise ch_inv_err
-        except Exception as ex:
-            raise ex
         match publish_res:
             case DeliveredMessage(delivery=delivery, header=_, body=_, channel=_):
                 if isinstance(delivery, spec.Basic.Return) and delivery.reply_code == 312:
@@ -139,30 +166,70 @@ class RabbitMQBroker(RabbitBroker):
 
     @override
     async def start(self):
-        await self._setup_command_subscribers()
+        # Queues are probed over broker connection, so it is established before subscribers are started
+        connection = await self.connect()
+        await self._setup_command_subscribers(connection)
         return await super().start()
 
-    async def _setup_command_subscribers(self):
-        if not self._command_subscribers:
-            return
-        
-        connection_kwargs = self._connection_kwargs.copy()
-        check_connection = await connect_robust(**connection_kwargs)
-        check_channel = await check_connection.channel()
+    @override
+    async def _close(self, exc_type=None, exc_val=None, exc_tb=None):
+        if self._publish_channel_pool is not None:
+            await self._publish_channel_pool.close()
+            self._publish_channel_pool = None
+        return await super()._close(exc_type, exc_val, exc_tb)
+
+    @staticmethod
+    async def _declare_retry_queues(channel: AbstractChannel, command: str, retry_policy: RetryPolicy):
+        for delay_ms in retry_policy.delays_ms():
+            arguments = {
+                "x-message-ttl": delay_ms,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": command
+            }
+            await channel.declare_queue(RetryPolicy.retry_queue_name(command, delay_ms), durable=True, arguments=arguments)
+        await channel.declare_queue(RetryPolicy.dead_letter_queue_name(command), durable=True)
+
+    @staticmethod
+    async def _probe_command_queue(connection: AbstractRobustConnection, cmd_subscriber: AsyncCommandSubscriber) -> bool:
+        # Failed passive declaration closes the channel, so every probe gets its own channel
+        channel = await connection.channel()
         try:
-            for cmd_subscriber in self._command_subscribers:
-                try:
-                    await check_channel.get_queue(cmd_subscriber.command, ensure=True)
-                    queue = RabbitQueue(name=cmd_subscriber.command, passive=True)
-                except ChannelClosed:
-                    queue = RabbitQueue(name=cmd_subscriber.command, exclusive=True)
-                    if not check_channel.is_closed:
-                        await check_channel.close()
-                    check_channel = await check_connection.channel()
-                subscriber = self.subscriber(queue=queue, decoder=cmd_subscriber.decoder, no_reply=cmd_subscriber.no_reply, middlewares=cmd_subscriber.middlewares)
-                subscriber(cmd_subscriber.func)
+            try:
+                await channel.get_queue(cmd_subscriber.command, ensure=True)
+                queue_exists = True
+            except ChannelClosed:
+                queue_exists = False
+                channel = await connection.channel()
+            if cmd_subscriber.retry_policy is not None:
+                await RabbitMQBroker._declare_retry_queues(channel, cmd_subscriber.command, cmd_subscriber.retry_policy)
+            return queue_exists
         finally:
-            if not check_channel.is_closed:
-                await check_channel.close()
-            if not check_connection.is_closed:
-                await check_connection.close()
+            if not channel.is_closed:
+                await channel.close()
+
+    async def _setup_command_subscribers(self, connection: AbstractRobustConnection):
+        command_subscribers = self._command_subscribers[self._num_of_set_up_command_subscribers:]
+        if not command_subscribers:
+            return
+        
+        start_time = time.perf_counter()
+        probes = (RabbitMQBroker._probe_command_queue(connection, cmd_subscriber) for cmd_subscriber in command_subscribers)
+        queues_exist = await asyncio.gather(*probes)
+        for cmd_subscriber, queue_exists in zip(command_subscribers, queues_exist):
+            if queue_exists:
+                queue = RabbitQueue(name=cmd_subscriber.command, passive=True)
+            else:
+                queue = RabbitQueue(name=cmd_subscriber.command, exclusive=True)
+            # Subscriber with own prefetch count consumes on its own channel
+            channel = Channel(prefetch_count=cmd_subscriber.prefetch_count) if cmd_subscriber.prefetch_count is not None else None
+            concurrency_limit = cmd_subscriber.concurrency_limit
+            middlewares = (concurrency_limit, *cmd_subscriber.middlewares)
+            if cmd_subscriber.retry_policy is not None:
+                delayed_retry = error_result_to_delayed_retry_middleware(cmd_subscriber.command, cmd_subscriber.retry_policy, self.publish_to_default_exchange)
+                middlewares = (concurrency_limit, delayed_retry, *cmd_subscriber.middlewares)
+            subscriber = self.subscriber(queue=queue, decoder=cmd_subscriber.decoder, no_reply=cmd_subscriber.no_reply, middlewares=middlewares, channel=channel)
+            subscriber(cmd_subscriber.func)
+        self._num_of_set_up_command_subscribers += len(command_subscribers)
+        setup_time = time.perf_counter() - start_time
+        log_context = {"exchange": "", "queue": "", "message_id": ""}
+        self._log(f"{len(command_subscribers)} command subscribers set up in {setup_time:.3f}s", logging.INFO, extra=log_context)
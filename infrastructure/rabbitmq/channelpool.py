@@ -0,0 +1,83 @@
+import asyncio
+from typing import NamedTuple
+
+from aio_pika import Message
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from aiormq import ChannelInvalidStateError, ConnectionChannelError
+from aiormq.abc import ConfirmationFrameType
+
+class ChannelPoolInfo(NamedTuple):
+    size: int
+    open_channels: int
+    in_flight: int
+    replaced_channels: int
+
+class PublishChannelPool:
+    '''
+    Fixed number of publishing channels of one connection.
+
+    Every publish goes to the least busy channel, equally busy channels are taken in round robin order.
+    Closed channels are reopened on next use and channels broken while publishing are replaced,
+    after the connection is ready again, before the publish is retried on another channel.
+    '''
+    def __init__(self, connection: AbstractRobustConnection, size: int, publisher_confirms: bool):
+        if size < 1:
+            raise ValueError("size must be greater than 0")
+        self._connection = connection
+        self._size = size
+        self._publisher_confirms = publisher_confirms
+        self._channels: list[AbstractChannel | None] = [None] * size
+        self._locks = tuple(asyncio.Lock() for _ in range(size))
+        self._in_flight = [0] * size
+        self._next_slot = 0
+        self._replaced_channels = 0
+
+    def info(self) -> ChannelPoolInfo:
+        open_channels = sum(1 for channel in self._channels if channel is not None and not channel.is_closed)
+        return ChannelPoolInfo(self._size, open_channels, sum(self._in_flight), self._replaced_channels)
+
+    def _select_slot(self) -> int:
+        start = self._next_slot
+        self._next_slot = (start + 1) % self._size
+        slots = ((start + i) % self._size for i in range(self._size))
+        return min(slots, key=lambda slot: self._in_flight[slot])
+
+    async def _get_channel(self, slot: int) -> AbstractChannel:
+        async with self._locks[slot]:
+            channel = self._channels[slot]
+            if channel is None or channel.is_closed:
+                channel = await self._connection.channel(publisher_confirms=self._publisher_confirms)
+                self._channels[slot] = channel
+            return channel
+
+    async def _replace(self, slot: int, broken_channel: AbstractChannel):
+        if self._channels[slot] is not broken_channel:
+            return
+        self._channels[slot] = None
+        self._replaced_channels += 1
+        try:
+            await broken_channel.close()
+        except Exception:
+            pass
+
+    async def publish(self, routing_key: str, message: Message, retry_count: int = 2) -> ConfirmationFrameType | None:
+        slot = self._select_slot()
+        self._in_flight[slot] += 1
+        try:
+            channel = await self._get_channel(slot)
+            try:
+                return await channel.default_exchange.publish(message, routing_key)
+            except (ChannelInvalidStateError, ConnectionChannelError):
+                if retry_count == 0:
+                    raise
+                await self._replace(slot, channel)
+        finally:
+            self._in_flight[slot] -= 1
+        await self._connection.ready()
+        return await self.publish(routing_key, message, retry_count - 1)
+
+    async def close(self):
+        channels = [channel for channel in self._channels if channel is not None and not channel.is_closed]
+        self._channels = [None] * self._size
+        for channel in channels:
+            await channel.close()
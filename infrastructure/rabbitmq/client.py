@@ -11,6 +11,7 @@ from shared.customtypes import Error as CustomError
 from shared.utils.result import ResultTag
 
 from .broker import RabbitMQBroker, Error as BrokerError
+from .rabbitmiddlewares import RetryPolicy
 
 P = ParamSpec("P")
 R = TypeVar("R")
@@ -28,24 +29,51 @@ class Error:
         '''Unexpected error when send command'''
 
 class RabbitMQClient:
-    def __init__(self, broker: RabbitMQBroker):
+    '''
+    Publishes commands without waiting for confirms of previous ones, up to max_unconfirmed_publishes
+    commands are in flight at once and every publish is completed by its own confirm.
+    '''
+    def __init__(self, broker: RabbitMQBroker, max_unconfirmed_publishes: int = 256):
         self._broker = broker
+        self._unconfirmed_publishes = asyncio.Semaphore(max_unconfirmed_publishes)
     
     async def send_command(self, command: str, message: Message) -> Result[None, Error.CommandRecipientNotFound | Error.SendCommandTimeout]:
-        publish_task = asyncio.create_task(self._broker.publish_to_default_exchange(command, message))
-        try:
-            five_seconds = 5
-            publish_res = await asyncio.wait_for(publish_task, timeout=five_seconds)
-            match publish_res:
-                case Result(tag=ResultTag.OK, ok=_):
-                    return Result.Ok(None)
-                case Result(tag=ResultTag.ERROR, error=BrokerError.RouteNotFound(routing_key)) if routing_key == command:
-                    return Result.Error(Error.CommandRecipientNotFound(command))
-                case _:
-                    raise RuntimeError("This should never happen")
-        except asyncio.TimeoutError:
-            publish_task.cancel()
-            return Result.Error(Error.SendCommandTimeout(command))
-    
-    def command_handler(self, command: str, message_decoder: Callable, middlewares: Sequence[SubscriberMiddleware[Any]] = ()):
-        return self._broker.command_subscriber(command=command, decoder=message_decoder, no_reply=True, middlewares=middlewares)
+        async with self._unconfirmed_publishes:
+            publish_task = asyncio.create_task(self._broker.publish_to_default_exchange(command, message))
+            try:
+                five_seconds = 5
+                publish_res = await asyncio.wait_for(publish_task, timeout=five_seconds)
+                match publish_res:
+                    case Result(tag=ResultTag.OK, ok=_):
+                        return Result.Ok(None)
+                    case Result(tag=ResultTag.ERROR, error=BrokerError.RouteNotFound(routing_key)) if routing_key == command:
+                        return Result.Error(Error.CommandRecipientNotFound(command))
+                    case _:
+                        raise RuntimeError("This should never happen")
+            except asyncio.TimeoutError:
+                publish_task.cancel()
+                return Result.Error(Error.SendCommandTimeout(command))
+    
+    async def send_commands(self, commands: Sequence[tuple[str, Message]]) -> list[Result[None, Error.CommandRecipientNotFound | Error.SendCommandTimeout | Error.UnexpectedError]]:
+        '''
+        Publishes all commands at once and returns results in the order of commands,
+        failure of one command does not affect the others.
+        '''
+        async def send_command(command: str, message: Message):
+            try:
+                return await self.send_command(command, message)
+            except Exception as e:
+                return Result.Error(Error.UnexpectedError.from_exception(e))
+        return await asyncio.gather(*(send_command(command, message) for command, message in commands))
+    
+    def command_handler(self, command: str, message_decoder: Callable, middlewares: Sequence[SubscriberMiddleware[Any]] = (), prefetch_count: int | None = None, max_concurrency: int | None = None, retry_policy: RetryPolicy | None = None):
+        return self._broker.command_subscriber(command=command, decoder=message_decoder, no_reply=True, middlewares=middlewares, prefetch_count=prefetch_count, max_concurrency=max_concurrency, retry_policy=retry_policy)
+    
+    def command_handler_metrics(self):
+        return self._broker.command_handler_metrics()
+    
+    def log_command_handler_metrics(self):
+        self._broker.log_command_handler_metrics()
+    
+    def command_concurrency_limit(self, command: str):
+        return self._broker.command_concurrency_limit(command)
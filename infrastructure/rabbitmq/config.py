@@ -1,16 +1,24 @@
-from collections.abc import Callable, Coroutine
+from collections.abc import Callable, Coroutine, Sequence
+import functools
+import logging
 import os
+import re
 from typing import Any
 
 from expression import Result
 from faststream import FastStream
 
+from infrastructure.loopback.transport import LoopbackTransport
+from shared.action import Action, MessageDurability
 from shared.pipeline.actionhandler import ActionInput
 from shared.utils.exceptiondecorators import async_ex_to_error_result
+from shared.utils.parse import parse_bool_str, parse_int
 
 from . import rabbitrunaction as rabbit_action
 from .broker import RabbitMQBroker, RabbitMQConfig
 from .client import RabbitMQClient, Error as RabbitClientError
+from .messagecodec import MessageCodecName, MessageCompression, create_codec
+from .rabbitmiddlewares import CommandHandlerMetrics, CommandHandlerMetricsLogger, RetryPolicy
 
 _raw_rabbitmq_url = os.environ["RABBITMQ_URL"]
 _raw_rabbitmq_publisher_confirms = os.environ["RABBITMQ_PUBLISHER_CONFIRMS"]
@@ -18,15 +26,121 @@ _rabbitmqconfig = RabbitMQConfig.parse(_raw_rabbitmq_url, _raw_rabbitmq_publishe
 if _rabbitmqconfig is None:
     raise ValueError("Invalid RabbitMQ configuration")
 _log_fmt = '%(asctime)s %(levelname)-8s - %(exchange)-4s | %(queue)-10s | %(message_id)-10s - %(message)s'
-_rabbit_broker = RabbitMQBroker(url=_rabbitmqconfig.url.value, publisher_confirms=_rabbitmqconfig.publisher_confirms, log_fmt=_log_fmt)
+# Number of channels used to publish commands, 1 keeps commands of the process in publish order
+_raw_rabbitmq_publish_channels = os.environ.get("RABBITMQ_PUBLISH_CHANNELS", "1")
+_opt_rabbitmq_publish_channels = parse_int(_raw_rabbitmq_publish_channels)
+if _opt_rabbitmq_publish_channels is None or _opt_rabbitmq_publish_channels < 1:
+    raise ValueError(f"Invalid RabbitMQ publish channels {_raw_rabbitmq_publish_channels}")
+_rabbit_broker = RabbitMQBroker(url=_rabbitmqconfig.url.value, publisher_confirms=_rabbitmqconfig.publisher_confirms, log_fmt=_log_fmt, publish_channel_pool_size=_opt_rabbitmq_publish_channels)
 _rabbit_client = RabbitMQClient(_rabbit_broker)
+# Codec of sent messages, received messages are decoded by codec of their content type whatever it is
+_raw_rabbitmq_message_codec = os.environ.get("RABBITMQ_MESSAGE_CODEC", MessageCodecName.PICKLE)
+_opt_message_codec_name = MessageCodecName.parse(_raw_rabbitmq_message_codec)
+if _opt_message_codec_name is None:
+    raise ValueError(f"Invalid RabbitMQ message codec {_raw_rabbitmq_message_codec}")
+_message_codec = create_codec(_opt_message_codec_name)
+# Encoded messages of at least this number of bytes are compressed, messages are not compressed when not set
+_raw_rabbitmq_compression_threshold = os.environ.get("RABBITMQ_COMPRESSION_THRESHOLD")
+_opt_rabbitmq_compression_threshold = parse_int(_raw_rabbitmq_compression_threshold) if _raw_rabbitmq_compression_threshold is not None else None
+if _raw_rabbitmq_compression_threshold is not None and (_opt_rabbitmq_compression_threshold is None or _opt_rabbitmq_compression_threshold < 0):
+    raise ValueError(f"Invalid RabbitMQ compression threshold {_raw_rabbitmq_compression_threshold}")
+_message_compression = MessageCompression(_opt_rabbitmq_compression_threshold) if _opt_rabbitmq_compression_threshold is not None else None
 
-def run_action(action_name: str, action_input: ActionInput) -> Coroutine[Any, Any, Result[None, Any]]:
+def _to_env_name(value: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "_", value.upper())
+
+@functools.cache
+def _message_durability(action_name: str) -> MessageDurability:
+    '''
+    Reads RABBITMQ_<ACTION_NAME>_DURABILITY falling back to RABBITMQ_<ACTION_TYPE>_ACTIONS_DURABILITY,
+    RABBITMQ_DURABILITY and then to durability declared by action, which is persistent unless action declares otherwise.
+    '''
+    opt_action = Action.parse_name(action_name)
+    action_type_env_vars = [f"RABBITMQ_{_to_env_name(opt_action.type)}_ACTIONS_DURABILITY"] if opt_action is not None else []
+    env_vars = [f"RABBITMQ_{_to_env_name(action_name)}_DURABILITY", *action_type_env_vars, "RABBITMQ_DURABILITY"]
+    for env_var in env_vars:
+        raw_durability = os.environ.get(env_var)
+        if raw_durability is None:
+            continue
+        opt_durability = MessageDurability.parse(raw_durability)
+        if opt_durability is None:
+            raise ValueError(f"Invalid {env_var} {raw_durability}")
+        return opt_durability
+    return Action.declared_durability(action_name)
+
+def _parse_command_handler_limit(command: str, limit_name: str) -> int | None:
+    '''
+    Reads RABBITMQ_<COMMAND>_<LIMIT_NAME> falling back to RABBITMQ_<LIMIT_NAME>, no limit when both are not set.
+    '''
+    global_env_var = f"RABBITMQ_{limit_name}"
+    command_env_var = f"RABBITMQ_{_to_env_name(command)}_{limit_name}"
+    raw_limit = os.environ.get(command_env_var, os.environ.get(global_env_var))
+    if raw_limit is None:
+        return None
+    opt_limit = parse_int(raw_limit)
+    if opt_limit is None or opt_limit < 1:
+        raise ValueError(f"Invalid {command_env_var} or {global_env_var} {raw_limit}")
+    return opt_limit
+
+def _rabbit_run_action(action_name: str, action_input: ActionInput) -> Coroutine[Any, Any, Result[None, Any]]:
     rabbit_run_action = async_ex_to_error_result(RabbitClientError.UnexpectedError.from_exception)(rabbit_action.run)
-    return rabbit_run_action(_rabbit_client, action_name, action_input)
+    return rabbit_run_action(_rabbit_client, action_name, action_input, _message_codec, _message_durability(action_name), _message_compression)
+
+def _rabbit_run_actions(actions: Sequence[tuple[str, ActionInput]]) -> Coroutine[Any, Any, list[Result[None, Any]]]:
+    return rabbit_action.run_many(_rabbit_client, actions, _message_codec, _message_durability, _message_compression)
+
+def _rabbit_action_handler(action_name: str, action_handler: Callable[[Result[ActionInput, Any]], Coroutine]):
+    # Prefetch count bounds messages taken from the queue, max concurrency bounds handlers running at once
+    prefetch_count = _parse_command_handler_limit(action_name, "PREFETCH")
+    max_concurrency = _parse_command_handler_limit(action_name, "MAX_CONCURRENCY")
+    # Failed action is retried with exponential delay and moved to <command>.dead queue after max attempts
+    max_attempts = _parse_command_handler_limit(action_name, "MAX_ATTEMPTS")
+    retry_policy = RetryPolicy(max_attempts=max_attempts) if max_attempts is not None else RetryPolicy()
+    return rabbit_action.handler(_rabbit_client, action_name, prefetch_count, max_concurrency, retry_policy)(action_handler)
+
+def _limit_local_action(action_name: str, run: Callable[[], Coroutine]):
+    # Action run locally takes a slot of the same concurrency limit as action delivered by RabbitMQ
+    opt_concurrency_limit = _rabbit_client.command_concurrency_limit(action_name)
+    return opt_concurrency_limit.run(run) if opt_concurrency_limit is not None else run()
+
+# Actions handled in this process are run directly on the event loop, other actions are sent to RabbitMQ.
+# Actions run locally are not persisted, so unlike actions sent to RabbitMQ they are lost when the process crashes
+_raw_loopback_local_actions = os.environ.get("LOOPBACK_LOCAL_ACTIONS", "false")
+_opt_loopback_local_actions = parse_bool_str(_raw_loopback_local_actions)
+if _opt_loopback_local_actions is None:
+    raise ValueError(f"Invalid loopback local actions {_raw_loopback_local_actions}")
+_loopback_transport = LoopbackTransport(_rabbit_run_action, _rabbit_run_actions, _rabbit_action_handler, logging.getLogger("loopback_transport"), _limit_local_action) if _opt_loopback_local_actions else None
+
+def run_action(action_name: str, action_input: ActionInput) -> Coroutine[Any, Any, Result[None, Any]]:
+    if _loopback_transport is not None:
+        return _loopback_transport.run_action(action_name, action_input)
+    return _rabbit_run_action(action_name, action_input)
+
+def run_actions(actions: Sequence[tuple[str, ActionInput]]) -> Coroutine[Any, Any, list[Result[None, Any]]]:
+    if _loopback_transport is not None:
+        return _loopback_transport.run_actions(actions)
+    return _rabbit_run_actions(actions)
 
 def action_handler(action_name: str, action_handler: Callable[[Result[ActionInput, Any]], Coroutine]):
-    return rabbit_action.handler(_rabbit_client, action_name)(action_handler)
+    if _loopback_transport is not None:
+        return _loopback_transport.action_handler(action_name, action_handler)
+    return _rabbit_action_handler(action_name, action_handler)
+
+def command_handler_metrics() -> dict[str, CommandHandlerMetrics]:
+    return _rabbit_client.command_handler_metrics()
+
+# Command handler metrics are logged every this number of seconds, metrics are not logged when 0
+_raw_rabbitmq_metrics_log_interval = os.environ.get("RABBITMQ_METRICS_LOG_INTERVAL", "60")
+_opt_rabbitmq_metrics_log_interval = parse_int(_raw_rabbitmq_metrics_log_interval)
+if _opt_rabbitmq_metrics_log_interval is None or _opt_rabbitmq_metrics_log_interval < 0:
+    raise ValueError(f"Invalid RabbitMQ metrics log interval {_raw_rabbitmq_metrics_log_interval}")
+_metrics_logger = CommandHandlerMetricsLogger(_rabbit_client.log_command_handler_metrics, _opt_rabbitmq_metrics_log_interval) if _opt_rabbitmq_metrics_log_interval > 0 else None
 
 def create_faststream_app():
-    return FastStream(broker=_rabbit_broker)
\ No newline at end of file
+    app = FastStream(broker=_rabbit_broker)
+    if _metrics_logger is not None:
+        app.after_startup(_metrics_logger.start)
+        app.on_shutdown(_metrics_logger.stop)
+    if _loopback_transport is not None:
+        app.on_shutdown(_loopback_transport.wait_for_running_actions)
+    return app
\ No newline at end of file
@@ -0,0 +1,163 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import StrEnum
+import json
+import pickle
+from typing import Any, Optional
+import zlib
+
+from aio_pika import DeliveryMode, Message
+
+from shared.utils.string import strip_and_lowercase
+
+@dataclass(frozen=True)
+class DataWithCorrelationId:
+    data: dict[str, Any]
+    correlation_id: str
+
+class MessageCodec(ABC):
+    '''
+    Encodes message body and tells its content type, so receivers can pick matching codec for every message.
+    '''
+    content_type: str
+
+    @abstractmethod
+    def encode(self, data: dict[str, Any]) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, body: bytes) -> Any:
+        pass
+
+class PythonPickleCodec(MessageCodec):
+    content_type = "application/python-pickle"
+
+    def encode(self, data: dict[str, Any]) -> bytes:
+        return pickle.dumps(data)
+    
+    def decode(self, body: bytes) -> Any:
+        return pickle.loads(body)
+
+class CompactJsonCodec(MessageCodec):
+    content_type = "application/json"
+
+    def encode(self, data: dict[str, Any]) -> bytes:
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+    
+    def decode(self, body: bytes) -> Any:
+        return json.loads(body)
+
+class MsgPackCodec(MessageCodec):
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        # msgpack is optional package, so it is imported only when used
+        import msgpack
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+    
+    def encode(self, data: dict[str, Any]) -> bytes:
+        return self._packb(data)
+    
+    def decode(self, body: bytes) -> Any:
+        return self._unpackb(body)
+
+class MessageCodecName(StrEnum):
+    PICKLE = "pickle"
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+    @staticmethod
+    def parse(value: str) -> Optional["MessageCodecName"]:
+        if value is None:
+            return None
+        match strip_and_lowercase(value):
+            case MessageCodecName.PICKLE:
+                return MessageCodecName.PICKLE
+            case MessageCodecName.JSON:
+                return MessageCodecName.JSON
+            case MessageCodecName.MSGPACK:
+                return MessageCodecName.MSGPACK
+            case _:
+                return None
+
+def create_codec(name: MessageCodecName) -> MessageCodec:
+    match name:
+        case MessageCodecName.PICKLE:
+            return PythonPickleCodec()
+        case MessageCodecName.JSON:
+            return CompactJsonCodec()
+        case MessageCodecName.MSGPACK:
+            return MsgPackCodec()
+
+_codec_names_by_content_type = {
+    PythonPickleCodec.content_type: MessageCodecName.PICKLE,
+    CompactJsonCodec.content_type: MessageCodecName.JSON,
+    MsgPackCodec.content_type: MessageCodecName.MSGPACK
+}
+_codecs_by_content_type: dict[str, MessageCodec] = {}
+
+def get_codec(content_type: str | None) -> MessageCodec | None:
+    '''
+    Returns codec of content_type whichever codec the sender uses, messages without content type are python pickle ones.
+    Raises ImportError when optional package of the codec is not installed.
+    '''
+    content_type = content_type or PythonPickleCodec.content_type
+    opt_codec = _codecs_by_content_type.get(content_type)
+    if opt_codec is not None:
+        return opt_codec
+    opt_codec_name = _codec_names_by_content_type.get(content_type)
+    if opt_codec_name is None:
+        return None
+    codec = create_codec(opt_codec_name)
+    _codecs_by_content_type[content_type] = codec
+    return codec
+
+# Content encoding is duplicated in header, as faststream messages do not expose content encoding property
+CONTENT_ENCODING_HEADER = "content-encoding"
+DEFLATE_CONTENT_ENCODING = "deflate"
+
+@dataclass(frozen=True)
+class MessageCompression:
+    '''
+    Compresses encoded message body of at least threshold bytes with zlib, smaller bodies are sent as is.
+    '''
+    threshold: int
+    level: int = 6
+
+    def __post_init__(self):
+        if self.threshold < 0:
+            raise ValueError("threshold must not be negative")
+        if not 0 <= self.level <= 9:
+            raise ValueError("level must be from 0 to 9")
+
+    def compress(self, body: bytes) -> tuple[bytes, str | None]:
+        if len(body) < self.threshold:
+            return body, None
+        compressed_body = zlib.compress(body, self.level)
+        if len(compressed_body) >= len(body):
+            return body, None
+        return compressed_body, DEFLATE_CONTENT_ENCODING
+
+def decompress(body: bytes, content_encoding: str | None) -> bytes:
+    '''
+    Returns body as it was before compression with content_encoding, raises ValueError for unsupported content encoding.
+    '''
+    match content_encoding:
+        case None | "" | "identity":
+            return body
+        case "deflate":
+            return zlib.decompress(body)
+        case _:
+            raise ValueError(f"Unsupported content encoding {content_encoding}")
+
+class CodecMessage(Message):
+    def __init__(self, codec: MessageCodec, src_data: DataWithCorrelationId, headers: dict[str, str] | None = None, delivery_mode: DeliveryMode = DeliveryMode.PERSISTENT, compression: MessageCompression | None = None):
+        msg_body = codec.encode(src_data.data)
+        content_encoding = None
+        if compression is not None:
+            msg_body, content_encoding = compression.compress(msg_body)
+        if content_encoding is not None:
+            headers = (headers or {}) | {CONTENT_ENCODING_HEADER: content_encoding}
+        message_kwargs = {"correlation_id": src_data.correlation_id, "headers": headers, "content_encoding": content_encoding}
+        super().__init__(body=msg_body, delivery_mode=delivery_mode, content_type=codec.content_type, **message_kwargs)
\ No newline at end of file
@@ -1,23 +1,77 @@
+import asyncio
 from collections.abc import Awaitable, Callable
-from enum import StrEnum
+from dataclasses import dataclass
 from logging import LoggerAdapter
-import secrets
+import time
 from typing import Any
 
+from aio_pika import DeliveryMode, Message
 from expression import Result
 from faststream.broker.message import StreamMessage
 from faststream.exceptions import NackMessage
 
 from shared.utils.result import ResultTag
 
-class RequeueChance(StrEnum):
-    LOW = "low"
-    FIFTY_FIFTY = "50-50"
-    HIGH = "high"
+ATTEMPT_HEADER = "x-attempt"
+MAX_ATTEMPTS_HEADER = "x-max-attempts"
+LAST_ERROR_HEADER = "x-last-error"
 
-class error_result_to_negative_acknowledge_middleware:
-    def __init__(self, requeue_chance: RequeueChance):
-        self._requeue_chance = requeue_chance
+@dataclass(frozen=True)
+class RetryPolicy:
+    '''
+    Failed command is delayed for base_delay * multiplier ^ (attempt - 1) seconds, but not more than max_delay,
+    before next attempt. After max_attempts failed attempts the command is moved to dead letter queue.
+    '''
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    multiplier: float = 2.0
+    max_delay: float = 60.0
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be greater than 0")
+        if self.base_delay <= 0 or self.multiplier < 1 or self.max_delay < self.base_delay:
+            raise ValueError("Invalid retry delays")
+
+    def delay_ms(self, attempt: int) -> int:
+        delay = min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return max(int(delay * 1000), 1)
+
+    def delays_ms(self) -> tuple[int, ...]:
+        return tuple(sorted({self.delay_ms(attempt) for attempt in range(1, self.max_attempts)}))
+
+    @staticmethod
+    def retry_queue_name(command: str, delay_ms: int) -> str:
+        # Delay is part of the name, so changed policy declares new queues instead of conflicting with existing ones
+        return f"{command}.retry.{delay_ms}ms"
+
+    @staticmethod
+    def dead_letter_queue_name(command: str) -> str:
+        return f"{command}.dead"
+
+def _delivery_mode(msg: StreamMessage[Any]) -> DeliveryMode:
+    # Command consumed without raw message (e.g. in tests) is copied as persistent one
+    raw_message = msg.raw_message
+    if isinstance(raw_message, Message):
+        return raw_message.delivery_mode
+    return DeliveryMode.PERSISTENT
+
+class error_result_to_delayed_retry_middleware:
+    '''
+    Publishes failed command to retry queue of its attempt, the retry queue dead letters it back to command queue
+    once message TTL expires. Command failed max_attempts times is published to dead letter queue.
+    Failed command is acknowledged only after its copy is published, otherwise it is requeued.
+    Copy keeps delivery mode of the failed command, so transient commands are not persisted by their retries.
+    '''
+    def __init__(
+        self,
+        command: str,
+        retry_policy: RetryPolicy,
+        publish: Callable[[str, Message], Awaitable[Result]]
+    ):
+        self._command = command
+        self._retry_policy = retry_policy
+        self._publish = publish
     
     async def __call__(
         self,
@@ -26,20 +80,125 @@ class error_result_to_negative_acknowledge_middleware:
     ) -> Any:
         res = await call_next(msg)
         match res:
-            case Result(tag=ResultTag.ERROR, error=_):
-                match self._requeue_chance:
-                    case RequeueChance.LOW:
-                        rand_bits = secrets.randbits(3)
-                        requeue = rand_bits == 0
-                    case RequeueChance.FIFTY_FIFTY:
-                        rand_bits = secrets.randbits(1)
-                        requeue = rand_bits == 0
-                    case RequeueChance.HIGH:
-                        rand_bits = secrets.randbits(3)
-                        requeue = rand_bits > 0
-                raise NackMessage(requeue=requeue)
+            case Result(tag=ResultTag.ERROR, error=error):
+                headers = dict(msg.headers or {})
+                attempt = int(headers.get(ATTEMPT_HEADER, 1))
+                headers[ATTEMPT_HEADER] = attempt + 1
+                headers[MAX_ATTEMPTS_HEADER] = self._retry_policy.max_attempts
+                headers[LAST_ERROR_HEADER] = str(error)[:200]
+                if attempt < self._retry_policy.max_attempts:
+                    routing_key = RetryPolicy.retry_queue_name(self._command, self._retry_policy.delay_ms(attempt))
+                else:
+                    routing_key = RetryPolicy.dead_letter_queue_name(self._command)
+                message = Message(
+                    body=msg.body,
+                    headers=headers,
+                    content_type=msg.content_type,
+                    correlation_id=msg.correlation_id,
+                    message_id=msg.message_id,
+                    delivery_mode=_delivery_mode(msg)
+                )
+                try:
+                    publish_res = await self._publish(routing_key, message)
+                except Exception:
+                    raise NackMessage(requeue=True)
+                if publish_res.is_error():
+                    raise NackMessage(requeue=True)
         return res
 
+@dataclass
+class CommandHandlerMetrics:
+    '''
+    Messages waiting for free handler slot (queued), being handled (in_flight) and already handled ones
+    with their handling time in seconds.
+    '''
+    queued: int = 0
+    in_flight: int = 0
+    processed: int = 0
+    total_processing_time: float = 0.0
+    max_processing_time: float = 0.0
+
+    @property
+    def avg_processing_time(self) -> float:
+        return self.total_processing_time / self.processed if self.processed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"queued {self.queued}, in flight {self.in_flight}, processed {self.processed}, "
+            f"avg processing time {self.avg_processing_time:.3f}s, max processing time {self.max_processing_time:.3f}s"
+        )
+
+class CommandHandlerMetricsLogger:
+    '''
+    Calls log_metrics each interval seconds while it is started and once more when it is stopped.
+    '''
+    def __init__(self, log_metrics: Callable[[], None], interval: float):
+        if interval <= 0:
+            raise ValueError("interval must be greater than 0")
+        self._log_metrics = log_metrics
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _log_periodically(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            self._log_metrics()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._log_periodically())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Metrics of the last interval are logged on shutdown as well
+        self._log_metrics()
+
+class concurrency_limit_middleware:
+    '''
+    Lets at most max_concurrency messages to be handled at once, the rest wait in process
+    and are not acknowledged, so RabbitMQ does not deliver more than prefetch count of them.
+    Commands handled without message (e.g. by loopback transport) share the same limit by run.
+    '''
+    def __init__(self, metrics: CommandHandlerMetrics, max_concurrency: int | None = None):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be greater than 0")
+        self._metrics = metrics
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+    
+    async def __call__(
+        self,
+        call_next: Callable[[Any], Awaitable[Any]],
+        msg: StreamMessage[Any],
+    ) -> Any:
+        return await self.run(lambda: call_next(msg))
+    
+    async def run[T](self, call: Callable[[], Awaitable[T]]) -> T:
+        if self._semaphore is not None:
+            self._metrics.queued += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._metrics.queued -= 1
+        self._metrics.in_flight += 1
+        start_time = time.perf_counter()
+        try:
+            return await call()
+        finally:
+            processing_time = time.perf_counter() - start_time
+            self._metrics.in_flight -= 1
+            self._metrics.processed += 1
+            self._metrics.total_processing_time += processing_time
+            self._metrics.max_processing_time = max(self._metrics.max_processing_time, processing_time)
+            if self._semaphore is not None:
+                self._semaphore.release()
+
 class command_handler_logging_middleware:
     def __init__(
         self,
@@ -54,17 +213,10 @@ class command_handler_logging_middleware:
         call_next: Callable[[Any], Awaitable[Any]],
         msg: StreamMessage[Any],
     ) -> Any:
+        # Only headers and body size are logged, body is decoded by handler
         logger = self._logger_creator(msg)
-        decoded_data = await msg.decode()
-        match decoded_data:
-            case Result(tag=ResultTag.OK, ok=data):
-                first_100_chars = str(data)[:100]
-                output = first_100_chars + "..." if len(first_100_chars) == 100 else first_100_chars
-                logger.info(f"{self._message_prefix} RECEIVED {output}")
-            case Result(tag=ResultTag.ERROR, error=error):
-                logger.error(f"{self._message_prefix} RECEIVED {error}")
-            case unsupported_decoded_data:
-                logger.warning(f"{self._message_prefix} RECEIVED UNSUPPORTED {unsupported_decoded_data}")
+        body_size = len(msg.body) if isinstance(msg.body, bytes) else 0
+        logger.info(f"{self._message_prefix} RECEIVED {body_size} bytes of {msg.content_type}")
         res = await call_next(msg)
         match res:
             case Result(tag=ResultTag.OK, ok=result):
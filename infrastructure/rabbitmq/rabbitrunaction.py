@@ -1,44 +1,58 @@
-from collections.abc import Callable, Coroutine
+from collections.abc import Callable, Coroutine, Sequence
+from dataclasses import dataclass
 from logging import LoggerAdapter
-import pickle
 from typing import Any
 
+from aio_pika import DeliveryMode
 from expression import Result
 from faststream.broker.message import StreamMessage
 from faststream.rabbit import RabbitMessage
 
+from shared.action import MessageDurability
 from shared.pipeline.actionhandler import ActionInput
 from shared.customtypes import Error
-from shared.utils.parse import parse_from_dict
 
 from .client import RabbitMQClient
 from .error import rabbit_message_error_creator, RabbitMessageErrorCreator, ParseError, ValidationError, RabbitMessageError
 from .logging import RabbitMessageLoggerCreator
-from .pythonpickle import DataWithCorrelationId, PythonPickleMessage
-from .rabbitmiddlewares import error_result_to_negative_acknowledge_middleware, command_handler_logging_middleware, RequeueChance
+from .messagecodec import CONTENT_ENCODING_HEADER, CodecMessage, DataWithCorrelationId, MessageCodec, MessageCompression, PythonPickleCodec, decompress, get_codec
+from .rabbitmiddlewares import command_handler_logging_middleware, RetryPolicy
 
-class _python_pickle:
+@dataclass(frozen=True)
+class _EncodedActionInput:
+    msg: RabbitMessage
+
+class _codec_message:
     @staticmethod
-    def data_to_message(data: ActionInput) -> PythonPickleMessage:
+    def data_to_message(codec: MessageCodec, data: ActionInput, durability: MessageDurability = MessageDurability.PERSISTENT, compression: MessageCompression | None = None) -> CodecMessage:
         ids_dict = {"run_id": data.run_id, "step_id": data.step_id}
         action_data = ids_dict | {"data": data.data, "metadata": data.metadata}
         correlation_id = ids_dict["run_id"]
         data_with_correlation_id = DataWithCorrelationId(action_data, correlation_id)
-        return PythonPickleMessage(data_with_correlation_id)
+        # Ids are duplicated in headers, so middlewares do not need to decode the body
+        opt_task_id = data.metadata.get("task_id")
+        task_id_dict = {"task_id": str(opt_task_id)} if opt_task_id is not None else {}
+        headers = {"run_id": str(data.run_id), "step_id": str(data.step_id)} | task_id_dict
+        delivery_mode = DeliveryMode.PERSISTENT if durability == MessageDurability.PERSISTENT else DeliveryMode.NOT_PERSISTENT
+        return CodecMessage(codec, data_with_correlation_id, headers, delivery_mode, compression)
     
     class decoder():
         def __init__(self, action_name: str):
             self._action_name = action_name
         
         @staticmethod
-        def _parse_rabbitmq_msg_python_pickle(rabbit_msg_err: RabbitMessageErrorCreator, msg: RabbitMessage) -> Result[ActionInput, RabbitMessageError]:
+        def _parse_rabbitmq_msg(rabbit_msg_err: RabbitMessageErrorCreator, msg: RabbitMessage) -> Result[ActionInput, RabbitMessageError]:
             correlation_id = msg.correlation_id
             if correlation_id is None:
                 return Result.Error(rabbit_msg_err(ValidationError, "Invalid 'correlation_id'"))
             if not isinstance(msg.body, bytes):
                 return Result.Error(rabbit_msg_err(ParseError, f"Expected body of bytes type, got {type(msg.body).__name__}"))
             try:
-                decoded = pickle.loads(msg.body)
+                opt_codec = get_codec(msg.content_type)
+                if opt_codec is None:
+                    return Result.Error(rabbit_msg_err(ParseError, f"Unsupported content type {msg.content_type}"))
+                body = decompress(msg.body, (msg.headers or {}).get(CONTENT_ENCODING_HEADER))
+                decoded = opt_codec.decode(body)
             except Exception as e:
                 message = Error.from_exception(e).message
                 return Result.Error(rabbit_msg_err(ParseError, message))
@@ -77,46 +91,47 @@ class _python_pickle:
         def __call__(self, message):
             msg: RabbitMessage = message
             rabbit_msg_err = rabbit_message_error_creator(f"Decoding RUN_ACTION({self._action_name})", msg.correlation_id)
-            parsed_data_res = self._parse_rabbitmq_msg_python_pickle(rabbit_msg_err, msg)
+            parsed_data_res = self._parse_rabbitmq_msg(rabbit_msg_err, msg)
             return parsed_data_res
         
     @staticmethod
-    def parse_task_id_run_id_step_id(msg: StreamMessage[Any]) -> tuple[str, str, str]:
-        if not isinstance(msg.body, bytes):
-            return "N/A", "N/A", "N/A"
-        try:
-            decoded = pickle.loads(msg.body)
-        except Exception:
-            return "N/A", "N/A", "N/A"
-        if not isinstance(decoded, dict):
-            return "N/A", "N/A", "N/A"
-        metadata_res = parse_from_dict(decoded, "metadata", lambda m: m if isinstance(m, dict) else None)
-        task_id_res = metadata_res.map(lambda m: str(m.get("task_id", "N/A")))
-        task_id = task_id_res.default_value("N/A")
-        run_id = str(decoded.get("run_id", "N/A"))
-        step_id = str(decoded.get("step_id", "N/A"))
-        return task_id, run_id, step_id
+    def lazy_decoder(message) -> _EncodedActionInput:
+        # Body is decoded only by handler, middlewares work with headers
+        return _EncodedActionInput(message)
     
     @staticmethod
     def create_logger(msg: StreamMessage[Any]) -> LoggerAdapter:
         logger_creator = RabbitMessageLoggerCreator(msg.raw_message)
-        ids = _python_pickle.parse_task_id_run_id_step_id(msg)
-        return logger_creator.create(*ids)
+        task_id = str(msg.headers.get("task_id", "N/A"))
+        # Messages sent before ids were added to headers have run_id as correlation_id
+        run_id = str(msg.headers.get("run_id", msg.correlation_id or "N/A"))
+        step_id = str(msg.headers.get("step_id", "N/A"))
+        return logger_creator.create(task_id, run_id, step_id)
 
-def run(rabbit_client: RabbitMQClient, action_name: str, action_input: ActionInput):
+def run(rabbit_client: RabbitMQClient, action_name: str, action_input: ActionInput, codec: MessageCodec = PythonPickleCodec(), durability: MessageDurability = MessageDurability.PERSISTENT, compression: MessageCompression | None = None):
     command = action_name
-    message = _python_pickle.data_to_message(action_input)
+    message = _codec_message.data_to_message(codec, action_input, durability, compression)
     return rabbit_client.send_command(command, message)
 
+def run_many(rabbit_client: RabbitMQClient, actions: Sequence[tuple[str, ActionInput]], codec: MessageCodec = PythonPickleCodec(), durability_of: Callable[[str], MessageDurability] = lambda _: MessageDurability.PERSISTENT, compression: MessageCompression | None = None):
+    commands = [(action_name, _codec_message.data_to_message(codec, action_input, durability_of(action_name), compression)) for action_name, action_input in actions]
+    return rabbit_client.send_commands(commands)
+
 class handler:
-    def __init__(self, rabbit_client: RabbitMQClient, action_name: str):
+    def __init__(self, rabbit_client: RabbitMQClient, action_name: str, prefetch_count: int | None = None, max_concurrency: int | None = None, retry_policy: RetryPolicy = RetryPolicy()):
         self._rabbit_client = rabbit_client
         self._action_name = action_name
+        self._prefetch_count = prefetch_count
+        self._max_concurrency = max_concurrency
+        self._retry_policy = retry_policy
     
     def __call__(self, func: Callable[[Result[ActionInput, Any]], Coroutine]):
-        decoder = _python_pickle.decoder(self._action_name)
+        decoder = _codec_message.decoder(self._action_name)
+        # Failed actions are retried by broker with delay, see RetryPolicy
         middlewares = (
-            error_result_to_negative_acknowledge_middleware(RequeueChance.FIFTY_FIFTY),
-            command_handler_logging_middleware(self._action_name, _python_pickle.create_logger)
+            command_handler_logging_middleware(self._action_name, _codec_message.create_logger),
         )
-        return self._rabbit_client.command_handler(self._action_name, decoder, middlewares)(func)
\ No newline at end of file
+        async def decode_and_handle(encoded_action_input: Any):
+            return await func(decoder(encoded_action_input.msg))
+        decode_and_handle.__name__ = getattr(func, "__name__", decode_and_handle.__name__)
+        return self._rabbit_client.command_handler(self._action_name, _codec_message.lazy_decoder, middlewares, self._prefetch_count, self._max_concurrency, self._retry_policy)(decode_and_handle)
\ No newline at end of file
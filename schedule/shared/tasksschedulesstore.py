@@ -1,7 +1,7 @@
-from infrastructure.persistence.filesystem.filewithversion import FileWithVersion
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import ScheduleIdValue, TaskIdValue
 from shared.domainschedule import TaskSchedule, TaskScheduleAdapter
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 
 type ItemType = dict[TaskIdValue, TaskSchedule]
@@ -18,12 +18,14 @@ def _dto_to_item(dto: DtoItemType) -> ItemType:
 
 class TasksSchedulesStore:
     def __init__(self, root_folder: str):
-        file_repo_with_ver = FileWithVersion[str, ItemType, DtoItemType](
+        storage_settings = StorageSettings.from_env("TASKS_SCHEDULES")
+        file_repo_with_ver = create_repository_with_version(
+            storage_settings,
             "SchedulesStorage",
             _item_to_dto,
             _dto_to_item,
-            JsonSerializer[DtoItemType](),
-            "json",
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
             root_folder
         )
         self._file_repo_with_ver = file_repo_with_ver
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import StrEnum
 from typing import Self
 
@@ -101,10 +101,66 @@ class ActionType(StrEnum):
             case _:
                 return None
 
+    @property
+    def durability(self) -> MessageDurability:
+        # Messages of every action type survive broker restart, lost message leaves its running definition stuck
+        return MessageDurability.PERSISTENT
+
+class MessageDurability(StrEnum):
+    PERSISTENT = "persistent"
+    TRANSIENT = "transient"
+
+    @staticmethod
+    def parse(durability: str) -> MessageDurability | None:
+        if durability is None:
+            return None
+        match strip_and_lowercase(durability):
+            case MessageDurability.PERSISTENT:
+                return MessageDurability.PERSISTENT
+            case MessageDurability.TRANSIENT:
+                return MessageDurability.TRANSIENT
+            case _:
+                return None
+
+_NAME_PREFIX = "frasty_"
+# Durabilities declared by actions, by action names, so they are found by names actions are sent with
+_declared_durabilities: dict[str, MessageDurability] = {}
+
 @dataclass(frozen=True)
 class Action:
     name: ActionName
     type: ActionType
+    # Declared durability of sent messages of the action, durability of its type when not set
+    durability: MessageDurability | None = field(default=None, compare=False, kw_only=True)
+
+    def __post_init__(self):
+        if self.durability is not None:
+            _declared_durabilities[self.get_name()] = self.durability
 
     def get_name(self):
-        return f"frasty_{self.type}_{self.name}"
+        return f"{_NAME_PREFIX}{self.type}_{self.name}"
+
+    @staticmethod
+    def declared_durability(name: str) -> MessageDurability:
+        '''
+        Returns durability declared by action with the name, falling back to durability of its type and then to persistent.
+        '''
+        opt_durability = _declared_durabilities.get(name)
+        if opt_durability is not None:
+            return opt_durability
+        opt_action = Action.parse_name(name)
+        return opt_action.type.durability if opt_action is not None else MessageDurability.PERSISTENT
+
+    @staticmethod
+    def parse_name(name: str) -> Action | None:
+        '''
+        Parses name returned by get_name back to action.
+        '''
+        if name is None or not name.startswith(_NAME_PREFIX):
+            return None
+        raw_type, _, raw_name = name.removeprefix(_NAME_PREFIX).partition("_")
+        opt_type = ActionType.parse(raw_type)
+        opt_name = ActionName.parse(raw_name)
+        if opt_type is None or opt_name is None:
+            return None
+        return Action(opt_name, opt_type)
@@ -1,4 +1,4 @@
-from collections.abc import Generator
+from collections.abc import Generator, Sequence
 from dataclasses import dataclass
 from typing import Any
 
@@ -9,7 +9,7 @@ from expression.extra.result.traversable import traverse
 from shared.action import Action, ActionName, ActionType
 from shared.customtypes import DefinitionIdValue
 from shared.definition import Definition, DefinitionAdapter
-from shared.pipeline.actionhandler import ActionData, RunAsyncAction, run_action_adapter
+from shared.pipeline.actionhandler import ActionData, RunAsyncAction, RunAsyncActions, run_action_adapter, run_actions_adapter
 from shared.utils.parse import parse_from_dict, parse_value
 from shared.utils.result import apply
 
@@ -46,3 +46,7 @@ class ExecuteDefinitionInput:
 def run_execute_definition_action(run_action: RunAsyncAction, data: ActionData[None, ExecuteDefinitionInput]):
     execute_definition_dto = ActionData(data.run_id, data.step_id, data.config, data.input.to_dict(), data.metadata)
     return run_action_adapter(run_action)(EXECUTE_DEFINITION_ACTION, execute_definition_dto)
+
+def run_execute_definition_actions(run_actions: RunAsyncActions, datas: Sequence[ActionData[None, ExecuteDefinitionInput]]):
+    execute_definition_dtos = [(EXECUTE_DEFINITION_ACTION, ActionData(data.run_id, data.step_id, data.config, data.input.to_dict(), data.metadata)) for data in datas]
+    return run_actions_adapter(run_actions)(execute_definition_dtos)
@@ -0,0 +1,53 @@
+from enum import StrEnum
+from typing import Any, Optional
+
+from shared.infrastructure.serialization.serializer import Serializer
+from shared.utils.string import strip_and_lowercase
+
+class SerializationFormat(StrEnum):
+    '''
+    JSON is serialized with stdlib json module, ORJSON produces the same JSON with orjson package,
+    MSGPACK is binary MessagePack format of msgpack package.
+    '''
+    JSON = "json"
+    ORJSON = "orjson"
+    MSGPACK = "msgpack"
+
+    @staticmethod
+    def parse(value: str) -> Optional["SerializationFormat"]:
+        if value is None:
+            return None
+        match strip_and_lowercase(value):
+            case SerializationFormat.JSON:
+                return SerializationFormat.JSON
+            case SerializationFormat.ORJSON:
+                return SerializationFormat.ORJSON
+            case SerializationFormat.MSGPACK:
+                return SerializationFormat.MSGPACK
+            case _:
+                return None
+    
+    @property
+    def extension(self) -> str:
+        match self:
+            case SerializationFormat.JSON | SerializationFormat.ORJSON:
+                return "json"
+            case SerializationFormat.MSGPACK:
+                return "msgpack"
+    
+    @property
+    def is_text(self) -> bool:
+        return self != SerializationFormat.MSGPACK
+
+def create_serializer(format: SerializationFormat) -> Serializer[Any]:
+    # orjson and msgpack are optional packages, so they are imported only when used
+    match format:
+        case SerializationFormat.JSON:
+            from shared.infrastructure.serialization.json import JsonSerializer
+            return JsonSerializer()
+        case SerializationFormat.ORJSON:
+            from shared.infrastructure.serialization.orjson import OrjsonSerializer
+            return OrjsonSerializer()
+        case SerializationFormat.MSGPACK:
+            from shared.infrastructure.serialization.msgpack import MsgPackSerializer
+            return MsgPackSerializer()
\ No newline at end of file
@@ -6,5 +6,5 @@ class JsonSerializer[T](Serializer[T]):
     def serialize(self, obj: T) -> str:
         return json.dumps(obj)
     
-    def deserialize(self, data: str) -> T:
+    def deserialize(self, data: str | bytes) -> T:
         return json.loads(data)
\ No newline at end of file
@@ -0,0 +1,12 @@
+import msgpack
+
+from shared.infrastructure.serialization.serializer import Serializer
+
+class MsgPackSerializer[T](Serializer[T]):
+    def serialize(self, obj: T) -> bytes:
+        return msgpack.packb(obj)
+    
+    def deserialize(self, data: str | bytes) -> T:
+        if isinstance(data, str):
+            raise ValueError("MessagePack data must be bytes")
+        return msgpack.unpackb(data)
\ No newline at end of file
@@ -0,0 +1,10 @@
+import orjson
+
+from shared.infrastructure.serialization.serializer import Serializer
+
+class OrjsonSerializer[T](Serializer[T]):
+    def serialize(self, obj: T) -> bytes:
+        return orjson.dumps(obj)
+    
+    def deserialize(self, data: str | bytes) -> T:
+        return orjson.loads(data)
\ No newline at end of file
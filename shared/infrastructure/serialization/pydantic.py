@@ -10,5 +10,5 @@ class PydanticJsonSerializer[T: BaseModel](Serializer[T]):
     def serialize(self, obj: T) -> str:
         return obj.model_dump_json(exclude_none=True)
     
-    def deserialize(self, data: str) -> T:
+    def deserialize(self, data: str | bytes) -> T:
         return self._type.model_validate_json(data)
\ No newline at end of file
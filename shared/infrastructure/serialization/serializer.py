@@ -2,9 +2,9 @@ from abc import ABC, abstractmethod
 
 class Serializer[T](ABC):
     @abstractmethod
-    def serialize(self, obj: T) -> str:
+    def serialize(self, obj: T) -> str | bytes:
         pass
 
     @abstractmethod
-    def deserialize(self, data: str) -> T:
+    def deserialize(self, data: str | bytes) -> T:
         pass
\ No newline at end of file
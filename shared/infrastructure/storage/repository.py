@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+import asyncio
+from collections.abc import Coroutine, Iterable, Sequence
+from typing import Any
 
 from ...customtypes import Error
 
@@ -53,6 +56,15 @@ class RepositoryWithVersion[TId, TItem](ABC):
     def delete(self, id: TId) -> None:
         pass
 
+DEFAULT_MAX_CONCURRENCY = 16
+
+async def _gather_bounded[R](coroutines: Iterable[Coroutine[Any, Any, R]], max_concurrency: int) -> list[R]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async def run(coroutine: Coroutine[Any, Any, R]) -> R:
+        async with semaphore:
+            return await coroutine
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
+
 class AsyncRepositoryWithVersion[TId, TItem](ABC):
     @abstractmethod
     async def get(self, id: TId) -> tuple[int, TItem] | None:
@@ -70,6 +82,10 @@ class AsyncRepositoryWithVersion[TId, TItem](ABC):
     async def delete(self, id: TId) -> None:
         pass
 
+    async def get_many(self, ids: Sequence[TId], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> list[tuple[int, TItem] | None]:
+        '''Returns items in order of ids, single item gets run concurrently unless backend batches them natively'''
+        return await _gather_bounded((self.get(id) for id in ids), max_concurrency)
+
 class StorageError(Error):
     '''Unexpected storage error'''
 
@@ -83,4 +99,10 @@ class AlreadyExistsError(Error):
     '''Item already exists error'''
 
 class AlreadyExistsException(ValueError):
-    '''Item already exists exception'''
\ No newline at end of file
+    '''Item already exists exception'''
+
+class ContentionError(Error):
+    '''Item was changed concurrently too many times error'''
+
+class ContentionException(ValueError):
+    '''Item was changed concurrently too many times exception'''
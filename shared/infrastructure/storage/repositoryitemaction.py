@@ -1,36 +1,161 @@
+import asyncio
 from collections.abc import Callable, Coroutine
 from functools import wraps
+import random
 import threading
 from typing import Any, Concatenate, Generic, ParamSpec, TypeVar
 
-from shared.infrastructure.storage.repository import AsyncRepositoryWithVersion, Repository
+from shared.infrastructure.storage.repository import AlreadyExistsException, AsyncRepositoryWithVersion, ContentionException, Repository
 
 T = TypeVar("T")
 P = ParamSpec("P")
 R = TypeVar("R")
 TId = TypeVar("TId")
 
+def _set_result(future: asyncio.Future, res: Any):
+    # Future of cancelled waiter is already done
+    if not future.done():
+        future.set_result(res)
+
+def _set_exception(future: asyncio.Future, ex: BaseException):
+    if not future.done():
+        future.set_exception(ex)
+
 class ItemActionInAsyncRepositoryWithVersion(Generic[TId, T]):
-    def __init__(self, repository: AsyncRepositoryWithVersion[TId, T]):
+    '''
+    Applies func to the item and stores it, when the item was changed meanwhile by others it is reloaded
+    and func is applied again after jittered exponential backoff.
+    Raises ContentionException when the item could not be stored in max_attempts attempts.
+
+    When coalesce is True actions for the same id are queued in process and applied by a drain task in rounds,
+    each round applies all actions queued before it to one loaded item before a single update, so every caller waits
+    only for the round of its action and cancelled caller drops only its own action.
+    Func which raises in coalesced round must leave the item unchanged, its exception is raised to its caller
+    and the other funcs of the round are applied to the same item without being run again.
+    '''
+    def __init__(self, repository: AsyncRepositoryWithVersion[TId, T], max_attempts: int = 20, base_delay: float = 0.002, max_delay: float = 0.2, coalesce: bool = False):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be greater than 0")
         self._repository = repository
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._coalesce = coalesce
+        self._queues: dict[TId, list[tuple[Callable[[Any], tuple[Any, Any]], asyncio.Future]]] = {}
+        # Strong references to drain tasks, so they are not garbage collected while running
+        self._drain_tasks: set[asyncio.Task] = set()
+        self._conflicts = 0
+    
+    @property
+    def conflicts(self) -> int:
+        '''Number of version conflicts since creation'''
+        return self._conflicts
+    
+    def _backoff(self, attempt: int):
+        # Full jitter spreads retries of concurrent writers of the same item
+        delay = min(self._max_delay, self._base_delay * 2 ** attempt)
+        return asyncio.sleep(random.uniform(0, delay))
+    
+    async def _apply_queued(self, id: TId, queued: list[tuple[Callable[[Any], tuple[Any, Any]], asyncio.Future]]):
+        pending = queued
+        attempt = 0
+        while pending:
+            if attempt == self._max_attempts:
+                for _, future in pending:
+                    _set_exception(future, ContentionException(id, self._max_attempts))
+                return
+            if attempt > 0:
+                await self._backoff(attempt - 1)
+            item_with_ver = await self._repository.get(id)
+            ver, item = item_with_ver if item_with_ver is not None else (None, None)
+            applied = []
+            results = []
+            for apply, future in pending:
+                # Action of cancelled caller is dropped
+                if future.done():
+                    continue
+                try:
+                    res, item = apply(item)
+                except Exception as e:
+                    _set_exception(future, e)
+                    continue
+                applied.append((apply, future))
+                results.append(res)
+            # Failed funcs are not applied again after conflict
+            pending = applied
+            if not pending:
+                return
+            if ver is None:
+                try:
+                    await self._repository.add(id, item)
+                    stored = True
+                except AlreadyExistsException:
+                    stored = False
+            else:
+                stored = await self._repository.update(id, ver, item)
+            if stored:
+                for (_, future), res in zip(pending, results):
+                    _set_result(future, res)
+                return
+            self._conflicts += 1
+            attempt += 1
+    
+    async def _drain(self, id: TId, queue: list[tuple[Callable[[Any], tuple[Any, Any]], asyncio.Future]]):
+        queued = []
+        try:
+            while queue:
+                # Actions queued during the round are applied in the next one
+                queued = queue.copy()
+                queue.clear()
+                try:
+                    await self._apply_queued(id, queued)
+                except Exception as e:
+                    for _, queued_future in queued:
+                        _set_exception(queued_future, e)
+        except BaseException:
+            for _, queued_future in queued + queue:
+                if not queued_future.done():
+                    queued_future.cancel()
+            raise
+        finally:
+            del self._queues[id]
+    
+    async def _call_coalesced(self, id: TId, apply: Callable[[Any], tuple[Any, Any]]):
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(id)
+        if queue is not None:
+            queue.append((apply, future))
+            return await future
+        queue = [(apply, future)]
+        self._queues[id] = queue
+        # Drain task is not cancelled with the caller, so actions of other callers are still applied
+        drain_task = asyncio.create_task(self._drain(id, queue))
+        self._drain_tasks.add(drain_task)
+        drain_task.add_done_callback(self._drain_tasks.discard)
+        return await future
     
     def __call__(self, func: Callable[Concatenate[T | None, P], tuple[R, T]]) -> Callable[Concatenate[TId, P], Coroutine[Any, Any, R]]:
         @wraps(func)
         async def wrapper(id: TId, *args: P.args, **kwargs: P.kwargs) -> R:
-            item_with_ver = await self._repository.get(id)
-            exists = item_with_ver is not None
-            if exists:
-                ver, item = item_with_ver
-                res, updated_item = func(item, *args, **kwargs)
-                updated = await self._repository.update(id, ver, updated_item)
-                if updated:
-                    return res
+            if self._coalesce:
+                return await self._call_coalesced(id, lambda item: func(item, *args, **kwargs))
+            for attempt in range(self._max_attempts):
+                if attempt > 0:
+                    await self._backoff(attempt - 1)
+                item_with_ver = await self._repository.get(id)
+                exists = item_with_ver is not None
+                if exists:
+                    ver, item = item_with_ver
+                    res, updated_item = func(item, *args, **kwargs)
+                    updated = await self._repository.update(id, ver, updated_item)
+                    if updated:
+                        return res
+                    self._conflicts += 1
                 else:
-                    return await wrapper(id, *args, **kwargs)
-            else:
-                res, new_item = func(None, *args, **kwargs)
-                await self._repository.add(id, new_item)
-                return res
+                    res, new_item = func(None, *args, **kwargs)
+                    await self._repository.add(id, new_item)
+                    return res
+            raise ContentionException(id, self._max_attempts)
         return wrapper
 
 class ItemActionInRepository(Generic[TId, T]):
@@ -1,4 +1,4 @@
-from collections.abc import Callable, Coroutine
+from collections.abc import Callable, Coroutine, Sequence
 from dataclasses import dataclass
 from typing import Any
 
@@ -32,6 +32,7 @@ class ActionData[TCfg, D]:
     metadata: Metadata
 
 type RunAsyncAction = Callable[[str, ActionInput], Coroutine[Any, Any, Result[None, Any]]]
+type RunAsyncActions = Callable[[Sequence[tuple[str, ActionInput]]], Coroutine[Any, Any, list[Result[None, Any]]]]
 type AsyncActionHandler = Callable[[str, Callable[[Result[ActionInput, Any]], Coroutine]], Any]
 
 @dataclass(frozen=True)
@@ -192,15 +193,21 @@ class ActionHandlerFactory:
             return self._action_handler(action.get_name(), action_input_handler)
         return wrapper
 
+def _to_action_input[TCfg: dict[str, Any] | None, D: DataDto | list[DataDto]](action_data: ActionData[TCfg, D]) -> ActionInput:
+    run_id_str = action_data.run_id.to_value_with_checksum()
+    step_id_str = action_data.step_id.to_value_with_checksum()
+    data_dict = DataDtoAdapter.to_input_data(action_data.input) | (action_data.config or {})
+    metadata_dict = action_data.metadata.to_dict()
+    return ActionInput(run_id_str, step_id_str, data_dict, metadata_dict)
+
 def run_action_adapter(run_action: RunAsyncAction):
     def wrapper[TCfg: dict[str, Any] | None, D: DataDto | list[DataDto]](action: Action, action_data: ActionData[TCfg, D]):
-        def to_action_input() -> ActionInput:
-            run_id_str = action_data.run_id.to_value_with_checksum()
-            step_id_str = action_data.step_id.to_value_with_checksum()
-            data_dict = DataDtoAdapter.to_input_data(action_data.input) | (action_data.config or {})
-            metadata_dict = action_data.metadata.to_dict()
-            return ActionInput(run_id_str, step_id_str, data_dict, metadata_dict)
         action_name = action.get_name()
-        action_input = to_action_input()
+        action_input = _to_action_input(action_data)
         return run_action(action_name, action_input)
     return wrapper
+
+def run_actions_adapter(run_actions: RunAsyncActions):
+    def wrapper[TCfg: dict[str, Any] | None, D: DataDto | list[DataDto]](actions: Sequence[tuple[Action, ActionData[TCfg, D]]]):
+        return run_actions([(action.get_name(), _to_action_input(action_data)) for action, action_data in actions])
+    return wrapper
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+import threading
+from typing import NamedTuple
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+class LruCache[TKey, TValue]:
+    """
+    A bounded, thread-safe least recently used cache.
+
+    Once the cache holds maxsize entries, adding a new key evicts the least recently used one.
+    Hits and misses of get are counted and reported by info, the same way functools.lru_cache does.
+
+    Args:
+        maxsize (int): Maximum number of stored entries. Must be positive.
+    """
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self._maxsize = maxsize
+        self._items: OrderedDict[TKey, TValue] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Cached entries are not copied to another process, they would be stale there anyway
+        return self._maxsize
+
+    def __setstate__(self, maxsize: int):
+        self.__init__(maxsize)
+
+    def get(self, key: TKey) -> TValue | None:
+        with self._lock:
+            if key not in self._items:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key: TKey, value: TValue) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: TKey) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._items))
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from collections.abc import Callable
 from decimal import Decimal, InvalidOperation
+import os
 from typing import Any
 
 from expression import Result
@@ -321,6 +322,20 @@ class PositiveInt(int):
             case _:
                 return None
 
+def parse_int_from_env(env_name: str, default: int, min_value: int = 0) -> int:
+    """
+    Reads int value of env_name env variable, default when it is not set.
+    Raises ValueError when it is set to anything else than int greater than or equal to min_value,
+    so misconfigured setting is not silently replaced by default.
+    """
+    raw_value = os.environ.get(env_name)
+    if raw_value is None:
+        return default
+    opt_value = parse_int(raw_value)
+    if opt_value is None or opt_value < min_value:
+        raise ValueError(f"Invalid {env_name} {raw_value}, int greater than or equal to {min_value} is expected")
+    return opt_value
+
 def parse_value[T, R](value: T, value_name: str, parser: Callable[[T], R | None]) -> Result[R, str]:
     opt_parsed_value = parser(value)
     match opt_parsed_value:
@@ -1,10 +1,10 @@
 from collections.abc import Callable
 import os
-from typing import Any, Concatenate, ParamSpec, TypeVar
+from typing import Concatenate, ParamSpec, TypeVar
 
-from infrastructure.persistence.filesystem.filewithversion import FileWithVersion
+from infrastructure.persistence.storagebackend import StorageSettings, create_repository_with_version
 from shared.customtypes import TaskIdValue
-from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.serialization.format import create_serializer
 from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
 from shared.task import Task, TaskAdapter
 
@@ -16,12 +16,14 @@ R = TypeVar("R")
 class TasksStore:
     def __init__(self, items_sub_folder_name: str):
         folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "TasksStorage")
-        file_repo_with_ver = FileWithVersion[TaskIdValue, Task, dict[str, Any]](
+        storage_settings = StorageSettings.from_env("TASKS")
+        file_repo_with_ver = create_repository_with_version(
+            storage_settings,
             items_sub_folder_name,
             TaskAdapter.to_dict,
             TaskAdapter.from_dict,
-            JsonSerializer[dict[str, Any]](),
-            "json",
+            create_serializer(storage_settings.format),
+            storage_settings.format.extension,
             folder_path
         )
         self._file_repo_with_ver = file_repo_with_ver
@@ -0,0 +1,82 @@
+'''
+Compares completion of a large group of running definitions in the single group item and in shards of the group.
+
+All member definitions of the group are completed concurrently, as completions arrive from many runners,
+and version conflicts of the stores are counted. Stores are created in temporary folder.
+With --out_of_line_results results of members are stored out of the group and its shards.
+
+Usage (from repository root):
+    PYTHONPATH=.:definition:definition/runner python tests/benchmark/groupcompletion.py --members 5000 --shards 0 16 64 --result_size 1000
+'''
+import asyncio
+import tempfile
+import time
+
+from shared.action import ActionName, ActionType
+from shared.completedresult import CompletedWith
+from shared.customtypes import DefinitionIdValue, RunIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.definitioncustomtypes import GroupIdValue
+from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState
+from shared.groupresultsstore import GroupResultsStore
+from shared.runningdefinitionsstore import GroupOfRunningDefinitionsShardStore, GroupOfRunningDefinitionsStore
+from outoflinegroupresults import OutOfLineGroupResults
+from shardedgroupcompletion import ShardedGroupCompletion
+
+async def measure(root_folder: str, num_of_members: int, num_of_shards: int, coalesce_writes: bool, result_size: int, out_of_line_results: bool):
+    group_store = GroupOfRunningDefinitionsStore(root_folder, coalesce_writes=coalesce_writes)
+    shard_store = GroupOfRunningDefinitionsShardStore(root_folder, coalesce_writes=coalesce_writes)
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    step = ActionDefinition(ActionName("requesturl"), ActionType.CUSTOM, None)
+    definitions = tuple(DefinitionIdWithValue(DefinitionIdValue.new_id(), Definition([{"url": f"http://localhost/{i}"}], (step,))) for i in range(num_of_members))
+    @group_store.with_storage
+    def set_definitions_and_run(state: GroupOfRunningDefinitionsState | None):
+        new_state = GroupOfRunningDefinitionsState()
+        new_state.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(definitions))
+        evt = new_state.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
+        return (evt, new_state)
+    @group_store.with_storage
+    def complete_in_group(state: GroupOfRunningDefinitionsState | None, evt: GroupOfRunningDefinitionsState.Commands.CompleteDefinition):
+        assert state is not None
+        return (state.apply_command(evt), state)
+    running_evt = await set_definitions_and_run(run_id, group_id)
+    assert type(running_evt) is GroupOfRunningDefinitionsState.Events.DefinitionsRunning
+    result = CompletedWith.Data({"status_code": 200, "content": "x" * result_size})
+    sharded_completion = ShardedGroupCompletion(group_store.get, group_store.with_storage, shard_store.with_storage, num_of_shards) if num_of_shards > 0 else None
+    if out_of_line_results:
+        complete_definition = OutOfLineGroupResults(GroupResultsStore(root_folder), group_store.get, group_store.with_storage, sharded_completion)
+        completions = (complete_definition(run_id, group_id, rd.step_id, rd.definition_id, result) for rd in running_evt.definitions)
+    elif sharded_completion is not None:
+        complete_definition = sharded_completion
+        completions = (complete_definition(run_id, group_id, rd.step_id, rd.definition_id, result) for rd in running_evt.definitions)
+    else:
+        completions = (complete_in_group(run_id, group_id, GroupOfRunningDefinitionsState.Commands.CompleteDefinition(rd.step_id, rd.definition_id, result)) for rd in running_evt.definitions)
+    start_time = time.perf_counter()
+    evts = await asyncio.gather(*completions, return_exceptions=True)
+    complete_time = time.perf_counter() - start_time
+    num_of_failed = sum(1 for evt in evts if isinstance(evt, Exception))
+    is_completed = any(type(evt) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted for evt in evts)
+    return complete_time, group_store.conflicts(), shard_store.conflicts(), num_of_failed, is_completed
+
+async def main(num_of_members: int, shards: list[int], coalesce_writes: bool, result_size: int, out_of_line_results: bool):
+    print("------------------------------------------")
+    print(f"Group of {num_of_members} members, coalesce writes {coalesce_writes}, results of {result_size} bytes, out of line results {out_of_line_results}")
+    print("------------------------------------------")
+    with tempfile.TemporaryDirectory() as root_folder:
+        for num_of_shards in shards:
+            complete_time, group_conflicts, shard_conflicts, num_of_failed, is_completed = await measure(root_folder, num_of_members, num_of_shards, coalesce_writes, result_size, out_of_line_results)
+            print(f"{num_of_shards:>4} shards  {complete_time:8.2f} s  group conflicts {group_conflicts:6}  shard conflicts {shard_conflicts:6}  failed {num_of_failed:5}  completed {is_completed}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare completion of large group in group item and in shards")
+    parser.add_argument("--members", type=int, default=5000, help="Number of member definitions in group")
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 16, 64], help="Numbers of shards, 0 completes definitions in group item")
+    parser.add_argument("--coalesce_writes", action="store_true", help="Write concurrent changes of the same item in one process together")
+    parser.add_argument("--result_size", type=int, default=0, help="Number of bytes of content in result of each member")
+    parser.add_argument("--out_of_line_results", action="store_true", help="Store results of members out of the group")
+
+    args = parser.parse_args()
+    asyncio.run(main(args.members, args.shards, args.coalesce_writes, args.result_size, args.out_of_line_results))
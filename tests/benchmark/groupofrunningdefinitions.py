@@ -0,0 +1,60 @@
+'''
+Measures GroupOfRunningDefinitionsState with growing number of member definitions.
+
+Completion applies CompleteDefinition command for every member as complete action handler does,
+replay applies events of the completed group to a new state and load restores it from event dtos as store does.
+
+Usage (from repository root):
+    PYTHONPATH=.:definition python tests/benchmark/groupofrunningdefinitions.py --members 10 1000 10000
+'''
+import functools
+import time
+
+from shared.action import ActionName, ActionType
+from shared.completedresult import CompletedWith
+from shared.customtypes import DefinitionIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState, GroupOfRunningDefinitionsStateAdapter
+
+def create_running_group_state(num_of_members: int):
+    steps = (ActionDefinition(ActionName("requesturl"), ActionType.CUSTOM, None),)
+    definitions = tuple(DefinitionIdWithValue(DefinitionIdValue.new_id(), Definition([{"url": f"http://localhost/{i}"}], steps)) for i in range(num_of_members))
+    state = GroupOfRunningDefinitionsState()
+    state.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(definitions))
+    state.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
+    return state
+
+def measure(num_of_members: int):
+    state = create_running_group_state(num_of_members)
+    running_definitions = list(state._running_definitions.items())
+    result = CompletedWith.Data({"status_code": 200})
+    start_time = time.perf_counter()
+    for definition_id, step_id in running_definitions:
+        state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(step_id, definition_id, result))
+    complete_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    functools.reduce(GroupOfRunningDefinitionsState.apply, state.get_events(), GroupOfRunningDefinitionsState())
+    replay_time = time.perf_counter() - start_time
+    data = GroupOfRunningDefinitionsStateAdapter.to_list(state)
+    start_time = time.perf_counter()
+    GroupOfRunningDefinitionsStateAdapter.from_list(data)
+    load_time = time.perf_counter() - start_time
+    return complete_time, replay_time, load_time
+
+def main(members: list[int]):
+    print("------------------------------------------")
+    print("GroupOfRunningDefinitionsState")
+    print("------------------------------------------")
+    for num_of_members in members:
+        complete_time, replay_time, load_time = measure(num_of_members)
+        complete_us = complete_time / num_of_members * 1_000_000
+        print(f"{num_of_members:>6} members  complete {complete_us:8.1f} us/member  replay {replay_time * 1000:8.1f} ms  load {load_time * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure group of running definitions state with many members")
+    parser.add_argument("--members", type=int, nargs="+", default=[10, 1000, 10000], help="Numbers of member definitions in group")
+
+    args = parser.parse_args()
+    main(args.members)
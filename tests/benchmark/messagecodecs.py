@@ -0,0 +1,57 @@
+'''
+Compares throughput of encoding ActionInput to rabbit message and decoding it back for every message codec.
+
+Codecs whose optional packages are not installed are skipped. With compression threshold set, messages of
+at least that number of bytes are compressed.
+
+Usage (from repository root):
+    PYTHONPATH=. python tests/benchmark/messagecodecs.py --data_size 1000 --iterations 20000 --compression_threshold 4096
+'''
+import time
+
+from faststream.rabbit import RabbitMessage
+
+from infrastructure.rabbitmq.messagecodec import MessageCodecName, MessageCompression, create_codec
+from infrastructure.rabbitmq.rabbitrunaction import _codec_message
+from shared.customtypes import RunIdValue, StepIdValue, TaskIdValue
+from shared.pipeline.actionhandler import ActionInput
+
+def create_action_input(data_size: int):
+    data = {"url": "http://localhost", "http_method": "GET", "content": "x" * data_size}
+    metadata = {"task_id": TaskIdValue.new_id(), "definition_id": "definition_id", "parent_step_id": StepIdValue.new_id()}
+    return ActionInput(RunIdValue.new_id(), StepIdValue.new_id(), data, metadata)
+
+def main(data_size: int, iterations: int, compression_threshold: int | None):
+    action_input = create_action_input(data_size)
+    decoder = _codec_message.decoder("benchmark")
+    compression = MessageCompression(compression_threshold) if compression_threshold is not None else None
+    print("------------------------------------------")
+    print(f"ActionInput with {data_size} chars of data, {iterations} iterations, compression threshold {compression_threshold}")
+    print("------------------------------------------")
+    for codec_name in MessageCodecName:
+        try:
+            codec = create_codec(codec_name)
+        except ImportError as e:
+            print(f"{codec_name:<8} skipped: {e}")
+            continue
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            message = _codec_message.data_to_message(codec, action_input, compression=compression)
+        encode_time = time.perf_counter() - start_time
+        rabbit_message = RabbitMessage(raw_message=None, body=message.body, headers=message.headers, content_type=message.content_type, correlation_id=message.correlation_id)
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            decoder(rabbit_message)
+        decode_time = time.perf_counter() - start_time
+        print(f"{codec_name:<8} encode {iterations / encode_time:10.0f} msg/s  decode {iterations / decode_time:10.0f} msg/s  size {len(message.body):8} bytes")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare rabbit message codecs")
+    parser.add_argument("--data_size", type=int, default=1000, help="Number of chars in action data")
+    parser.add_argument("--iterations", type=int, default=20000, help="Number of encode and decode iterations per codec")
+    parser.add_argument("--compression_threshold", type=int, default=None, help="Number of bytes from which messages are compressed")
+
+    args = parser.parse_args()
+    main(args.data_size, args.iterations, args.compression_threshold)
@@ -0,0 +1,88 @@
+'''
+Compares storage serialization formats on RunningDefinitionState and TaskPendingResultsQueue payloads.
+
+Every iteration serializes dto of the state and deserializes it back to the state, as stores do on save and load.
+Formats whose optional packages are not installed are skipped.
+
+Usage (from repository root):
+    PYTHONPATH=.:definition:history python tests/benchmark/serializers.py --steps 50 --queue_items 10 --iterations 2000
+'''
+from collections.abc import Callable
+import time
+from typing import Any
+
+from shared.action import ActionName, ActionType
+from shared.completedresult import CompletedWith
+from shared.customtypes import RunIdValue, TaskIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.infrastructure.serialization.format import SerializationFormat, create_serializer
+from shared.runningdefinition import RunningDefinitionState, RunningDefinitionStateAdapter
+from shared.taskpendingresultsqueue import CompletedTaskData, TaskPendingResultsQueue, TaskPendingResultsQueueAdapter
+from shared.taskresulthistory import DefinitionVersion
+
+def create_running_definition_state(num_of_steps: int):
+    steps = tuple(ActionDefinition(ActionName(f"step{i}"), ActionType.CUSTOM, {"index": str(i)}) for i in range(num_of_steps))
+    definition = Definition({"url": "http://localhost", "http_method": "GET"}, steps)
+    state = RunningDefinitionState()
+    state.apply_command(RunningDefinitionState.Commands.SetDefinition(definition))
+    state.apply_command(RunningDefinitionState.Commands.RunFirstStep())
+    for i in range(num_of_steps - 1):
+        running_step_id = state.running_step_id()
+        if running_step_id is None:
+            break
+        result = CompletedWith.Data({"status_code": 200, "content": f"<html><body>Step {i} response</body></html>"})
+        state.apply_command(RunningDefinitionState.Commands.CompleteRunningStep(running_step_id, result))
+        state.apply_command(RunningDefinitionState.Commands.RunNextStep())
+    return state
+
+def create_task_pending_results_queue(num_of_items: int):
+    task_id = TaskIdValue.new_id()
+    queue = TaskPendingResultsQueue([RunIdValue.new_id() for _ in range(10)])
+    for i in range(num_of_items):
+        result = CompletedWith.Data({"status_code": 200, "content": f"<html><body>Run {i} response</body></html>"})
+        queue.enqueue(CompletedTaskData(task_id, RunIdValue.new_id(), result, DefinitionVersion.parse(1)))
+    return queue
+
+def measure[T](state: T, to_dto: Callable[[T], Any], from_dto: Callable[[Any], Any], format: SerializationFormat, iterations: int):
+    serializer = create_serializer(format)
+    data = serializer.serialize(to_dto(state))
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        data = serializer.serialize(to_dto(state))
+    save_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        from_dto(serializer.deserialize(data))
+    load_time = time.perf_counter() - start_time
+    size = len(data.encode() if isinstance(data, str) else data)
+    return save_time, load_time, size
+
+def main(num_of_steps: int, num_of_queue_items: int, iterations: int):
+    payloads = (
+        (f"RunningDefinitionState ({num_of_steps} steps)", create_running_definition_state(num_of_steps), RunningDefinitionStateAdapter.to_list, RunningDefinitionStateAdapter.from_list),
+        (f"TaskPendingResultsQueue ({num_of_queue_items} items)", create_task_pending_results_queue(num_of_queue_items), TaskPendingResultsQueueAdapter.to_dict, TaskPendingResultsQueueAdapter.from_dict)
+    )
+    for name, state, to_dto, from_dto in payloads:
+        print("------------------------------------------")
+        print(f"{name}, {iterations} iterations")
+        print("------------------------------------------")
+        for format in SerializationFormat:
+            try:
+                save_time, load_time, size = measure(state, to_dto, from_dto, format, iterations)
+            except ImportError as e:
+                print(f"{format:<8} skipped: {e}")
+                continue
+            save_us = save_time / iterations * 1_000_000
+            load_us = load_time / iterations * 1_000_000
+            print(f"{format:<8} save {save_us:10.1f} us  load {load_us:10.1f} us  size {size:8} bytes")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare storage serialization formats")
+    parser.add_argument("--steps", type=int, default=50, help="Number of steps of running definition")
+    parser.add_argument("--queue_items", type=int, default=10, help="Number of items in pending results queue")
+    parser.add_argument("--iterations", type=int, default=2000, help="Number of save and load iterations per format")
+
+    args = parser.parse_args()
+    main(args.steps, args.queue_items, args.iterations)
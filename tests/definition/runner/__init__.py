@@ -3,5 +3,8 @@ from shared.runningdefinitionsstore import GroupOfRunningDefinitionsStore, Runni
 import config
 
 sys.path.append('definition/runner')
+from outoflinegroupresults import InlineGroupResults
 config.running_definitions_storage = RunningDefinitionsStore(config.STORAGE_ROOT_FOLDER)
 config.group_of_running_definitions_storage = GroupOfRunningDefinitionsStore(config.STORAGE_ROOT_FOLDER)
+config.complete_group_definition = None
+config.group_results = InlineGroupResults()
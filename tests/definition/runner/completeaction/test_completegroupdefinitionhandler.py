@@ -15,6 +15,7 @@ from shared.customtypes import DefinitionIdValue, Error, RunIdValue, StepIdValue
 from shared.definition import ActionDefinition, Definition
 from shared.definitioncustomtypes import GroupIdValue
 from shared.groupofrunningdefinitions import GroupOfRunningDefinitionsState, DefinitionIdWithValue
+from shared.infrastructure.storage.repository import ContentionError, ContentionException
 
 from config import group_of_running_definitions_storage
 
@@ -84,11 +85,11 @@ async def test_handle_returns_all_definitions_completed_event_when_last_def_comp
         s.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
         
         # Complete first definition
-        first_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_1)
+        first_step_id = s._running_definitions[def_id_1]
         s.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, def_id_1, CompletedWith.Data("step1_res")))
         
         # Target second definition
-        second_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_2)
+        second_step_id = s._running_definitions[def_id_2]
         cmd_dict["step_id"] = second_step_id
         cmd_dict["definition_id"] = def_id_2
         cmd_dict["result"] = CompletedWith.Data("final_res")
@@ -121,7 +122,7 @@ async def test_handle_returns_definition_completed_event_when_not_terminal(creat
         s.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(defs))
         s.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
         
-        first_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_1)
+        first_step_id = s._running_definitions[def_id_1]
         cmd_dict["step_id"] = first_step_id
         cmd_dict["definition_id"] = def_id_1
         cmd_dict["result"] = CompletedWith.Data("step1_res")
@@ -156,10 +157,10 @@ async def test_handle_passes_correct_data_to_all_definitions_completed_event_han
         s.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(defs))
         s.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
         
-        first_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_1)
+        first_step_id = s._running_definitions[def_id_1]
         s.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, def_id_1, CompletedWith.Data("step1_res")))
         
-        second_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_2)
+        second_step_id = s._running_definitions[def_id_2]
         cmd_dict["step_id"] = second_step_id
         cmd_dict["definition_id"] = def_id_2
         cmd_dict["result"] = CompletedWith.Data("final_res")
@@ -191,7 +192,7 @@ async def test_handle_does_not_invoke_event_handler_when_not_all_completed(creat
         s.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(defs))
         s.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
         
-        first_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_1)
+        first_step_id = s._running_definitions[def_id_1]
         cmd_dict["step_id"] = first_step_id
         cmd_dict["definition_id"] = def_id_1
         cmd_dict["result"] = CompletedWith.Data("step1_res")
@@ -253,6 +254,23 @@ async def test_handle_returns_error_when_storage_exception(create_complete_group
     from runner.completeaction.completegroupdefinitionhandler import CompleteGroupDefinitionStorageError
     assert type(handle_res.error) is CompleteGroupDefinitionStorageError
 
+async def test_handle_returns_contention_error_when_state_changed_concurrently_too_many_times(create_complete_group_cmd):
+    def setup_running(state: GroupOfRunningDefinitionsState | None, cmd_dict: dict):
+        s = GroupOfRunningDefinitionsState()
+        return (None, s)
+        
+    _, cmd = await create_complete_group_cmd(setup_running)
+    
+    def convert_to_storage_action_contention(func: Callable[Concatenate[GroupOfRunningDefinitionsState | None, ...], tuple]):
+        async def wrapper(run_id: RunIdValue, group_id: GroupIdValue, *args, **kwargs):
+            raise ContentionException(group_id, 20)
+        return wrapper
+        
+    handle_res = await handle_complete_group_definition(convert_to_storage_action_contention, all_defs_completed_event_handler, cmd)
+    
+    assert handle_res.is_error()
+    assert type(handle_res.error) is ContentionError
+
 
 
 async def test_handle_returns_complete_all_definitions_error_when_event_handler_error(create_complete_group_cmd, handle, two_definition_group):
@@ -271,10 +289,10 @@ async def test_handle_returns_complete_all_definitions_error_when_event_handler_
         s.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(defs))
         s.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
         
-        first_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_1)
+        first_step_id = s._running_definitions[def_id_1]
         s.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, def_id_1, CompletedWith.Data("step1_res")))
         
-        second_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_2)
+        second_step_id = s._running_definitions[def_id_2]
         cmd_dict["step_id"] = second_step_id
         cmd_dict["definition_id"] = def_id_2
         cmd_dict["result"] = CompletedWith.Data("final_res")
@@ -307,10 +325,10 @@ async def test_handle_raises_exception_when_event_handler_exception(create_compl
         s.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(defs))
         s.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
         
-        first_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_1)
+        first_step_id = s._running_definitions[def_id_1]
         s.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, def_id_1, CompletedWith.Data("step1_res")))
         
-        second_step_id = next(e.value for e in s._running_definitions if e.definition_id == def_id_2)
+        second_step_id = s._running_definitions[def_id_2]
         cmd_dict["step_id"] = second_step_id
         cmd_dict["definition_id"] = def_id_2
         cmd_dict["result"] = CompletedWith.Data("final_res")
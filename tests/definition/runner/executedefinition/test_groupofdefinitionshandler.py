@@ -181,4 +181,21 @@ async def test_handle_two_different_groups_with_same_run_id(convert_to_storage_a
     # Events should be isolated per group_id, no cross-contamination
     assert type(handle1_res.ok) is GroupOfRunningDefinitionsState.Events.DefinitionsRunning
     assert type(handle2_res.ok) is GroupOfRunningDefinitionsState.Events.DefinitionsRunning
-    assert handle1_res.ok.definitions != handle2_res.ok.definitions
\ No newline at end of file
+    assert handle1_res.ok.definitions != handle2_res.ok.definitions
+
+
+async def test_handle_sends_execute_definition_actions_of_all_definitions_in_one_batch(convert_to_storage_action, action_data):
+    batches: list[list[tuple[str, ActionInput]]] = []
+    
+    async def run_action_not_used(action_name: str, action_input: ActionInput):
+        raise RuntimeError("Single action should not be run when batch is available")
+    async def run_actions_capture(actions):
+        batches.append(list(actions))
+        return [Result.Ok(None) for _ in actions]
+    
+    handle_res = await groupofdefinitionshandler.handle(convert_to_storage_action, run_action_not_used, action_data, run_actions=run_actions_capture)
+    
+    assert handle_res.is_ok()
+    assert type(handle_res.ok) is GroupOfRunningDefinitionsState.Events.DefinitionsRunning
+    assert len(batches) == 1
+    assert [action_name for action_name, _ in batches[0]] == ["frasty_core_execute_definition"] * len(action_data.input.items)
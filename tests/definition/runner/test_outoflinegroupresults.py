@@ -0,0 +1,149 @@
+import asyncio
+
+from expression import Result
+import pytest
+
+from shared.action import ActionName, ActionType
+from shared.completedresult import CompletedResultAdapter, CompletedWith
+from shared.customtypes import DefinitionIdValue, Metadata, RunIdValue, StepIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.definitioncustomtypes import GroupIdValue
+from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState
+from shared.groupresultsstore import GroupResultsStore
+from shared.pipeline.actionhandler import ActionData, ActionInput, DataDtoAdapter
+from shared.runningdefinitionsstore import GroupOfRunningDefinitionsShardStore, GroupOfRunningDefinitionsStore
+
+from runner.completeaction.registration import _group_definition_event_handler
+from runner import outoflinegroupresults
+from runner.outoflinegroupresults import OutOfLineGroupResults, read_group_results
+from runner.shardedgroupcompletion import ShardedGroupCompletion
+
+import config
+
+NUM_OF_SHARDS = 4
+
+@pytest.fixture
+def group_store():
+    return GroupOfRunningDefinitionsStore(config.STORAGE_ROOT_FOLDER, coalesce_writes=True)
+
+@pytest.fixture
+def results_store():
+    return GroupResultsStore(config.STORAGE_ROOT_FOLDER)
+
+async def run_group(group_store: GroupOfRunningDefinitionsStore, num_of_definitions: int):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    step = ActionDefinition(ActionName("requesturl"), ActionType.CUSTOM, None)
+    definitions = tuple(DefinitionIdWithValue(DefinitionIdValue.new_id(), Definition({"url": f"http://localhost/{i}"}, (step,))) for i in range(num_of_definitions))
+    @group_store.with_storage
+    def set_definitions_and_run(state: GroupOfRunningDefinitionsState | None):
+        new_state = GroupOfRunningDefinitionsState()
+        new_state.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(definitions))
+        evt = new_state.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
+        return (evt, new_state)
+    evt = await set_definitions_and_run(run_id, group_id)
+    assert type(evt) is GroupOfRunningDefinitionsState.Events.DefinitionsRunning
+    return run_id, group_id, evt.definitions
+
+async def test_all_definitions_completed_results_are_streamed_from_results_store(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore):
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage)
+    run_id, group_id, running_defs = await run_group(group_store, 3)
+
+    evts = [await complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+    assert type(evts[-1]) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+    stream_res = await complete_definition.stream_results(run_id, group_id, evts[-1].results)
+    streamed_results = [res async for res in stream_res.ok]
+
+    assert evts[0] == GroupOfRunningDefinitionsState.Events.DefinitionCompleted(running_defs[0].definition_id, CompletedWith.Data(str(running_defs[0].definition_id)))
+    assert evts[-1] == GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted(tuple(DefinitionIdWithValue(rd.definition_id, None) for rd in running_defs))
+    assert streamed_results == [DefinitionIdWithValue(rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+    state = await group_store.get(run_id, group_id)
+    assert state is not None
+    assert all(evt.result is None for evt in state.get_events() if type(evt) is GroupOfRunningDefinitionsState.Events.DefinitionCompleted)
+
+async def test_results_of_group_larger_than_read_batch_are_streamed_in_order(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(outoflinegroupresults, "READ_BATCH_SIZE", 2)
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage)
+    run_id, group_id, running_defs = await run_group(group_store, 5)
+
+    evts = [await complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+    assert type(evts[-1]) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+    stream_res = await complete_definition.stream_results(run_id, group_id, evts[-1].results)
+
+    assert [res async for res in stream_res.ok] == [DefinitionIdWithValue(rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+
+async def test_read_results_are_kept(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore):
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage)
+    run_id, group_id, running_defs = await run_group(group_store, 2)
+    evts = [await complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+    assert type(evts[-1]) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+
+    all_results_res = await read_group_results(complete_definition, run_id, group_id, evts[-1].results)
+
+    assert all_results_res == Result.Ok([{"definition_id": rd.definition_id.to_value_with_checksum()} | CompletedResultAdapter.to_dict(CompletedWith.Data(str(rd.definition_id))) for rd in running_defs])
+    assert [await results_store.get(run_id, group_id, rd.step_id, rd.definition_id) for rd in running_defs] == [CompletedWith.Data(str(rd.definition_id)) for rd in running_defs]
+
+class ParentCompletions:
+    def __init__(self, *results: Result):
+        self._results = list(results)
+        self.inputs: list[ActionInput] = []
+
+    async def __call__(self, action_name: str, action_input: ActionInput):
+        self.inputs.append(action_input)
+        return self._results.pop(0)
+
+async def test_results_are_deleted_only_after_parent_is_completed_by_redelivered_last_completion(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore):
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage)
+    run_id, group_id, running_defs = await run_group(group_store, 2)
+    metadata = Metadata()
+    metadata.set_id("parent_run_id", RunIdValue.new_id())
+    metadata.set_id("parent_step_id", StepIdValue.new_id())
+    metadata.set("parent_metadata", {"definition_id": DefinitionIdValue.new_id().to_value_with_checksum()})
+    data = ActionData(run_id, StepIdValue.new_id(), None, CompletedWith.Data("data"), metadata)
+    parent_completions = ParentCompletions(Result.Error("publish failed"), Result.Ok(None))
+    evts = [await complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+    assert type(evts[-1]) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+    first_res = await _group_definition_event_handler(parent_completions, complete_definition, data, group_id, evts[-1])
+    results_after_failed_publish = [await results_store.get(run_id, group_id, rd.step_id, rd.definition_id) for rd in running_defs]
+
+    last_def = running_defs[-1]
+    redelivered_evt = await complete_definition(run_id, group_id, last_def.step_id, last_def.definition_id, CompletedWith.Data(str(last_def.definition_id)))
+    assert type(redelivered_evt) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+    redelivered_res = await _group_definition_event_handler(parent_completions, complete_definition, data, group_id, redelivered_evt)
+
+    expected_data = [{"definition_id": rd.definition_id.to_value_with_checksum()} | CompletedResultAdapter.to_dict(CompletedWith.Data(str(rd.definition_id))) for rd in running_defs]
+    assert first_res.is_error()
+    assert results_after_failed_publish == [CompletedWith.Data(str(rd.definition_id)) for rd in running_defs]
+    assert redelivered_res.is_ok()
+    assert parent_completions.inputs[0].data == parent_completions.inputs[1].data
+    assert parent_completions.inputs[1].data == DataDtoAdapter.to_input_data(CompletedResultAdapter.to_dict(CompletedWith.Data(expected_data)))
+    assert [await results_store.get(run_id, group_id, rd.step_id, rd.definition_id) for rd in running_defs] == [None, None]
+
+async def test_stream_results_of_definition_not_in_group_returns_error(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore):
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage)
+    run_id, group_id, _ = await run_group(group_store, 1)
+
+    stream_res = await complete_definition.stream_results(run_id, group_id, (DefinitionIdWithValue(DefinitionIdValue.new_id(), None),))
+
+    assert stream_res.is_error()
+
+async def test_sharded_completions_of_group_complete_group_once_with_all_results(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore):
+    shard_store = GroupOfRunningDefinitionsShardStore(config.STORAGE_ROOT_FOLDER, coalesce_writes=True)
+    sharded_completion = ShardedGroupCompletion(group_store.get, group_store.with_storage, shard_store.with_storage, NUM_OF_SHARDS)
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage, sharded_completion)
+    run_id, group_id, running_defs = await run_group(group_store, 50)
+
+    evts = await asyncio.gather(*(complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs))
+
+    all_completed_evts = [evt for evt in evts if type(evt) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted]
+    assert len(all_completed_evts) == 1
+    stream_res = await complete_definition.stream_results(run_id, group_id, all_completed_evts[0].results)
+    assert {res.definition_id: res.value async for res in stream_res.ok} == {rd.definition_id: CompletedWith.Data(str(rd.definition_id)) for rd in running_defs}
+
+async def test_completion_with_different_step_id_is_ignored(group_store: GroupOfRunningDefinitionsStore, results_store: GroupResultsStore):
+    complete_definition = OutOfLineGroupResults(results_store, group_store.get, group_store.with_storage)
+    run_id, group_id, running_defs = await run_group(group_store, 2)
+
+    evt = await complete_definition(run_id, group_id, StepIdValue.new_id(), running_defs[0].definition_id, CompletedWith.Data("data"))
+
+    assert evt is None
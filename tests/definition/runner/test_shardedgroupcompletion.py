@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from shared.action import ActionName, ActionType
+from shared.completedresult import CompletedWith
+from shared.customtypes import DefinitionIdValue, RunIdValue, StepIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.definitioncustomtypes import GroupIdValue
+from shared.groupofrunningdefinitions import DefinitionIdWithValue, GroupOfRunningDefinitionsState
+from shared.infrastructure.storage.repository import NotFoundException
+from shared.runningdefinitionsstore import GroupOfRunningDefinitionsShardStore, GroupOfRunningDefinitionsStore
+
+from runner.shardedgroupcompletion import ShardedGroupCompletion
+
+import config
+
+NUM_OF_SHARDS = 8
+
+# Completions of the same item in one process are written together, as they are in deployment
+@pytest.fixture
+def group_store():
+    return GroupOfRunningDefinitionsStore(config.STORAGE_ROOT_FOLDER, coalesce_writes=True)
+
+@pytest.fixture
+def complete_definition(group_store: GroupOfRunningDefinitionsStore):
+    shard_store = GroupOfRunningDefinitionsShardStore(config.STORAGE_ROOT_FOLDER, coalesce_writes=True)
+    return ShardedGroupCompletion(group_store.get, group_store.with_storage, shard_store.with_storage, NUM_OF_SHARDS)
+
+async def run_group(group_store: GroupOfRunningDefinitionsStore, num_of_definitions: int):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    step = ActionDefinition(ActionName("requesturl"), ActionType.CUSTOM, None)
+    definitions = tuple(DefinitionIdWithValue(DefinitionIdValue.new_id(), Definition({"url": f"http://localhost/{i}"}, (step,))) for i in range(num_of_definitions))
+    @group_store.with_storage
+    def set_definitions_and_run(state: GroupOfRunningDefinitionsState | None):
+        new_state = GroupOfRunningDefinitionsState()
+        new_state.apply_command(GroupOfRunningDefinitionsState.Commands.SetDefinitions(definitions))
+        evt = new_state.apply_command(GroupOfRunningDefinitionsState.Commands.RunDefinitions())
+        return (evt, new_state)
+    evt = await set_definitions_and_run(run_id, group_id)
+    assert type(evt) is GroupOfRunningDefinitionsState.Events.DefinitionsRunning
+    return run_id, group_id, evt.definitions
+
+async def test_concurrent_completions_of_large_group_complete_group_once(group_store: GroupOfRunningDefinitionsStore, complete_definition: ShardedGroupCompletion):
+    run_id, group_id, running_defs = await run_group(group_store, 200)
+
+    evts = await asyncio.gather(*(complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data(str(rd.definition_id))) for rd in running_defs))
+
+    all_completed_evts = [evt for evt in evts if type(evt) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted]
+    assert len(all_completed_evts) == 1
+    assert {res.definition_id: res.value for res in all_completed_evts[0].results} == {rd.definition_id: CompletedWith.Data(str(rd.definition_id)) for rd in running_defs}
+    assert sum(1 for evt in evts if type(evt) is GroupOfRunningDefinitionsState.Events.DefinitionCompleted) == 200 - NUM_OF_SHARDS
+
+async def test_retried_completion_of_completed_group_returns_all_definitions_completed(group_store: GroupOfRunningDefinitionsStore, complete_definition: ShardedGroupCompletion):
+    run_id, group_id, running_defs = await run_group(group_store, 3)
+    result = CompletedWith.Data("data")
+    for rd in running_defs:
+        await complete_definition(run_id, group_id, rd.step_id, rd.definition_id, result)
+
+    evt = await complete_definition(run_id, group_id, running_defs[-1].step_id, running_defs[-1].definition_id, result)
+
+    assert type(evt) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+    assert len(evt.results) == 3
+
+async def test_completion_with_different_step_id_is_ignored(group_store: GroupOfRunningDefinitionsStore, complete_definition: ShardedGroupCompletion):
+    run_id, group_id, running_defs = await run_group(group_store, 3)
+
+    evt = await complete_definition(run_id, group_id, StepIdValue.new_id(), running_defs[0].definition_id, CompletedWith.Data("data"))
+
+    assert evt is None
+
+async def test_completion_of_missing_group_raises_not_found(complete_definition: ShardedGroupCompletion):
+    with pytest.raises(NotFoundException):
+        await complete_definition(RunIdValue.new_id(), GroupIdValue.new_id(), StepIdValue.new_id(), DefinitionIdValue.new_id(), CompletedWith.Data("data"))
+
+async def test_first_completions_of_different_groups_read_groups_in_parallel(group_store: GroupOfRunningDefinitionsStore):
+    shard_store = GroupOfRunningDefinitionsShardStore(config.STORAGE_ROOT_FOLDER, coalesce_writes=True)
+    num_of_reading = 0
+    max_num_of_reading = 0
+    reads_of_groups: dict[GroupIdValue, int] = {}
+    async def get_state(run_id: RunIdValue, group_id: GroupIdValue):
+        nonlocal num_of_reading, max_num_of_reading
+        num_of_reading += 1
+        max_num_of_reading = max(max_num_of_reading, num_of_reading)
+        reads_of_groups[group_id] = reads_of_groups.get(group_id, 0) + 1
+        await asyncio.sleep(0.01)
+        num_of_reading -= 1
+        return await group_store.get(run_id, group_id)
+    complete_definition = ShardedGroupCompletion(get_state, group_store.with_storage, shard_store.with_storage, NUM_OF_SHARDS)
+    groups = [await run_group(group_store, 3) for _ in range(2)]
+
+    await asyncio.gather(*(complete_definition(run_id, group_id, rd.step_id, rd.definition_id, CompletedWith.Data("data")) for run_id, group_id, running_defs in groups for rd in running_defs))
+
+    assert max_num_of_reading == 2
+    assert sorted(reads_of_groups.values()) == [1, 1]
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from infrastructure.persistence.storagebackend import StorageBackend, StorageSettings
+from shared.action import ActionName, ActionType
+from shared.customtypes import DefinitionIdValue, RunIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.definitionblobs import DefinitionBlobs
+from shared.runningdefinition import RunningDefinitionState
+from shared.runningdefinitionsstore import RunningDefinitionsStore
+
+import config
+
+@pytest.fixture(scope="module")
+def folder_path():
+    return os.path.join(config.STORAGE_ROOT_FOLDER, "test_definitionblobs")
+
+def create_definition(url: str = "http://localhost"):
+    steps = (ActionDefinition(ActionName("requesturl"), ActionType.CUSTOM, None), ActionDefinition(ActionName("filtersuccessresponse"), ActionType.CUSTOM, None))
+    return Definition([{"url": url}], steps)
+
+def test_equal_definitions_have_the_same_ref(folder_path: str):
+    definition_blobs = DefinitionBlobs(folder_path)
+
+    ref = definition_blobs.ref(create_definition())
+
+    assert ref == definition_blobs.ref(create_definition())
+    assert ref != definition_blobs.ref(create_definition("http://localhost/other"))
+
+async def test_definition_is_stored_once(folder_path: str):
+    definition_blobs = DefinitionBlobs(folder_path)
+    definition = create_definition("http://localhost/stored_once")
+
+    ref = await definition_blobs.add(definition)
+    await definition_blobs.add(create_definition("http://localhost/stored_once"))
+    await DefinitionBlobs(folder_path).add(create_definition("http://localhost/stored_once"))
+
+    assert os.listdir(os.path.join(folder_path, "DefinitionBlobs", ref)) == ["1.json"]
+
+async def test_load_reads_definition_stored_by_another_instance_once(folder_path: str):
+    definition = create_definition("http://localhost/another_instance")
+    ref = await DefinitionBlobs(folder_path).add(definition)
+    definition_blobs = DefinitionBlobs(folder_path)
+
+    await definition_blobs.load([ref])
+    await definition_blobs.load([ref])
+    first_definition = definition_blobs.get(ref).ok
+    second_definition = definition_blobs.get(ref).ok
+
+    assert first_definition == definition
+    assert second_definition is first_definition
+
+async def test_get_of_not_loaded_ref_returns_error(folder_path: str):
+    definition_blobs = DefinitionBlobs(folder_path)
+
+    await definition_blobs.load(["missing"])
+    res = definition_blobs.get("missing")
+
+    assert res.is_error()
+
+@pytest.mark.parametrize("storage_settings, use_event_log", [
+    (StorageSettings(), False),
+    (StorageSettings(), True),
+    (StorageSettings(backend=StorageBackend.SQLITE), False)
+])
+async def test_store_with_shared_definitions_reads_state_with_definition_stored_in_blob(folder_path: str, storage_settings: StorageSettings, use_event_log: bool):
+    store = RunningDefinitionsStore(folder_path, use_event_log=use_event_log, storage_settings=storage_settings, shared_definitions=True)
+    run_id = RunIdValue.new_id()
+    definition_id = DefinitionIdValue.new_id()
+    definition = create_definition("http://localhost/shared")
+    @store.with_storage
+    def set_definition_and_run(state: RunningDefinitionState | None):
+        new_state = state or RunningDefinitionState()
+        new_state.apply_command(RunningDefinitionState.Commands.SetDefinition(definition))
+        evt = new_state.apply_command(RunningDefinitionState.Commands.RunFirstStep())
+        return (evt, new_state)
+    def get_state(state: RunningDefinitionState | None):
+        assert state is not None
+        return (state, state)
+
+    await set_definition_and_run(run_id, definition_id)
+    other_process_store = RunningDefinitionsStore(folder_path, use_event_log=use_event_log, storage_settings=storage_settings, shared_definitions=True)
+    state = await other_process_store.with_storage(get_state)(run_id, definition_id)
+
+    assert state.definition() == definition
+    assert state.running_step_id() is not None
@@ -3,7 +3,7 @@ from shared.action import ActionName, ActionType
 from shared.completedresult import CompletedWith
 from shared.customtypes import DefinitionIdValue, Error, StepIdValue
 from shared.definition import ActionDefinition, Definition
-from shared.groupofrunningdefinitions import GroupOfRunningDefinitionsState, DefinitionIdWithValue
+from shared.groupofrunningdefinitions import CompletedDefinition, GroupOfRunningDefinitionsState, GroupOfRunningDefinitionsStateAdapter, DefinitionIdWithValue
 
 @pytest.fixture
 def request_url_data():
@@ -110,8 +110,8 @@ def test_cant_run_definitions_when_already_running(running_group_state):
 
 def test_complete_first_definition(running_group_state, test_result):
     # Capture step_id from internal projection (exposed for testing consistency)
-    first_def_id = running_group_state._running_definitions[0].definition_id
-    first_step_id = running_group_state._running_definitions[0].value
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
     
     evt = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, test_result))
 
@@ -133,7 +133,7 @@ def test_cant_complete_definition_when_not_running(running_group_state, test_res
 
 
 def test_cant_complete_definition_with_mismatched_step_id(running_group_state, test_result):
-    first_def_id = running_group_state._running_definitions[0].definition_id
+    first_def_id = list(running_group_state._running_definitions)[0]
     wrong_step_id = StepIdValue.new_id()
     
     evt = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(wrong_step_id, first_def_id, test_result))
@@ -143,8 +143,8 @@ def test_cant_complete_definition_with_mismatched_step_id(running_group_state, t
 
 
 def test_complete_definition_idempotent_with_matching_step_id(running_group_state, test_result):
-    first_def_id = running_group_state._running_definitions[0].definition_id
-    first_step_id = running_group_state._running_definitions[0].value
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
     
     evt1 = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, test_result))
     # Retry with exact same command
@@ -157,10 +157,10 @@ def test_complete_definition_idempotent_with_matching_step_id(running_group_stat
 
 
 def test_all_definitions_completed_triggered(running_group_state, test_result):
-    first_def_id = running_group_state._running_definitions[0].definition_id
-    first_step_id = running_group_state._running_definitions[0].value
-    second_def_id = running_group_state._running_definitions[1].definition_id
-    second_step_id = running_group_state._running_definitions[1].value
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
+    second_def_id = list(running_group_state._running_definitions)[1]
+    second_step_id = list(running_group_state._running_definitions.values())[1]
 
     # Complete first definition
     running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, test_result))
@@ -175,10 +175,10 @@ def test_all_definitions_completed_triggered(running_group_state, test_result):
 
 
 def test_all_definitions_completed_journal_stores_empty_results(running_group_state, test_result):
-    first_def_id = running_group_state._running_definitions[0].definition_id
-    first_step_id = running_group_state._running_definitions[0].value
-    second_def_id = running_group_state._running_definitions[1].definition_id
-    second_step_id = running_group_state._running_definitions[1].value
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
+    second_def_id = list(running_group_state._running_definitions)[1]
+    second_step_id = list(running_group_state._running_definitions.values())[1]
     # Complete both definitions to trigger terminal state
     running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, test_result))
     running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(second_step_id, second_def_id, test_result))
@@ -193,10 +193,10 @@ def test_all_definitions_completed_journal_stores_empty_results(running_group_st
 
 
 def test_all_definitions_completed_idempotent_returns_terminal(running_group_state, test_result):
-    first_def_id = running_group_state._running_definitions[0].definition_id
-    first_step_id = running_group_state._running_definitions[0].value
-    second_def_id = running_group_state._running_definitions[1].definition_id
-    second_step_id = running_group_state._running_definitions[1].value
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
+    second_def_id = list(running_group_state._running_definitions)[1]
+    second_step_id = list(running_group_state._running_definitions.values())[1]
     # Complete first
     running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, test_result))
     # Complete second (triggers terminal)
@@ -229,10 +229,10 @@ def test_cant_fail_uninitialized(test_error):
 
 def test_get_events_journal_sequence(running_group_state, test_result):
     # Record step IDs
-    first_def_id = running_group_state._running_definitions[0].definition_id
-    first_step_id = running_group_state._running_definitions[0].value
-    second_def_id = running_group_state._running_definitions[1].definition_id
-    second_step_id = running_group_state._running_definitions[1].value
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
+    second_def_id = list(running_group_state._running_definitions)[1]
+    second_step_id = list(running_group_state._running_definitions.values())[1]
     
     running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, test_result))
     running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(second_step_id, second_def_id, test_result))
@@ -244,3 +244,51 @@ def test_get_events_journal_sequence(running_group_state, test_result):
     assert type(journal[2]) is GroupOfRunningDefinitionsState.Events.DefinitionCompleted
     assert type(journal[3]) is GroupOfRunningDefinitionsState.Events.DefinitionCompleted
     assert type(journal[4]) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+
+
+
+def test_complete_definitions_of_shard(running_group_state, test_result):
+    first_def_id, first_step_id = list(running_group_state._running_definitions.items())[0]
+
+    evt = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinitions((CompletedDefinition(first_step_id, first_def_id, test_result),)))
+
+    assert type(evt) is GroupOfRunningDefinitionsState.Events.DefinitionsCompleted
+    assert evt.results == (DefinitionIdWithValue(first_def_id, test_result),)
+
+
+
+def test_complete_definitions_of_last_shard_returns_all_definitions_completed(running_group_state, test_result):
+    completed_defs = tuple(CompletedDefinition(step_id, def_id, test_result) for def_id, step_id in running_group_state._running_definitions.items())
+
+    evt1 = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinitions(completed_defs[:1]))
+    evt2 = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinitions(completed_defs[1:]))
+    # Retry of already completed shard
+    evt3 = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinitions(completed_defs[1:]))
+
+    assert type(evt1) is GroupOfRunningDefinitionsState.Events.DefinitionsCompleted
+    assert type(evt2) is GroupOfRunningDefinitionsState.Events.AllDefinitionsCompleted
+    assert evt2 == evt3
+    assert len(evt2.results) == 2
+
+
+
+def test_cant_complete_definitions_with_mismatched_step_id(running_group_state, test_result):
+    first_def_id = list(running_group_state._running_definitions)[0]
+
+    evt = running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinitions((CompletedDefinition(StepIdValue.new_id(), first_def_id, test_result),)))
+
+    assert evt is None
+
+
+
+def test_definition_completed_with_result_stored_out_of_line_is_stored_without_result(running_group_state, test_result):
+    first_def_id = list(running_group_state._running_definitions)[0]
+    first_step_id = list(running_group_state._running_definitions.values())[0]
+    running_group_state.apply_command(GroupOfRunningDefinitionsState.Commands.CompleteDefinition(first_step_id, first_def_id, None))
+
+    data = GroupOfRunningDefinitionsStateAdapter.to_list(running_group_state)
+    restored_state = GroupOfRunningDefinitionsStateAdapter.from_list(data).ok
+
+    assert "result" not in data[-1]
+    assert restored_state.get_events()[-1] == GroupOfRunningDefinitionsState.Events.DefinitionCompleted(first_def_id, None)
+    assert restored_state.step_id_of(first_def_id) == first_step_id
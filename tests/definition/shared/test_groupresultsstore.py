@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from infrastructure.persistence.storagebackend import StorageBackend, StorageSettings
+from shared.completedresult import CompletedWith
+from shared.customtypes import DefinitionIdValue, RunIdValue, StepIdValue
+from shared.definitioncustomtypes import GroupIdValue
+from shared.groupresultsstore import GroupResultsStore
+
+import config
+
+@pytest.fixture(scope="module", params=[StorageSettings(), StorageSettings(backend=StorageBackend.SQLITE)], ids=["file", "sqlite"])
+def results_store(request: pytest.FixtureRequest):
+    return GroupResultsStore(os.path.join(config.STORAGE_ROOT_FOLDER, "test_groupresultsstore"), request.param)
+
+async def test_stored_results_are_read_back(results_store: GroupResultsStore):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    definitions = [(StepIdValue.new_id(), DefinitionIdValue.new_id()) for _ in range(3)]
+    results = [CompletedWith.Data({"index": 0}), CompletedWith.NoData(), CompletedWith.Error("error")]
+    for (step_id, definition_id), result in zip(definitions, results):
+        await results_store.add(run_id, group_id, step_id, definition_id, result)
+
+    stored_results = [await results_store.get(run_id, group_id, step_id, definition_id) for step_id, definition_id in definitions]
+
+    assert stored_results == results
+
+async def test_stored_results_are_read_back_together_in_order(results_store: GroupResultsStore):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    definitions = [(StepIdValue.new_id(), DefinitionIdValue.new_id()) for _ in range(3)]
+    results = [CompletedWith.Data({"index": 0}), CompletedWith.NoData(), CompletedWith.Error("error")]
+    for (step_id, definition_id), result in zip(definitions, results):
+        await results_store.add(run_id, group_id, step_id, definition_id, result)
+    missing_definition = (StepIdValue.new_id(), DefinitionIdValue.new_id())
+
+    stored_results = await results_store.get_many(run_id, group_id, [definitions[2], missing_definition, definitions[0], definitions[1]])
+
+    assert stored_results == [results[2], None, results[0], results[1]]
+
+async def test_retried_add_keeps_result(results_store: GroupResultsStore):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    step_id = StepIdValue.new_id()
+    definition_id = DefinitionIdValue.new_id()
+
+    await results_store.add(run_id, group_id, step_id, definition_id, CompletedWith.Data("data"))
+    await results_store.add(run_id, group_id, step_id, definition_id, CompletedWith.Data("data"))
+
+    assert await results_store.get(run_id, group_id, step_id, definition_id) == CompletedWith.Data("data")
+
+async def test_result_of_other_step_is_missing(results_store: GroupResultsStore):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    definition_id = DefinitionIdValue.new_id()
+    await results_store.add(run_id, group_id, StepIdValue.new_id(), definition_id, CompletedWith.NoData())
+
+    assert await results_store.get(run_id, group_id, StepIdValue.new_id(), definition_id) is None
+
+async def test_deleted_result_is_missing(results_store: GroupResultsStore):
+    run_id = RunIdValue.new_id()
+    group_id = GroupIdValue.new_id()
+    step_id = StepIdValue.new_id()
+    definition_id = DefinitionIdValue.new_id()
+    await results_store.add(run_id, group_id, step_id, definition_id, CompletedWith.NoData())
+
+    await results_store.delete(run_id, group_id, step_id, definition_id)
+
+    assert await results_store.get(run_id, group_id, step_id, definition_id) is None
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from infrastructure.persistence.storagebackend import StorageBackend, StorageSettings
+from shared.action import ActionName, ActionType
+from shared.completedresult import CompletedWith
+from shared.customtypes import DefinitionIdValue, RunIdValue
+from shared.definition import ActionDefinition, Definition
+from shared.runningdefinition import SNAPSHOT_INTERVAL, RunningDefinitionState
+from shared.runningdefinitionsstore import RunningDefinitionsStore
+
+import config
+
+NUM_OF_STEPS = 30
+
+async def run_steps_with_storage(store: RunningDefinitionsStore, num_of_steps: int):
+    run_id = RunIdValue.new_id()
+    definition_id = DefinitionIdValue.new_id()
+    steps = tuple(ActionDefinition(ActionName(f"step{i}"), ActionType.CUSTOM, None) for i in range(NUM_OF_STEPS))
+    @store.with_storage
+    def run_first_step(state: RunningDefinitionState | None):
+        new_state = RunningDefinitionState()
+        new_state.apply_command(RunningDefinitionState.Commands.SetDefinition(Definition({"url": "http://localhost"}, steps)))
+        new_state.apply_command(RunningDefinitionState.Commands.RunFirstStep())
+        return (None, new_state)
+    @store.with_storage
+    def complete_step_and_run_next(state: RunningDefinitionState | None, index: int):
+        assert state is not None
+        running_step_id = state.running_step_id()
+        assert running_step_id is not None
+        state.apply_command(RunningDefinitionState.Commands.CompleteRunningStep(running_step_id, CompletedWith.Data(f"step {index} data")))
+        state.apply_command(RunningDefinitionState.Commands.RunNextStep())
+        return (None, state)
+    await run_first_step(run_id, definition_id)
+    for i in range(num_of_steps):
+        await complete_step_and_run_next(run_id, definition_id, i)
+    @store.with_storage
+    def get_events(state: RunningDefinitionState | None):
+        assert state is not None
+        return (state.get_events(), state)
+    return await get_events(run_id, definition_id)
+
+@pytest.mark.parametrize("storage_settings", [StorageSettings(), StorageSettings(backend=StorageBackend.SQLITE)], ids=["file", "sqlite"])
+async def test_rewritten_state_keeps_events_before_snapshot(storage_settings: StorageSettings):
+    store = RunningDefinitionsStore(os.path.join(config.STORAGE_ROOT_FOLDER, "test_runningdefinitionsstore"), storage_settings=storage_settings)
+
+    events = await run_steps_with_storage(store, 25)
+
+    assert sum(1 for evt in events if type(evt) is RunningDefinitionState.Events.Snapshot) == 2
+    assert type(events[0]) is RunningDefinitionState.Events.DefinitionAdded
+    assert sum(1 for evt in events if type(evt) is RunningDefinitionState.Events.StepCompleted) == 25
+
+async def test_state_in_event_log_is_restored_from_last_snapshot():
+    store = RunningDefinitionsStore(os.path.join(config.STORAGE_ROOT_FOLDER, "test_runningdefinitionsstore"), use_event_log=True)
+
+    events = await run_steps_with_storage(store, 25)
+
+    assert type(events[0]) is RunningDefinitionState.Events.Snapshot
+    assert len(events) < SNAPSHOT_INTERVAL
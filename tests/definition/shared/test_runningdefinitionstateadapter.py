@@ -1,7 +1,9 @@
+from expression import Result
+
 from shared.action import ActionName, ActionType
 from shared.completedresult import CompletedWith
 from shared.definition import ActionDefinition, Definition
-from shared.runningdefinition import RunningDefinitionState, RunningDefinitionStateAdapter
+from shared.runningdefinition import SNAPSHOT_INTERVAL, RunningDefinitionState, RunningDefinitionStateAdapter
 
 
 def test_to_list_and_back():
@@ -35,3 +37,92 @@ def test_to_list_and_back():
     assert restored_state.recent_completed_step_id() == running_definition_state.recent_completed_step_id()
     assert restored_state.running_step_id() == running_definition_state.running_step_id()
     assert len(restored_state.get_events()) == len(running_definition_state.get_events())
+
+def run_steps(state: RunningDefinitionState, num_of_steps: int):
+    for i in range(num_of_steps):
+        running_step_id = state.running_step_id()
+        assert running_step_id is not None
+        state.apply_command(RunningDefinitionState.Commands.CompleteRunningStep(running_step_id, CompletedWith.Data(f"step {i} data")))
+        state.apply_command(RunningDefinitionState.Commands.RunNextStep())
+
+def create_running_state_of_many_steps(num_of_steps: int):
+    steps = tuple(ActionDefinition(ActionName(f"step{i}"), ActionType.CUSTOM, None) for i in range(num_of_steps))
+    state = RunningDefinitionState()
+    state.apply_command(RunningDefinitionState.Commands.SetDefinition(Definition({"url": "http://localhost"}, steps)))
+    state.apply_command(RunningDefinitionState.Commands.RunFirstStep())
+    return state
+
+def test_long_running_state_is_restored_with_all_events():
+    running_definition_state = create_running_state_of_many_steps(30)
+    run_steps(running_definition_state, 25)
+
+    list_state = RunningDefinitionStateAdapter.to_list(running_definition_state)
+    restored_state = RunningDefinitionStateAdapter.from_list(list_state).ok
+
+    assert sum(1 for evt in running_definition_state.get_events() if type(evt) is RunningDefinitionState.Events.Snapshot) == 2
+    assert [type(evt) for evt in restored_state.get_events()] == [type(evt) for evt in running_definition_state.get_events()]
+    assert RunningDefinitionStateAdapter.to_list(restored_state) == list_state
+    assert restored_state.recent_completed_step_id() == running_definition_state.recent_completed_step_id()
+    assert restored_state.running_step_id() == running_definition_state.running_step_id()
+
+def test_long_running_state_is_restored_from_events_since_last_snapshot():
+    running_definition_state = create_running_state_of_many_steps(30)
+    run_steps(running_definition_state, 25)
+    list_state = RunningDefinitionStateAdapter.to_list(running_definition_state)
+    last_snapshot_index = max(i for i, evt in enumerate(list_state) if RunningDefinitionStateAdapter.is_snapshot(evt))
+
+    restored_state = RunningDefinitionStateAdapter.from_list(list_state[last_snapshot_index:]).ok
+
+    assert type(restored_state.get_events()[0]) is RunningDefinitionState.Events.Snapshot
+    assert len(restored_state.get_events()) < SNAPSHOT_INTERVAL
+    assert restored_state.recent_completed_step_id() == running_definition_state.recent_completed_step_id()
+    assert restored_state.running_step_id() == running_definition_state.running_step_id()
+
+def test_snapshot_is_appended_after_configured_interval(monkeypatch):
+    monkeypatch.setattr(RunningDefinitionState, "snapshot_interval", 5)
+    running_definition_state = create_running_state_of_many_steps(30)
+    run_steps(running_definition_state, 10)
+
+    list_state = RunningDefinitionStateAdapter.to_list(running_definition_state)
+    restored_state = RunningDefinitionStateAdapter.from_list(list_state).ok
+
+    assert sum(1 for evt in running_definition_state.get_events() if type(evt) is RunningDefinitionState.Events.Snapshot) == 4
+    assert len(restored_state.get_events()) == len(running_definition_state.get_events())
+    assert restored_state.running_step_id() == running_definition_state.running_step_id()
+
+def test_state_restored_from_snapshot_runs_remaining_steps_to_completion():
+    running_definition_state = create_running_state_of_many_steps(30)
+    run_steps(running_definition_state, 25)
+    restored_state = RunningDefinitionStateAdapter.from_list(RunningDefinitionStateAdapter.to_list(running_definition_state)).ok
+
+    run_steps(restored_state, 5)
+
+    completed_evt = restored_state.get_events()[-1]
+    assert completed_evt == RunningDefinitionState.Events.DefinitionCompleted(CompletedWith.Data("step 4 data"))
+
+def test_state_with_definition_ref_is_restored_without_embedded_definition():
+    stored_definitions: dict[str, Definition] = {}
+    def to_definition_ref(definition: Definition):
+        stored_definitions["ref"] = definition
+        return "ref"
+    def from_definition_ref(ref: str):
+        return Result.Ok(stored_definitions[ref]) if ref in stored_definitions else Result.Error(f"definition {ref} is missing")
+    running_definition_state = create_running_state_of_many_steps(30)
+    run_steps(running_definition_state, 25)
+
+    list_state = RunningDefinitionStateAdapter.to_list(running_definition_state, to_definition_ref)
+    restored_state = RunningDefinitionStateAdapter.from_list(list_state, from_definition_ref).ok
+    run_steps(restored_state, 5)
+
+    assert all("definition" not in evt and "step_definition" not in evt for evt in list_state)
+    assert restored_state.recent_completed_step_id() == restored_state.get_events()[-2].step_id
+    assert type(restored_state.get_events()[-1]) is RunningDefinitionState.Events.DefinitionCompleted
+
+def test_state_with_embedded_definition_is_restored_when_definition_refs_are_used():
+    running_definition_state = create_running_state_of_many_steps(3)
+    run_steps(running_definition_state, 1)
+
+    list_state = RunningDefinitionStateAdapter.to_list(running_definition_state)
+    restored_state = RunningDefinitionStateAdapter.from_list(list_state, lambda ref: Result.Error(f"definition {ref} is missing")).ok
+
+    assert restored_state.running_step_id() == running_definition_state.running_step_id()
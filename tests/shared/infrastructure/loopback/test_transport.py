@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any
+
+from expression import Result
+import pytest
+
+from infrastructure.loopback.transport import LoopbackTransport
+from shared.pipeline.actionhandler import ActionInput
+
+class RemoteTransport:
+    def __init__(self):
+        self.sent: list[tuple[str, ActionInput]] = []
+        self.registered: list[str] = []
+
+    async def run_action(self, action_name: str, action_input: ActionInput):
+        self.sent.append((action_name, action_input))
+        return Result.Ok(None)
+
+    async def run_actions(self, actions):
+        return [await self.run_action(action_name, action_input) for action_name, action_input in actions]
+
+    def action_handler(self, action_name: str, action_handler):
+        self.registered.append(action_name)
+        return action_handler
+
+@pytest.fixture
+def remote():
+    return RemoteTransport()
+
+@pytest.fixture
+def transport(remote: RemoteTransport):
+    return LoopbackTransport(remote.run_action, remote.run_actions, remote.action_handler)
+
+def create_action_input(step_id: str = "step_id"):
+    return ActionInput("run_id", step_id, {"url": "http://localhost"}, {"task_id": "task_id"})  # type: ignore[arg-type]
+
+async def test_local_action_is_handled_without_remote_transport(transport: LoopbackTransport, remote: RemoteTransport):
+    received = []
+    async def handle(action_input_res: Result[ActionInput, Any]):
+        received.append(action_input_res)
+        return Result.Ok(None)
+    transport.action_handler("local_action", handle)
+    action_input = create_action_input()
+
+    res = await transport.run_action("local_action", action_input)
+    await transport.wait_for_running_actions()
+
+    assert res == Result.Ok(None)
+    assert received == [Result.Ok(action_input)]
+    assert remote.sent == []
+    assert remote.registered == ["local_action"]
+
+async def test_not_local_action_is_run_by_remote_transport(transport: LoopbackTransport, remote: RemoteTransport):
+    action_input = create_action_input()
+
+    res = await transport.run_action("remote_action", action_input)
+
+    assert res == Result.Ok(None)
+    assert remote.sent == [("remote_action", action_input)]
+
+async def test_local_action_failed_with_error_is_run_by_remote_transport(transport: LoopbackTransport, remote: RemoteTransport):
+    async def handle(action_input_res: Result[ActionInput, Any]):
+        return Result.Error("Storage is not available")
+    transport.action_handler("local_action", handle)
+    action_input = create_action_input()
+
+    await transport.run_action("local_action", action_input)
+    await transport.wait_for_running_actions()
+
+    assert remote.sent == [("local_action", action_input)]
+
+async def test_local_action_failed_with_exception_is_run_by_remote_transport(transport: LoopbackTransport, remote: RemoteTransport):
+    async def handle(action_input_res: Result[ActionInput, Any]):
+        raise RuntimeError("Handler failed")
+    transport.action_handler("local_action", handle)
+    action_input = create_action_input()
+
+    await transport.run_action("local_action", action_input)
+    await transport.wait_for_running_actions()
+
+    assert remote.sent == [("local_action", action_input)]
+
+async def test_run_actions_splits_local_and_remote_actions_and_keeps_results_order(transport: LoopbackTransport, remote: RemoteTransport):
+    received = []
+    async def handle(action_input_res: Result[ActionInput, Any]):
+        received.append(action_input_res.ok.step_id)
+        return Result.Ok(None)
+    transport.action_handler("local_action", handle)
+    actions = [("local_action", create_action_input("step1")), ("remote_action", create_action_input("step2")), ("local_action", create_action_input("step3"))]
+
+    results = await transport.run_actions(actions)
+    await transport.wait_for_running_actions()
+
+    assert results == [Result.Ok(None)] * 3
+    assert sorted(received) == ["step1", "step3"]
+    assert [action_input.step_id for _, action_input in remote.sent] == ["step2"]
+
+async def test_local_actions_are_run_within_limit_of_action(remote: RemoteTransport):
+    semaphore = asyncio.Semaphore(1)
+    limited_actions = []
+    async def limit_local_action(action_name: str, run):
+        limited_actions.append(action_name)
+        async with semaphore:
+            return await run()
+    transport = LoopbackTransport(remote.run_action, remote.run_actions, remote.action_handler, limit_local_action=limit_local_action)
+    running = 0
+    max_running = 0
+    async def handle(action_input_res: Result[ActionInput, Any]):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return Result.Ok(None)
+    transport.action_handler("local_action", handle)
+
+    await transport.run_actions([("local_action", create_action_input(f"step_id_{i}")) for i in range(3)])
+    await transport.wait_for_running_actions()
+
+    assert limited_actions == ["local_action"] * 3
+    assert max_running == 1
+    assert remote.sent == []
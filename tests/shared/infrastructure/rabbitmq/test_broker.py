@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+# Rabbit dependencies are not installed with the tests of every service
+pytest.importorskip("aio_pika")
+pytest.importorskip("faststream")
+
+from aiormq import ChannelClosed
+
+from infrastructure.rabbitmq.broker import RabbitMQBroker
+from infrastructure.rabbitmq.rabbitmiddlewares import RetryPolicy
+
+class FakeChannel:
+    def __init__(self, connection: "FakeConnection"):
+        self._connection = connection
+        self.is_closed = False
+
+    async def get_queue(self, name: str, ensure: bool = True):
+        self._connection.num_of_probing += 1
+        self._connection.max_num_of_probing = max(self._connection.max_num_of_probing, self._connection.num_of_probing)
+        await asyncio.sleep(0.01)
+        self._connection.num_of_probing -= 1
+        if name not in self._connection.queues:
+            self.is_closed = True
+            raise ChannelClosed(404, f"NOT_FOUND - no queue '{name}'")
+        return name
+
+    async def declare_queue(self, name: str, durable: bool = False, arguments: dict | None = None):
+        self._connection.declared_queues[name] = arguments
+        return name
+
+    async def close(self):
+        self.is_closed = True
+
+class FakeConnection:
+    def __init__(self, queues: set[str]):
+        self.queues = queues
+        self.channels: list[FakeChannel] = []
+        self.declared_queues: dict[str, dict | None] = {}
+        self.num_of_probing = 0
+        self.max_num_of_probing = 0
+
+    async def channel(self):
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+async def handle(msg):
+    return None
+
+@pytest.fixture
+def broker():
+    return RabbitMQBroker()
+
+async def test_setup_probes_command_queues_concurrently(broker: RabbitMQBroker):
+    commands = [f"command{i}" for i in range(10)]
+    connection = FakeConnection(set(commands))
+    for command in commands:
+        broker.command_subscriber(command)(handle)
+
+    await broker._setup_command_subscribers(connection)  # type: ignore[arg-type]
+
+    assert connection.max_num_of_probing == 10
+    assert all(channel.is_closed for channel in connection.channels)
+
+async def test_setup_subscribes_to_existing_queue_passively_and_to_missing_queue_exclusively(broker: RabbitMQBroker):
+    connection = FakeConnection({"existing_command"})
+    broker.command_subscriber("existing_command")(handle)
+    broker.command_subscriber("missing_command")(handle)
+
+    await broker._setup_command_subscribers(connection)  # type: ignore[arg-type]
+
+    queues = {subscriber.queue.name: subscriber.queue for subscriber in broker._subscribers.values()}  # type: ignore[attr-defined]
+    assert queues["existing_command"].passive and not queues["existing_command"].exclusive
+    assert queues["missing_command"].exclusive
+
+async def test_setup_declares_retry_queues_of_missing_command_queue(broker: RabbitMQBroker):
+    connection = FakeConnection(set())
+    broker.command_subscriber("command", retry_policy=RetryPolicy(max_attempts=3, base_delay=1.0))(handle)
+
+    await broker._setup_command_subscribers(connection)  # type: ignore[arg-type]
+
+    assert set(connection.declared_queues) == {"command.retry.1000ms", "command.retry.2000ms", "command.dead"}
+    assert connection.declared_queues["command.retry.1000ms"] == {"x-message-ttl": 1000, "x-dead-letter-exchange": "", "x-dead-letter-routing-key": "command"}
+
+async def test_setup_skips_already_set_up_command_subscribers(broker: RabbitMQBroker):
+    connection = FakeConnection({"command1", "command2"})
+    broker.command_subscriber("command1")(handle)
+    await broker._setup_command_subscribers(connection)  # type: ignore[arg-type]
+    broker.command_subscriber("command2")(handle)
+
+    await broker._setup_command_subscribers(connection)  # type: ignore[arg-type]
+
+    assert sorted(subscriber.queue.name for subscriber in broker._subscribers.values()) == ["command1", "command2"]  # type: ignore[attr-defined]
+
+def test_command_handler_metrics_are_logged_for_every_command(broker: RabbitMQBroker):
+    logged: list[tuple[str, dict]] = []
+    broker._log = lambda message, log_level, extra=None: logged.append((message, extra))  # type: ignore[method-assign]
+    broker.command_subscriber("command1")(handle)
+    broker.command_subscriber("command2")(handle)
+    broker.command_handler_metrics()["command1"].processed = 3
+
+    broker.log_command_handler_metrics()
+
+    assert [extra["queue"] for _, extra in logged] == ["command1", "command2"]
+    assert "processed 3" in logged[0][0]
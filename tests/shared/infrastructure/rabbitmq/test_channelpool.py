@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+# Rabbit dependencies are not installed with the tests of every service
+pytest.importorskip("aio_pika")
+pytest.importorskip("faststream")
+
+from aio_pika import Message
+from aiormq import ChannelInvalidStateError
+
+from infrastructure.rabbitmq.channelpool import PublishChannelPool
+
+class FakeExchange:
+    def __init__(self, channel: "FakeChannel"):
+        self._channel = channel
+    
+    async def publish(self, message: Message, routing_key: str):
+        if self._channel.is_closed or self._channel.is_broken:
+            raise ChannelInvalidStateError("Channel closed")
+        self._channel.published.append(routing_key)
+        await asyncio.sleep(0.01)
+        return None
+
+class FakeChannel:
+    def __init__(self):
+        self.is_closed = False
+        self.is_broken = False
+        self.published: list[str] = []
+        self.default_exchange = FakeExchange(self)
+    
+    async def close(self):
+        self.is_closed = True
+
+class FakeConnection:
+    def __init__(self):
+        self.channels: list[FakeChannel] = []
+    
+    async def channel(self, publisher_confirms: bool = True):
+        channel = FakeChannel()
+        self.channels.append(channel)
+        return channel
+    
+    async def ready(self):
+        pass
+
+@pytest.fixture
+def connection():
+    return FakeConnection()
+
+async def test_concurrent_publishes_are_spread_over_all_channels(connection: FakeConnection):
+    pool = PublishChannelPool(connection, 4, True)  # type: ignore[arg-type]
+
+    await asyncio.gather(*(pool.publish("command", Message(b"")) for _ in range(8)))
+
+    assert [len(channel.published) for channel in connection.channels] == [2, 2, 2, 2]
+    assert pool.info().in_flight == 0
+
+async def test_publish_replaces_broken_channel_and_retries(connection: FakeConnection):
+    pool = PublishChannelPool(connection, 1, True)  # type: ignore[arg-type]
+    await pool.publish("command", Message(b""))
+    connection.channels[0].is_broken = True
+
+    await pool.publish("command", Message(b""))
+
+    assert connection.channels[0].is_closed
+    assert connection.channels[1].published == ["command"]
+    assert pool.info().replaced_channels == 1
\ No newline at end of file
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+# Rabbit dependencies are not installed with the tests of every service
+pytest.importorskip("aio_pika")
+pytest.importorskip("faststream")
+
+from aio_pika import Message
+from expression import Result
+
+from infrastructure.rabbitmq.broker import Error as BrokerError
+from infrastructure.rabbitmq.client import Error, RabbitMQClient
+
+class BrokerWithSlowConfirms:
+    def __init__(self, known_routing_keys: set[str]):
+        self._known_routing_keys = known_routing_keys
+        self.num_of_unconfirmed = 0
+        self.max_num_of_unconfirmed = 0
+    
+    async def publish_to_default_exchange(self, routing_key: str, message: Message):
+        self.num_of_unconfirmed += 1
+        self.max_num_of_unconfirmed = max(self.max_num_of_unconfirmed, self.num_of_unconfirmed)
+        await asyncio.sleep(0.01)
+        self.num_of_unconfirmed -= 1
+        if routing_key not in self._known_routing_keys:
+            return Result.Error(BrokerError.RouteNotFound(routing_key))
+        if routing_key == "failing_command":
+            raise RuntimeError("Channel closed")
+        return Result.Ok(None)
+
+async def test_send_commands_returns_result_of_every_command_in_order():
+    broker = BrokerWithSlowConfirms({"command", "failing_command"})
+    client = RabbitMQClient(broker)  # type: ignore[arg-type]
+    commands = [("command", Message(b"1")), ("unknown_command", Message(b"2")), ("failing_command", Message(b"3"))]
+
+    results = await client.send_commands(commands)
+
+    assert results[0] == Result.Ok(None)
+    assert results[1] == Result.Error(Error.CommandRecipientNotFound("unknown_command"))
+    assert isinstance(results[2].error, Error.UnexpectedError)
+
+async def test_send_commands_keeps_limited_number_of_commands_in_flight():
+    broker = BrokerWithSlowConfirms({"command"})
+    client = RabbitMQClient(broker, max_unconfirmed_publishes=10)  # type: ignore[arg-type]
+
+    results = await client.send_commands([("command", Message(str(i).encode())) for i in range(100)])
+
+    assert results == [Result.Ok(None)] * 100
+    assert broker.max_num_of_unconfirmed == 10
\ No newline at end of file
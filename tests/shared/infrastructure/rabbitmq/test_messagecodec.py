@@ -0,0 +1,112 @@
+from typing import Any
+
+import pytest
+
+# Rabbit dependencies are not installed with the tests of every service
+pytest.importorskip("aio_pika")
+pytest.importorskip("faststream")
+
+from aio_pika import DeliveryMode
+from expression import Result
+from faststream.rabbit import RabbitBroker, RabbitMessage, TestRabbitBroker
+
+from infrastructure.rabbitmq.messagecodec import CONTENT_ENCODING_HEADER, CompactJsonCodec, MessageCodec, MessageCompression, PythonPickleCodec, get_codec
+from infrastructure.rabbitmq.rabbitrunaction import _codec_message, handler
+from shared.action import MessageDurability
+from shared.pipeline.actionhandler import ActionInput
+
+@pytest.fixture
+def action_input():
+    return ActionInput("run_id", "step_id", {"url": "http://localhost", "http_method": "GET"}, {"task_id": "task_id", "attempt": 1})
+
+def to_rabbit_message(codec: MessageCodec, action_input: ActionInput):
+    message = _codec_message.data_to_message(codec, action_input)
+    return RabbitMessage(raw_message=None, body=message.body, content_type=message.content_type, correlation_id=message.correlation_id)
+
+@pytest.mark.parametrize("codec", [PythonPickleCodec(), CompactJsonCodec()])
+def test_decoder_accepts_message_of_any_supported_codec(codec: MessageCodec, action_input: ActionInput):
+    rabbit_message = to_rabbit_message(codec, action_input)
+
+    decoded_res = _codec_message.decoder("test_action")(rabbit_message)
+
+    assert decoded_res.ok == action_input
+
+def test_decoder_returns_error_for_unsupported_content_type(action_input: ActionInput):
+    rabbit_message = to_rabbit_message(CompactJsonCodec(), action_input)
+    rabbit_message.content_type = "application/xml"
+
+    decoded_res = _codec_message.decoder("test_action")(rabbit_message)
+
+    assert decoded_res.is_error()
+
+def test_get_codec_treats_message_without_content_type_as_python_pickle():
+    assert isinstance(get_codec(None), PythonPickleCodec)
+
+def test_msgpack_codec_round_trip(action_input: ActionInput):
+    pytest.importorskip("msgpack")
+    codec = get_codec("application/msgpack")
+    assert codec is not None
+    rabbit_message = to_rabbit_message(codec, action_input)
+
+    decoded_res = _codec_message.decoder("test_action")(rabbit_message)
+
+    assert decoded_res.ok == action_input
+
+def test_message_headers_contain_ids(action_input: ActionInput):
+    message = _codec_message.data_to_message(CompactJsonCodec(), action_input)
+
+    assert message.headers == {"task_id": "task_id", "run_id": "run_id", "step_id": "step_id"}
+
+
+@pytest.mark.parametrize("durability, delivery_mode", [(MessageDurability.PERSISTENT, DeliveryMode.PERSISTENT), (MessageDurability.TRANSIENT, DeliveryMode.NOT_PERSISTENT)])
+def test_message_delivery_mode_matches_durability(durability: MessageDurability, delivery_mode: DeliveryMode, action_input: ActionInput):
+    message = _codec_message.data_to_message(CompactJsonCodec(), action_input, durability)
+
+    assert message.delivery_mode == delivery_mode
+
+def test_decoder_accepts_compressed_message(action_input: ActionInput):
+    action_input.data["content"] = "<html></html>" * 1000
+    message = _codec_message.data_to_message(CompactJsonCodec(), action_input, compression=MessageCompression(threshold=1024))
+    rabbit_message = RabbitMessage(raw_message=None, body=message.body, headers=message.headers, content_type=message.content_type, correlation_id=message.correlation_id)
+
+    decoded_res = _codec_message.decoder("test_action")(rabbit_message)
+
+    assert message.headers is not None and message.headers[CONTENT_ENCODING_HEADER] == "deflate"
+    assert message.content_encoding == "deflate"
+    assert len(message.body) < 1024
+    assert decoded_res.ok == action_input
+
+def test_message_below_compression_threshold_is_not_compressed(action_input: ActionInput):
+    message = _codec_message.data_to_message(CompactJsonCodec(), action_input, compression=MessageCompression(threshold=1024))
+
+    assert message.headers is not None and CONTENT_ENCODING_HEADER not in message.headers
+    assert message.content_encoding is None
+
+def test_decoder_returns_error_for_unsupported_content_encoding(action_input: ActionInput):
+    message = _codec_message.data_to_message(CompactJsonCodec(), action_input)
+    rabbit_message = RabbitMessage(raw_message=None, body=message.body, headers={CONTENT_ENCODING_HEADER: "br"}, content_type=message.content_type, correlation_id=message.correlation_id)
+
+    decoded_res = _codec_message.decoder("test_action")(rabbit_message)
+
+    assert decoded_res.is_error()
+
+class RabbitMQClientWithoutQueueCheck:
+    def __init__(self, broker: RabbitBroker):
+        self._broker = broker
+    
+    def command_handler(self, command: str, message_decoder, middlewares=(), prefetch_count=None, max_concurrency=None, retry_policy=None):
+        return self._broker.subscriber(command, decoder=message_decoder, no_reply=True, middlewares=middlewares)
+
+async def test_handler_receives_decoded_action_input(action_input: ActionInput):
+    broker = RabbitBroker()
+    received = []
+    async def handle_action(action_input_res: Result[ActionInput, Any]):
+        received.append(action_input_res)
+        return Result.Ok(None)
+    handler(RabbitMQClientWithoutQueueCheck(broker), "test_action")(handle_action)  # type: ignore[arg-type]
+    message = _codec_message.data_to_message(CompactJsonCodec(), action_input)
+
+    async with TestRabbitBroker(broker) as test_broker:
+        await test_broker.publish(message.body, "test_action", headers=message.headers, content_type=message.content_type, correlation_id=message.correlation_id)
+
+    assert received == [Result.Ok(action_input)]
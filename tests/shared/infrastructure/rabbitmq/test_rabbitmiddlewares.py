@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+# Rabbit dependencies are not installed with the tests of every service
+pytest.importorskip("aio_pika")
+pytest.importorskip("faststream")
+
+from aio_pika import DeliveryMode, Message
+from expression import Result
+from faststream.exceptions import NackMessage
+from faststream.rabbit import RabbitMessage
+
+from infrastructure.rabbitmq.rabbitmiddlewares import ATTEMPT_HEADER, CommandHandlerMetrics, CommandHandlerMetricsLogger, RetryPolicy, concurrency_limit_middleware, error_result_to_delayed_retry_middleware
+
+class SlowHandler:
+    def __init__(self):
+        self.num_of_running = 0
+        self.max_num_of_running = 0
+
+    async def __call__(self, msg):
+        self.num_of_running += 1
+        self.max_num_of_running = max(self.max_num_of_running, self.num_of_running)
+        await asyncio.sleep(0.01)
+        self.num_of_running -= 1
+        if msg == "failing_msg":
+            raise RuntimeError("Handler failed")
+        return msg
+
+async def test_concurrency_limit_keeps_limited_number_of_handlers_running():
+    metrics = CommandHandlerMetrics()
+    middleware = concurrency_limit_middleware(metrics, max_concurrency=3)
+    handler = SlowHandler()
+
+    results = await asyncio.gather(*(middleware(handler, i) for i in range(10)))  # type: ignore[arg-type]
+
+    assert results == list(range(10))
+    assert handler.max_num_of_running == 3
+
+async def test_concurrency_limit_counts_queued_and_in_flight_messages():
+    metrics = CommandHandlerMetrics()
+    middleware = concurrency_limit_middleware(metrics, max_concurrency=2)
+    handlers = [asyncio.create_task(middleware(SlowHandler(), i)) for i in range(5)]  # type: ignore[arg-type]
+    await asyncio.sleep(0)
+
+    assert (metrics.in_flight, metrics.queued) == (2, 3)
+    await asyncio.gather(*handlers)
+    assert (metrics.in_flight, metrics.queued, metrics.processed) == (0, 0, 5)
+    assert metrics.max_processing_time >= metrics.avg_processing_time > 0
+
+async def test_concurrency_limit_releases_slot_when_handler_fails():
+    metrics = CommandHandlerMetrics()
+    middleware = concurrency_limit_middleware(metrics, max_concurrency=1)
+    handler = SlowHandler()
+
+    with pytest.raises(RuntimeError):
+        await middleware(handler, "failing_msg")  # type: ignore[arg-type]
+    result = await asyncio.wait_for(middleware(handler, "msg"), timeout=1)  # type: ignore[arg-type]
+
+    assert result == "msg"
+    assert metrics.processed == 2
+
+async def test_no_concurrency_limit_only_collects_metrics():
+    metrics = CommandHandlerMetrics()
+    middleware = concurrency_limit_middleware(metrics)
+    handler = SlowHandler()
+
+    await asyncio.gather(*(middleware(handler, i) for i in range(10)))  # type: ignore[arg-type]
+
+    assert handler.max_num_of_running == 10
+    assert metrics.processed == 10
+
+async def test_metrics_logger_logs_metrics_periodically_and_on_stop():
+    num_of_logs = 0
+    def log_metrics():
+        nonlocal num_of_logs
+        num_of_logs += 1
+    metrics_logger = CommandHandlerMetricsLogger(log_metrics, interval=0.01)
+
+    await metrics_logger.start()
+    await asyncio.sleep(0.035)
+    num_of_periodic_logs = num_of_logs
+    await metrics_logger.stop()
+
+    assert num_of_periodic_logs >= 2
+    assert num_of_logs == num_of_periodic_logs + 1
+
+class PublishedMessages:
+    def __init__(self, publish_res: Result = Result.Ok(None)):
+        self._publish_res = publish_res
+        self.messages: list[tuple[str, Message]] = []
+
+    async def __call__(self, routing_key: str, message: Message):
+        self.messages.append((routing_key, message))
+        return self._publish_res
+
+def create_message(attempt: int | None = None, delivery_mode: DeliveryMode | None = None):
+    headers = {"run_id": "run_id"} | ({ATTEMPT_HEADER: attempt} if attempt is not None else {})
+    raw_message = Message(b"data", headers=headers, delivery_mode=delivery_mode) if delivery_mode is not None else None
+    return RabbitMessage(raw_message=raw_message, body=b"data", headers=headers, content_type="application/json", correlation_id="run_id")
+
+async def failing_handler(msg):
+    return Result.Error("Storage is not available")
+
+def test_retry_policy_delays_grow_exponentially_up_to_max_delay():
+    retry_policy = RetryPolicy(max_attempts=6, base_delay=1.0, multiplier=2.0, max_delay=10.0)
+
+    assert retry_policy.delays_ms() == (1000, 2000, 4000, 8000, 10000)
+
+async def test_failed_command_is_published_to_retry_queue_of_its_attempt():
+    published = PublishedMessages()
+    middleware = error_result_to_delayed_retry_middleware("command", RetryPolicy(max_attempts=5, base_delay=1.0), published)
+
+    res = await middleware(failing_handler, create_message(attempt=2))
+
+    assert res == Result.Error("Storage is not available")
+    [(routing_key, message)] = published.messages
+    assert routing_key == "command.retry.2000ms"
+    assert message.body == b"data"
+    assert message.correlation_id == "run_id"
+    assert message.headers is not None and message.headers["run_id"] == "run_id"
+    assert message.headers is not None and message.headers[ATTEMPT_HEADER] == 3
+
+async def test_command_failed_max_attempts_times_is_published_to_dead_letter_queue():
+    published = PublishedMessages()
+    middleware = error_result_to_delayed_retry_middleware("command", RetryPolicy(max_attempts=3), published)
+
+    await middleware(failing_handler, create_message(attempt=3))
+
+    assert [routing_key for routing_key, _ in published.messages] == ["command.dead"]
+
+@pytest.mark.parametrize("delivery_mode", [DeliveryMode.PERSISTENT, DeliveryMode.NOT_PERSISTENT])
+async def test_failed_command_is_published_with_its_delivery_mode(delivery_mode: DeliveryMode):
+    published = PublishedMessages()
+    middleware = error_result_to_delayed_retry_middleware("command", RetryPolicy(), published)
+
+    await middleware(failing_handler, create_message(delivery_mode=delivery_mode))
+
+    [(_, message)] = published.messages
+    assert message.delivery_mode == delivery_mode
+
+async def test_successful_command_is_not_published():
+    published = PublishedMessages()
+    middleware = error_result_to_delayed_retry_middleware("command", RetryPolicy(), published)
+    async def handler(msg):
+        return Result.Ok(None)
+
+    res = await middleware(handler, create_message())
+
+    assert res == Result.Ok(None)
+    assert published.messages == []
+
+async def test_failed_command_is_requeued_when_retry_publish_fails():
+    published = PublishedMessages(Result.Error("Route not found"))
+    middleware = error_result_to_delayed_retry_middleware("command", RetryPolicy(), published)
+
+    with pytest.raises(NackMessage):
+        await middleware(failing_handler, create_message())
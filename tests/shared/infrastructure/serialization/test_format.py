@@ -0,0 +1,34 @@
+import pytest
+
+from shared.infrastructure.serialization.format import SerializationFormat, create_serializer
+
+sample_dto = {"name": "Bob", "age": 42, "tags": ["a", "b"], "address": None}
+
+@pytest.mark.parametrize("value, expected", [("json", SerializationFormat.JSON), (" ORJSON ", SerializationFormat.ORJSON), ("MsgPack", SerializationFormat.MSGPACK), ("yaml", None)])
+def test_parse(value: str, expected: SerializationFormat | None):
+    assert SerializationFormat.parse(value) == expected
+
+def test_json_serializer_deserializes_str_and_bytes():
+    serializer = create_serializer(SerializationFormat.JSON)
+    data = serializer.serialize(sample_dto)
+
+    assert isinstance(data, str)
+    assert serializer.deserialize(data) == sample_dto
+    assert serializer.deserialize(data.encode()) == sample_dto
+
+def test_orjson_serializer_is_compatible_with_json_serializer():
+    pytest.importorskip("orjson")
+    json_serializer = create_serializer(SerializationFormat.JSON)
+    orjson_serializer = create_serializer(SerializationFormat.ORJSON)
+
+    assert orjson_serializer.deserialize(orjson_serializer.serialize(sample_dto)) == sample_dto
+    assert orjson_serializer.deserialize(json_serializer.serialize(sample_dto)) == sample_dto
+    assert json_serializer.deserialize(orjson_serializer.serialize(sample_dto)) == sample_dto
+
+def test_msgpack_serializer_round_trip():
+    pytest.importorskip("msgpack")
+    serializer = create_serializer(SerializationFormat.MSGPACK)
+    data = serializer.serialize(sample_dto)
+
+    assert isinstance(data, bytes)
+    assert serializer.deserialize(data) == sample_dto
\ No newline at end of file
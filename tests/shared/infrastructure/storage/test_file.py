@@ -1,3 +1,4 @@
+import asyncio
 from collections.abc import Generator
 from enum import StrEnum
 import os
@@ -170,3 +171,36 @@ async def test_delete_does_not_raise_error_for_not_existing_item(file_storage: F
     id = IdValue.new_id()
     
     await file_storage.delete(id)
+
+
+
+async def test_concurrent_adds_of_same_item_only_one_succeeds(file_storage: File, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+
+    results = await asyncio.gather(*(file_storage.add(id, sample_domain) for _ in range(10)), return_exceptions=True)
+
+    assert results.count(None) == 1
+    assert all(isinstance(res, AlreadyExistsException) for res in results if res is not None)
+
+
+
+async def test_get_while_updating_returns_whole_item(file_storage: File, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await file_storage.add(id, sample_domain)
+    updated_items = [SampleDomain(first_name, last_name) for first_name in SampleFirstName for last_name in SampleLastName]
+
+    updates = asyncio.gather(*(file_storage.update(id, item) for item in updated_items))
+    items = await asyncio.gather(*(file_storage.get(id) for _ in updated_items))
+    await updates
+
+    assert all(item == sample_domain or item in updated_items for item in items)
+
+
+
+async def test_update_does_not_leave_temp_files(file_storage: File, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await file_storage.add(id, sample_domain)
+
+    await file_storage.update(id, SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON))
+
+    assert not any(file_name.startswith(f"{id}.") and file_name.endswith(".tmp") for file_name in os.listdir(file_storage._folder_path))
@@ -0,0 +1,223 @@
+import os
+
+import aiofiles
+import pytest
+
+from infrastructure.persistence.filesystem import fileeventlog
+from shared.customtypes import IdValue
+from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.storage.repository import AlreadyExistsException
+
+import config
+
+class SampleJournal:
+    def __init__(self, *events: str):
+        self.events = list(events)
+
+    def __eq__(self, other):
+        if not isinstance(other, SampleJournal):
+            return NotImplemented
+        return self.events == other.events
+
+class SampleJournalAdapter:
+    @staticmethod
+    def to_list(journal: SampleJournal) -> list[dict]:
+        return [{"name": evt} for evt in journal.events]
+
+    @staticmethod
+    def from_list(data: list[dict]) -> SampleJournal:
+        return SampleJournal(*(evt["name"] for evt in data))
+
+FileEventLog = fileeventlog.FileEventLog[IdValue, SampleJournal, dict]
+
+@pytest.fixture(scope="module")
+def folder_path():
+    return os.path.join(config.STORAGE_ROOT_FOLDER, "test_fileeventlog")
+
+def create_file_event_log(folder_path: str):
+    return FileEventLog(
+        SampleJournal.__name__,
+        SampleJournalAdapter.to_list,
+        SampleJournalAdapter.from_list,
+        JsonSerializer[dict](),
+        "jsonl",
+        folder_path
+    )
+
+@pytest.fixture(scope="module")
+def file_event_log(folder_path: str):
+    return create_file_event_log(folder_path)
+
+@pytest.fixture(scope="module")
+def another_file_event_log(folder_path: str):
+    return create_file_event_log(folder_path)
+
+async def test_get_returns_added_item_with_version_1(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a", "b"))
+
+    item_with_ver = await file_event_log.get(id)
+
+    assert item_with_ver == (1, SampleJournal("a", "b"))
+
+async def test_add_raises_error_for_existing_item(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    with pytest.raises(AlreadyExistsException) as ex_info:
+        await file_event_log.add(id, SampleJournal("b"))
+    assert ex_info.value.args[0] == id
+
+async def test_get_returns_none_when_id_does_not_exist(file_event_log: FileEventLog):
+    item_with_ver = await file_event_log.get(IdValue.new_id())
+    assert item_with_ver is None
+
+async def test_update_returns_all_events_with_incremented_version(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+
+    updated2 = await file_event_log.update(id, 1, SampleJournal("a", "b"))
+    updated3 = await file_event_log.update(id, 2, SampleJournal("a", "b", "c"))
+    item_with_ver = await file_event_log.get(id)
+
+    assert updated2 and updated3
+    assert item_with_ver == (3, SampleJournal("a", "b", "c"))
+
+async def test_update_appends_only_new_events(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    await file_event_log.update(id, 1, SampleJournal("a", "b"))
+
+    async with aiofiles.open(file_event_log._file_path(id), mode='r') as f:
+        lines = (await f.read()).splitlines()
+
+    assert len(lines) == 2
+    assert '"a"' not in lines[1]
+
+async def test_update_returns_false_when_not_recent_version(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    await file_event_log.update(id, 1, SampleJournal("a", "b"))
+
+    updated = await file_event_log.update(id, 1, SampleJournal("a", "c"))
+    item_with_ver = await file_event_log.get(id)
+
+    assert not updated
+    assert item_with_ver == (2, SampleJournal("a", "b"))
+
+async def test_update_returns_false_when_updated_by_another_writer(file_event_log: FileEventLog, another_file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    await another_file_event_log.get(id)
+    await file_event_log.update(id, 1, SampleJournal("a", "b"))
+
+    updated = await another_file_event_log.update(id, 1, SampleJournal("a", "c"))
+    item_with_ver = await another_file_event_log.get(id)
+
+    assert not updated
+    assert item_with_ver == (2, SampleJournal("a", "b"))
+
+async def test_update_returns_false_when_not_existing_id(file_event_log: FileEventLog):
+    updated = await file_event_log.update(IdValue.new_id(), 1, SampleJournal("a"))
+    assert not updated
+
+async def test_get_ignores_torn_and_duplicate_records(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    async with aiofiles.open(file_event_log._file_path(id), mode='a') as f:
+        await f.write('{"ver": 2, "token": "t1", "events": [{"name": "b"}]}\n')
+        await f.write('{"ver": 2, "token": "t2", "events": [{"name": "c"}]}\n')
+        await f.write('{"ver": 3, "tok')
+
+    item_with_ver = await file_event_log.get(id)
+
+    assert item_with_ver == (2, SampleJournal("a", "b"))
+
+async def test_update_after_torn_record(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    async with aiofiles.open(file_event_log._file_path(id), mode='a') as f:
+        await f.write('{"ver": 2, "tok')
+
+    first_updated = await file_event_log.update(id, 1, SampleJournal("a", "b"))
+    second_updated = await file_event_log.update(id, 1, SampleJournal("a", "b"))
+    item_with_ver = await file_event_log.get(id)
+
+    assert not first_updated
+    assert second_updated
+    assert item_with_ver == (2, SampleJournal("a", "b"))
+
+async def test_delete_existing_item(file_event_log: FileEventLog):
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+
+    await file_event_log.delete(id)
+    item_with_ver = await file_event_log.get(id)
+    updated = await file_event_log.update(id, 1, SampleJournal("a", "b"))
+
+    assert item_with_ver is None
+    assert not updated
+    assert not os.path.exists(file_event_log._file_path(id))
+
+async def test_delete_does_not_raise_error_for_not_existing_item(file_event_log: FileEventLog):
+    await file_event_log.delete(IdValue.new_id())
+
+def create_file_event_log_with_snapshots(folder_path: str):
+    return FileEventLog(
+        SampleJournal.__name__,
+        SampleJournalAdapter.to_list,
+        SampleJournalAdapter.from_list,
+        JsonSerializer[dict](),
+        "jsonl",
+        folder_path,
+        is_snapshot=lambda dto: dto["name"].startswith("snapshot")
+    )
+
+async def test_get_returns_events_from_last_snapshot(folder_path: str):
+    file_event_log = create_file_event_log_with_snapshots(folder_path)
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a", "snapshot1", "b"))
+    await file_event_log.update(id, 1, SampleJournal("a", "snapshot1", "b", "c", "snapshot2", "d"))
+
+    item_with_ver = await file_event_log.get(id)
+
+    assert item_with_ver == (2, SampleJournal("snapshot2", "d"))
+
+async def test_update_of_item_restored_from_snapshot_appends_only_new_events(folder_path: str):
+    file_event_log = create_file_event_log_with_snapshots(folder_path)
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    await file_event_log.update(id, 1, SampleJournal("a", "snapshot1", "b"))
+    _, journal = await file_event_log.get(id) or (0, SampleJournal())
+
+    updated = await file_event_log.update(id, 2, SampleJournal(*journal.events, "c"))
+    item_with_ver = await create_file_event_log_with_snapshots(folder_path).get(id)
+
+    assert updated
+    assert item_with_ver == (3, SampleJournal("snapshot1", "b", "c"))
+
+async def test_get_reads_log_from_cached_snapshot_record(folder_path: str):
+    file_event_log = create_file_event_log_with_snapshots(folder_path)
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    await file_event_log.update(id, 1, SampleJournal("a", "snapshot1"))
+    # Records before snapshot are not read anymore
+    async with aiofiles.open(file_event_log._file_path(id), mode='r+b') as f:
+        await f.write(b"x")
+
+    item_with_ver = await file_event_log.get(id)
+
+    assert item_with_ver == (2, SampleJournal("snapshot1"))
+
+async def test_get_replays_whole_log_added_again_after_snapshot_record_was_cached(folder_path: str):
+    file_event_log = create_file_event_log_with_snapshots(folder_path)
+    another_file_event_log = create_file_event_log_with_snapshots(folder_path)
+    id = IdValue.new_id()
+    await file_event_log.add(id, SampleJournal("a"))
+    await file_event_log.update(id, 1, SampleJournal("a", "snapshot1"))
+    await another_file_event_log.delete(id)
+    await another_file_event_log.add(id, SampleJournal("b"))
+    await another_file_event_log.update(id, 1, SampleJournal("b", "c"))
+
+    item_with_ver = await file_event_log.get(id)
+
+    assert item_with_ver == (2, SampleJournal("b", "c"))
@@ -7,7 +7,8 @@ import aiofiles.os as aos
 from expression import Result, effect
 import pytest
 
-from infrastructure.persistence.filesystem import filewithversion
+from infrastructure.persistence.filesystem import filewithversion, filewithversionlimited
+from infrastructure.persistence.filesystem.atomicwrite import Durability
 from shared.customtypes import IdValue
 from shared.infrastructure.serialization.json import JsonSerializer
 from shared.infrastructure.storage.repository import AlreadyExistsException
@@ -82,6 +83,7 @@ class SampleDomainAdapter:
         return {"first_name": domain.first_name.value, "last_name": domain.last_name.value}
     
 FileWithVersion = filewithversion.FileWithVersion[IdValue, SampleDomain, dict]
+FileWithVersionLimited = filewithversionlimited.FileWithVersionLimited[IdValue, SampleDomain, dict]
 
 # @pytest_asyncio.fixture(autouse=True, loop_scope="module", scope="module")
 @pytest.fixture(autouse=True, scope="module")
@@ -287,4 +289,163 @@ async def test_update_returns_false_when_empty_id_folder_exists(file_with_versio
 
     actual_updated = await file_with_version_storage.update(id, 1, sample_domain)
 
-    assert actual_updated is False
\ No newline at end of file
+    assert actual_updated is False
+
+@pytest.fixture(scope="module")
+def cached_file_with_version_storage():
+    folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "test_filewithversion")
+    file_with_ver = FileWithVersion(
+        SampleDomain.__name__,
+        SampleDomainAdapter.to_dict,
+        SampleDomainAdapter.from_dict,
+        JsonSerializer[dict](),
+        "json",
+        folder_path,
+        cache_max_size=10
+    )
+    return file_with_ver
+
+async def test_cached_get_after_add_is_cache_hit(cached_file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await cached_file_with_version_storage.add(id, sample_domain)
+    hits_before = cached_file_with_version_storage.cache_info().hits
+
+    item_with_ver = await cached_file_with_version_storage.get(id)
+
+    assert item_with_ver == (1, sample_domain)
+    assert cached_file_with_version_storage.cache_info().hits == hits_before + 1
+
+async def test_cached_get_returns_new_item_instance(cached_file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await cached_file_with_version_storage.add(id, sample_domain)
+    item_with_ver_1 = await cached_file_with_version_storage.get(id)
+    assert item_with_ver_1 is not None
+    item_with_ver_1[1].first_name = SampleFirstName.JOHN
+
+    item_with_ver_2 = await cached_file_with_version_storage.get(id)
+
+    assert item_with_ver_2 == (1, sample_domain)
+
+async def test_cached_get_returns_updated_item(cached_file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await cached_file_with_version_storage.add(id, sample_domain)
+    updated_sample_domain = SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON)
+    await cached_file_with_version_storage.update(id, 1, updated_sample_domain)
+
+    item_with_ver = await cached_file_with_version_storage.get(id)
+
+    assert item_with_ver == (2, updated_sample_domain)
+
+async def test_cached_get_returns_item_updated_by_another_writer_after_failed_update(file_with_version_storage: FileWithVersion, cached_file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await cached_file_with_version_storage.add(id, sample_domain)
+    updated_sample_domain2 = SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON)
+    await file_with_version_storage.update(id, 1, updated_sample_domain2)
+    updated_sample_domain3 = SampleDomain(SampleFirstName.JOHN, SampleLastName.BLACK)
+    updated = await cached_file_with_version_storage.update(id, 1, updated_sample_domain3)
+    assert not updated
+
+    item_with_ver = await cached_file_with_version_storage.get(id)
+
+    assert item_with_ver == (2, updated_sample_domain2)
+
+async def test_cached_get_returns_none_after_delete(cached_file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await cached_file_with_version_storage.add(id, sample_domain)
+    await cached_file_with_version_storage.delete(id)
+
+    item_with_ver = await cached_file_with_version_storage.get(id)
+
+    assert item_with_ver is None
+
+def test_cache_info_is_empty_when_cache_disabled(file_with_version_storage: FileWithVersion):
+    assert file_with_version_storage.cache_info() == (0, 0, 0, 0)
+
+async def test_get_ignores_temp_file_of_write_in_progress(file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await file_with_version_storage.add(id, sample_domain)
+    temp_file_path = os.path.join(file_with_version_storage._folder_path, str(id), ".2.json.0123456789.tmp")
+    with open(temp_file_path, mode='w') as f:
+        f.write('{"first_name": "Al')
+
+    item_with_ver = await file_with_version_storage.get(id)
+
+    assert item_with_ver == (1, sample_domain)
+
+async def test_add_and_update_do_not_leave_temp_files(file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    id = IdValue.new_id()
+    await file_with_version_storage.add(id, sample_domain)
+    await file_with_version_storage.update(id, 1, SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON))
+    await file_with_version_storage.update(id, 1, SampleDomain(SampleFirstName.JOHN, SampleLastName.BLACK))
+
+    all_files = os.listdir(os.path.join(file_with_version_storage._folder_path, str(id)))
+
+    assert sorted(all_files) == ["1.json", "2.json"]
+
+@pytest.mark.parametrize("durability", list(Durability))
+async def test_update_item_with_durability(durability: Durability, sample_domain: SampleDomain):
+    folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "test_filewithversion_durability")
+    file_with_ver = FileWithVersion(
+        SampleDomain.__name__,
+        SampleDomainAdapter.to_dict,
+        SampleDomainAdapter.from_dict,
+        JsonSerializer[dict](),
+        "json",
+        folder_path,
+        durability=durability
+    )
+    id = IdValue.new_id()
+    updated_sample_domain = SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON)
+    await file_with_ver.add(id, sample_domain)
+
+    updated = await file_with_ver.update(id, 1, updated_sample_domain)
+    item_with_ver = await file_with_ver.get(id)
+
+    assert updated
+    assert item_with_ver == (2, updated_sample_domain)
+
+async def test_get_returns_versions_added_by_another_writer_after_known_version(file_with_version_storage: FileWithVersion, sample_domain: SampleDomain):
+    folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "test_filewithversion")
+    another_file_with_ver = FileWithVersion(SampleDomain.__name__, SampleDomainAdapter.to_dict, SampleDomainAdapter.from_dict, JsonSerializer[dict](), "json", folder_path)
+    id = IdValue.new_id()
+    await file_with_version_storage.add(id, sample_domain)
+    await file_with_version_storage.get(id)
+    updated_sample_domain3 = SampleDomain(SampleFirstName.JOHN, SampleLastName.BLACK)
+    await another_file_with_ver.update(id, 1, SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON))
+    await another_file_with_ver.update(id, 2, updated_sample_domain3)
+
+    item_with_ver = await file_with_version_storage.get(id)
+
+    assert item_with_ver == (3, updated_sample_domain3)
+
+async def test_get_returns_latest_version_when_known_version_is_removed(sample_domain: SampleDomain):
+    folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "test_filewithversion_limited")
+    file_with_ver = FileWithVersionLimited(SampleDomain.__name__, SampleDomainAdapter.to_dict, SampleDomainAdapter.from_dict, JsonSerializer[dict](), "json", folder_path, 1)
+    another_file_with_ver = FileWithVersionLimited(SampleDomain.__name__, SampleDomainAdapter.to_dict, SampleDomainAdapter.from_dict, JsonSerializer[dict](), "json", folder_path, 1)
+    id = IdValue.new_id()
+    await file_with_ver.add(id, sample_domain)
+    updated_sample_domain3 = SampleDomain(SampleFirstName.JOHN, SampleLastName.BLACK)
+    await another_file_with_ver.update(id, 1, SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON))
+    await another_file_with_ver.update(id, 2, updated_sample_domain3)
+
+    item_with_ver = await file_with_ver.get(id)
+
+    assert item_with_ver == (3, updated_sample_domain3)
+
+class BytesJsonSerializer(JsonSerializer[dict]):
+    def serialize(self, obj: dict) -> bytes:
+        return super().serialize(obj).encode()
+
+async def test_update_item_with_bytes_serializer(sample_domain: SampleDomain):
+    folder_path = os.path.join(config.STORAGE_ROOT_FOLDER, "test_filewithversion_bytes")
+    file_with_ver = FileWithVersion(SampleDomain.__name__, SampleDomainAdapter.to_dict, SampleDomainAdapter.from_dict, BytesJsonSerializer(), "json", folder_path, cache_max_size=10)
+    another_file_with_ver = FileWithVersion(SampleDomain.__name__, SampleDomainAdapter.to_dict, SampleDomainAdapter.from_dict, BytesJsonSerializer(), "json", folder_path)
+    id = IdValue.new_id()
+    updated_sample_domain = SampleDomain(SampleFirstName.ALICE, SampleLastName.JOHNSON)
+    await file_with_ver.add(id, sample_domain)
+
+    updated = await file_with_ver.update(id, 1, updated_sample_domain)
+
+    assert updated
+    assert await file_with_ver.get(id) == (2, updated_sample_domain)
+    assert await another_file_with_ver.get(id) == (2, updated_sample_domain)
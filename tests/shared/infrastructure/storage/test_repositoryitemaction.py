@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from shared.infrastructure.storage.repository import AlreadyExistsException, AsyncRepositoryWithVersion, ContentionException
+from shared.infrastructure.storage.repositoryitemaction import ItemActionInAsyncRepositoryWithVersion
+
+class AsyncInMemoryWithVersion(AsyncRepositoryWithVersion[str, list[str]]):
+    def __init__(self):
+        self._items: dict[str, tuple[int, list[str]]] = {}
+    
+    async def get(self, id: str):
+        await asyncio.sleep(0)
+        opt_item_with_ver = self._items.get(id)
+        return (opt_item_with_ver[0], list(opt_item_with_ver[1])) if opt_item_with_ver is not None else None
+    
+    async def add(self, id: str, item: list[str]):
+        await asyncio.sleep(0)
+        if id in self._items:
+            raise AlreadyExistsException(id)
+        self._items[id] = (1, list(item))
+    
+    async def update(self, id: str, ver: int, item: list[str]):
+        await asyncio.sleep(0)
+        if id not in self._items or self._items[id][0] != ver:
+            return False
+        self._items[id] = (ver + 1, list(item))
+        return True
+    
+    async def delete(self, id: str):
+        self._items.pop(id, None)
+
+def append_value(item: list[str] | None, value: str):
+    updated_item = (item or []) + [value]
+    return len(updated_item), updated_item
+
+@pytest.fixture
+def repository():
+    return AsyncInMemoryWithVersion()
+
+async def test_get_many_returns_items_in_order_of_ids(repository: AsyncInMemoryWithVersion):
+    await repository.add("a", ["1"])
+    await repository.add("b", ["2"])
+
+    items_with_ver = await repository.get_many(["b", "c", "a"])
+
+    assert items_with_ver == [(1, ["2"]), None, (1, ["1"])]
+
+class AlwaysConflictingInMemoryWithVersion(AsyncInMemoryWithVersion):
+    async def update(self, id: str, ver: int, item: list[str]):
+        await super().update(id, ver, item)
+        return False
+
+async def test_call_retries_update_of_item_changed_meanwhile(repository: AsyncInMemoryWithVersion):
+    await repository.add("a", ["1"])
+    item_action = ItemActionInAsyncRepositoryWithVersion(repository, base_delay=0)
+
+    results = await asyncio.gather(*(item_action(append_value)("a", str(i)) for i in range(5)))
+
+    ver, item = await repository.get("a")
+    assert sorted(results) == [2, 3, 4, 5, 6]
+    assert ver == 6
+    assert sorted(item) == ["0", "1", "1", "2", "3", "4"]
+    assert item_action.conflicts > 0
+
+async def test_call_raises_contention_exception_when_attempts_run_out():
+    repository = AlwaysConflictingInMemoryWithVersion()
+    await repository.add("a", ["1"])
+    item_action = ItemActionInAsyncRepositoryWithVersion(repository, max_attempts=3, base_delay=0)
+
+    with pytest.raises(ContentionException) as ex_info:
+        await item_action(append_value)("a", "2")
+
+    assert ex_info.value.args == ("a", 3)
+    assert item_action.conflicts == 3
+
+class CountingInMemoryWithVersion(AsyncInMemoryWithVersion):
+    def __init__(self):
+        super().__init__()
+        self.num_of_writes = 0
+    
+    async def add(self, id: str, item: list[str]):
+        self.num_of_writes += 1
+        await super().add(id, item)
+    
+    async def update(self, id: str, ver: int, item: list[str]):
+        self.num_of_writes += 1
+        return await super().update(id, ver, item)
+
+def append_value_or_fail(item: list[str] | None, value: str, applied_values: list[str] | None = None):
+    if value == "fail":
+        raise ValueError(value)
+    if applied_values is not None:
+        applied_values.append(value)
+    return append_value(item, value)
+
+async def test_call_with_coalesce_applies_concurrent_actions_with_single_write_per_batch():
+    repository = CountingInMemoryWithVersion()
+    item_action = ItemActionInAsyncRepositoryWithVersion(repository, coalesce=True)
+
+    results = await asyncio.gather(*(item_action(append_value)("a", str(i)) for i in range(10)))
+
+    assert results == list(range(1, 11))
+    assert await repository.get("a") == (repository.num_of_writes, [str(i) for i in range(10)])
+    assert repository.num_of_writes == 1
+    assert item_action.conflicts == 0
+
+async def test_call_with_coalesce_fails_only_action_which_raised():
+    repository = CountingInMemoryWithVersion()
+    await repository.add("a", ["1"])
+    item_action = ItemActionInAsyncRepositoryWithVersion(repository, coalesce=True)
+
+    applied_values = []
+
+    results = await asyncio.gather(
+        item_action(append_value_or_fail)("a", "2", applied_values),
+        item_action(append_value_or_fail)("a", "fail", applied_values),
+        item_action(append_value_or_fail)("a", "3", applied_values),
+        return_exceptions=True
+    )
+
+    assert results[0] == 2
+    assert isinstance(results[1], ValueError)
+    assert results[2] == 3
+    assert await repository.get("a") == (2, ["1", "2", "3"])
+    assert applied_values == ["2", "3"]
+
+async def test_call_with_coalesce_applies_actions_of_other_callers_when_first_caller_is_cancelled():
+    repository = CountingInMemoryWithVersion()
+    item_action = ItemActionInAsyncRepositoryWithVersion(repository, coalesce=True)
+    first_task = asyncio.create_task(item_action(append_value)("a", "1"))
+    await asyncio.sleep(0)
+    other_tasks = [asyncio.create_task(item_action(append_value)("a", str(i))) for i in range(2, 5)]
+    await asyncio.sleep(0)
+
+    first_task.cancel()
+    results = await asyncio.gather(*other_tasks)
+
+    assert first_task.cancelled()
+    assert results == [1, 2, 3]
+    assert await repository.get("a") == (1, ["2", "3", "4"])
+
+async def test_call_with_coalesce_returns_after_round_of_its_action_under_sustained_load():
+    repository = CountingInMemoryWithVersion()
+    item_action = ItemActionInAsyncRepositoryWithVersion(repository, coalesce=True)
+    is_loading = True
+    async def keep_loading():
+        i = 0
+        while is_loading:
+            i += 1
+            await item_action(append_value)("a", str(i))
+    load_tasks = [asyncio.create_task(keep_loading()) for _ in range(4)]
+    await asyncio.sleep(0)
+
+    res = await asyncio.wait_for(item_action(append_value)("a", "waited"), 1)
+    is_loading = False
+    await asyncio.gather(*load_tasks)
+
+    assert res > 0
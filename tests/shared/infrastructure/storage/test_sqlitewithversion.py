@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from infrastructure.persistence.filesystem.atomicwrite import Durability
+from infrastructure.persistence.sqlite import sqlitewithversion
+from infrastructure.persistence.sqlite.migratefromfiles import migrate
+from infrastructure.persistence.storagebackend import StorageBackend, StorageSettings, create_repository_with_version
+from shared.customtypes import IdValue
+from shared.infrastructure.serialization.json import JsonSerializer
+from shared.infrastructure.storage.repository import AlreadyExistsException
+
+import config
+
+SqliteWithVersion = sqlitewithversion.SqliteWithVersion[IdValue, dict, dict]
+
+@pytest.fixture(scope="module")
+def folder_path():
+    return os.path.join(config.STORAGE_ROOT_FOLDER, "test_sqlitewithversion")
+
+@pytest.fixture(scope="module")
+def sqlite_with_version_storage(folder_path: str):
+    return SqliteWithVersion("SampleItem", dict, dict, JsonSerializer[dict](), folder_path)
+
+async def test_get_returns_added_item_with_version_1(sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await sqlite_with_version_storage.add(id, {"name": "Bob"})
+
+    item_with_ver = await sqlite_with_version_storage.get(id)
+
+    assert item_with_ver == (1, {"name": "Bob"})
+
+async def test_add_raises_error_for_existing_item(sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await sqlite_with_version_storage.add(id, {"name": "Bob"})
+    with pytest.raises(AlreadyExistsException) as ex_info:
+        await sqlite_with_version_storage.add(id, {"name": "Alice"})
+    assert ex_info.value.args[0] == id
+
+async def test_get_returns_none_when_id_does_not_exist(sqlite_with_version_storage: SqliteWithVersion):
+    item_with_ver = await sqlite_with_version_storage.get(IdValue.new_id())
+    assert item_with_ver is None
+
+async def test_update_item_increments_version(sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await sqlite_with_version_storage.add(id, {"name": "Bob"})
+
+    updated = await sqlite_with_version_storage.update(id, 1, {"name": "Alice"})
+    item_with_ver = await sqlite_with_version_storage.get(id)
+
+    assert updated
+    assert item_with_ver == (2, {"name": "Alice"})
+
+async def test_update_returns_false_when_not_recent_version(sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await sqlite_with_version_storage.add(id, {"name": "Bob"})
+    await sqlite_with_version_storage.update(id, 1, {"name": "Alice"})
+
+    updated = await sqlite_with_version_storage.update(id, 1, {"name": "John"})
+    item_with_ver = await sqlite_with_version_storage.get(id)
+
+    assert not updated
+    assert item_with_ver == (2, {"name": "Alice"})
+
+async def test_concurrent_updates_of_same_version_only_one_succeeds(sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await sqlite_with_version_storage.add(id, {"name": "Bob"})
+
+    updates = await asyncio.gather(*(sqlite_with_version_storage.update(id, 1, {"name": str(i)}) for i in range(10)))
+
+    assert updates.count(True) == 1
+
+async def test_update_returns_false_when_not_existing_id(sqlite_with_version_storage: SqliteWithVersion):
+    updated = await sqlite_with_version_storage.update(IdValue.new_id(), 1, {"name": "Bob"})
+    assert not updated
+
+async def test_delete_existing_item(sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await sqlite_with_version_storage.add(id, {"name": "Bob"})
+
+    await sqlite_with_version_storage.delete(id)
+    item_with_ver = await sqlite_with_version_storage.get(id)
+
+    assert item_with_ver is None
+
+async def test_get_many_returns_items_in_order_of_ids(sqlite_with_version_storage: SqliteWithVersion):
+    id1, id2 = IdValue.new_id(), IdValue.new_id()
+    await sqlite_with_version_storage.add(id1, {"name": "Bob"})
+    await sqlite_with_version_storage.add(id2, {"name": "Alice"})
+
+    items_with_ver = await sqlite_with_version_storage.get_many([id2, IdValue.new_id(), id1])
+
+    assert items_with_ver == [(1, {"name": "Alice"}), None, (1, {"name": "Bob"})]
+
+async def test_get_many_reads_more_ids_than_fit_in_single_select(sqlite_with_version_storage: SqliteWithVersion):
+    ids = [IdValue.new_id() for _ in range(sqlitewithversion.MAX_IDS_PER_SELECT + 1)]
+    await sqlite_with_version_storage.add(ids[0], {"name": "Bob"})
+    await sqlite_with_version_storage.add(ids[-1], {"name": "Alice"})
+
+    items_with_ver = await sqlite_with_version_storage.get_many(ids)
+
+    assert items_with_ver[0] == (1, {"name": "Bob"})
+    assert items_with_ver[-1] == (1, {"name": "Alice"})
+    assert items_with_ver[1:-1] == [None] * (len(ids) - 2)
+
+@pytest.fixture(scope="module")
+def cached_sqlite_with_version_storage(folder_path: str):
+    return SqliteWithVersion("SampleItem", dict, dict, JsonSerializer[dict](), folder_path, cache_max_size=10)
+
+async def test_cached_get_after_add_is_cache_hit(cached_sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await cached_sqlite_with_version_storage.add(id, {"name": "Bob"})
+    hits_before = cached_sqlite_with_version_storage.cache_info().hits
+
+    item_with_ver = await cached_sqlite_with_version_storage.get(id)
+
+    assert item_with_ver == (1, {"name": "Bob"})
+    assert cached_sqlite_with_version_storage.cache_info().hits == hits_before + 1
+
+async def test_cached_get_returns_new_item_instance(cached_sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await cached_sqlite_with_version_storage.add(id, {"name": "Bob"})
+    item_with_ver_1 = await cached_sqlite_with_version_storage.get(id)
+    assert item_with_ver_1 is not None
+    item_with_ver_1[1]["name"] = "Alice"
+
+    item_with_ver_2 = await cached_sqlite_with_version_storage.get(id)
+
+    assert item_with_ver_2 == (1, {"name": "Bob"})
+
+async def test_cached_get_returns_item_updated_by_another_writer_after_failed_update(sqlite_with_version_storage: SqliteWithVersion, cached_sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await cached_sqlite_with_version_storage.add(id, {"name": "Bob"})
+    await sqlite_with_version_storage.update(id, 1, {"name": "Alice"})
+    updated = await cached_sqlite_with_version_storage.update(id, 1, {"name": "John"})
+    assert not updated
+
+    item_with_ver = await cached_sqlite_with_version_storage.get(id)
+
+    assert item_with_ver == (2, {"name": "Alice"})
+
+async def test_cached_get_returns_none_after_delete(cached_sqlite_with_version_storage: SqliteWithVersion):
+    id = IdValue.new_id()
+    await cached_sqlite_with_version_storage.add(id, {"name": "Bob"})
+    await cached_sqlite_with_version_storage.delete(id)
+
+    item_with_ver = await cached_sqlite_with_version_storage.get(id)
+
+    assert item_with_ver is None
+
+async def test_sqlite_repository_created_with_cache_size_caches_items(folder_path: str):
+    repo = create_repository_with_version(StorageSettings(backend=StorageBackend.SQLITE), "CachedByBackendItem", dict, dict, JsonSerializer[dict](), "json", folder_path, cache_max_size=10)
+    id = IdValue.new_id()
+    await repo.add(id, {"name": "Bob"})
+
+    item_with_ver = await repo.get(id)
+
+    assert item_with_ver == (1, {"name": "Bob"})
+    assert repo.cache_info().hits == 1
+
+def test_cache_info_is_empty_when_cache_disabled(sqlite_with_version_storage: SqliteWithVersion):
+    assert sqlite_with_version_storage.cache_info() == (0, 0, 0, 0)
+
+async def test_database_is_synchronized_for_the_strongest_durability_of_its_repositories(folder_path: str):
+    durability_folder_path = os.path.join(folder_path, "durability")
+    file_storage = SqliteWithVersion("FileDurabilityItem", dict, dict, JsonSerializer[dict](), durability_folder_path, Durability.FILE)
+    SqliteWithVersion("NoDurabilityItem", dict, dict, JsonSerializer[dict](), durability_folder_path, Durability.NONE)
+    synchronous_before = await file_storage._database.run(lambda connection: connection.execute("PRAGMA synchronous").fetchone()[0])
+    SqliteWithVersion("DirectoryDurabilityItem", dict, dict, JsonSerializer[dict](), durability_folder_path, Durability.DIRECTORY)
+
+    synchronous_after = await file_storage._database.run(lambda connection: connection.execute("PRAGMA synchronous").fetchone()[0])
+
+    # NORMAL is 1 and FULL is 2
+    assert synchronous_before == 1
+    assert synchronous_after == 2
+
+class BytesJsonSerializer[T](JsonSerializer[T]):
+    def serialize(self, obj: T) -> bytes:  # type: ignore[override]
+        return super().serialize(obj).encode()
+
+async def test_item_serialized_to_bytes_is_stored_as_blob(folder_path: str):
+    storage = SqliteWithVersion("BinaryItem", dict, dict, BytesJsonSerializer[dict](), folder_path)
+    id = IdValue.new_id()
+    await storage.add(id, {"name": "Bob"})
+
+    data_type = await storage._database.run(lambda connection: connection.execute('SELECT typeof(data) FROM "BinaryItem" WHERE id = ?', (str(id),)).fetchone()[0])
+
+    assert data_type == "blob"
+    assert await storage.get(id) == (1, {"name": "Bob"})
+
+async def test_migrate_imports_latest_version_of_file_items(folder_path: str):
+    root_folder = os.path.join(folder_path, "migration")
+    items_folder_path = os.path.join(root_folder, "MigratedStorage", "MigratedItem")
+    id1, id2 = IdValue.new_id(), IdValue.new_id()
+    files = {(id1, 1): {"name": "Bob"}, (id1, 2): {"name": "Alice"}, (id2, 1): {"name": "John"}}
+    for (id, ver), item in files.items():
+        os.makedirs(os.path.join(items_folder_path, id), exist_ok=True)
+        with open(os.path.join(items_folder_path, id, f"{ver}.json"), mode='w') as f:
+            f.write(json.dumps(item))
+    storage = SqliteWithVersion("MigratedItem", dict, dict, JsonSerializer[dict](), os.path.join(root_folder, "MigratedStorage"))
+
+    migrated = migrate(root_folder, "json")
+
+    assert migrated == {items_folder_path: 2}
+    assert await storage.get(id1) == (2, {"name": "Alice"})
+    assert await storage.get(id2) == (1, {"name": "John"})
@@ -0,0 +1,37 @@
+import pytest
+
+from shared.action import Action, ActionName, ActionType, MessageDurability
+
+@pytest.mark.parametrize("action", [
+    Action(ActionName("execute_definition"), ActionType.CORE),
+    Action(ActionName("get_definition"), ActionType.SERVICE),
+    Action(ActionName("get-content-from-html"), ActionType.CUSTOM)
+])
+def test_parse_name_returns_action_with_the_name(action: Action):
+    assert Action.parse_name(action.get_name()) == action
+
+@pytest.mark.parametrize("name", ["execute_definition", "frasty_unknown_execute_definition", "frasty_core_", "frasty_core_Invalid Name", ""])
+def test_parse_name_returns_none_for_invalid_name(name: str):
+    assert Action.parse_name(name) is None
+
+@pytest.mark.parametrize("value, durability", [("persistent", MessageDurability.PERSISTENT), (" TRANSIENT ", MessageDurability.TRANSIENT), ("durable", None)])
+def test_message_durability_parse(value: str, durability: MessageDurability | None):
+    assert MessageDurability.parse(value) == durability
+
+@pytest.mark.parametrize("action_type", list(ActionType))
+def test_action_type_durability_is_persistent(action_type: ActionType):
+    assert action_type.durability == MessageDurability.PERSISTENT
+
+def test_declared_durability_of_action_without_declared_durability_is_durability_of_its_type():
+    action = Action(ActionName("persistent_by_type"), ActionType.CORE)
+
+    assert Action.declared_durability(action.get_name()) == ActionType.CORE.durability
+
+def test_declared_durability_of_action_is_found_by_its_name():
+    action = Action(ActionName("declared_transient"), ActionType.CUSTOM, durability=MessageDurability.TRANSIENT)
+
+    assert Action.declared_durability(action.get_name()) == MessageDurability.TRANSIENT
+    assert Action.parse_name(action.get_name()) == action
+
+def test_declared_durability_of_unknown_name_is_persistent():
+    assert Action.declared_durability("unknown") == MessageDurability.PERSISTENT
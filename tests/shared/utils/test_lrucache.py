@@ -0,0 +1,49 @@
+import pickle
+
+import pytest
+
+from shared.utils.lrucache import LruCache
+
+def test_get_returns_none_for_missing_key():
+    cache = LruCache[str, int](2)
+    assert cache.get("a") is None
+
+def test_get_returns_stored_value():
+    cache = LruCache[str, int](2)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+def test_set_evicts_least_recently_used_key():
+    cache = LruCache[str, int](2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_invalidate_removes_key():
+    cache = LruCache[str, int](2)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+def test_info_counts_hits_and_misses():
+    cache = LruCache[str, int](2)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    info = cache.info()
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (1, 1, 2, 1)
+
+def test_raises_error_when_maxsize_is_not_positive():
+    with pytest.raises(ValueError):
+        LruCache[str, int](0)
+
+def test_unpickled_cache_is_empty_with_same_maxsize():
+    cache = LruCache[str, int](2)
+    cache.set("a", 1)
+    unpickled_cache = pickle.loads(pickle.dumps(cache))
+    assert unpickled_cache.get("a") is None
+    assert unpickled_cache.info().maxsize == 2
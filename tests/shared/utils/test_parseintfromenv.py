@@ -0,0 +1,29 @@
+import pytest
+
+from shared.utils.parse import parse_int_from_env
+
+ENV_NAME = "RUNNING_DEFINITIONS_GROUP_SHARDS"
+
+def test_returns_default_when_env_variable_is_not_set(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv(ENV_NAME, raising=False)
+
+    assert parse_int_from_env(ENV_NAME, 0) == 0
+
+@pytest.mark.parametrize("raw_value, expected", [("0", 0), ("8", 8), (" 16 ", 16)])
+def test_returns_int_of_env_variable(monkeypatch: pytest.MonkeyPatch, raw_value: str, expected: int):
+    monkeypatch.setenv(ENV_NAME, raw_value)
+
+    assert parse_int_from_env(ENV_NAME, 0) == expected
+
+@pytest.mark.parametrize("raw_value", ["", "eight", "4.5", "-1"])
+def test_raises_value_error_when_env_variable_is_not_int_greater_than_or_equal_to_min_value(monkeypatch: pytest.MonkeyPatch, raw_value: str):
+    monkeypatch.setenv(ENV_NAME, raw_value)
+
+    with pytest.raises(ValueError):
+        parse_int_from_env(ENV_NAME, 0)
+
+def test_raises_value_error_when_env_variable_is_below_min_value(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("RUNNING_DEFINITIONS_SNAPSHOT_INTERVAL", "0")
+
+    with pytest.raises(ValueError):
+        parse_int_from_env("RUNNING_DEFINITIONS_SNAPSHOT_INTERVAL", 20, min_value=1)